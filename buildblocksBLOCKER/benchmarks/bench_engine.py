@@ -0,0 +1,79 @@
+"""Load test for BlockingManager on an in-memory backend
+
+Spawns a stream of synthetic processes (a fraction of them blocked) through
+FakeBackend and measures how quickly the engine terminates the blocked ones.
+Pass --linux to run against the real psutil backend's enumeration instead.
+
+    python benchmarks/bench_engine.py [processes] [--linux]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from backends import FakeBackend, LinuxBackend
+from blocker import BlockingManager
+
+
+def bench_fake(count):
+    # The engine still prints per decision; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        elapsed, expected, terminated, attempts, metrics = run_fake(count)
+    print(f"spawned {count} processes, {expected} blocked, "
+          f"{terminated} terminated in {elapsed * 1000:.1f} ms "
+          f"({count / elapsed:,.0f} events/s)")
+    latencies = sorted(a.latency * 1e6 for a in attempts)
+    if latencies:
+        succeeded = sum(1 for a in attempts if a.success)
+        print(f"kill attempts (last {len(attempts)}): {succeeded} succeeded, "
+              f"p50 {latencies[len(latencies) // 2]:.0f} us, "
+              f"p99 {latencies[int(len(latencies) * 0.99)]:.0f} us")
+    print(metrics.summary())
+
+
+def run_fake(count):
+    backend = FakeBackend()
+    manager = BlockingManager(backend)
+    for i in range(100):
+        manager.add_app(f"/opt/blocked/app{i}")
+    manager.toggle_blocking(True)
+
+    start = time.perf_counter()
+    expected = 0
+    for pid in range(1, count + 1):
+        blocked = pid % 10 == 0
+        expected += blocked
+        path = f"/opt/blocked/app{pid % 100}" if blocked else f"/usr/bin/tool{pid}"
+        backend.spawn(pid, path)
+
+    deadline = time.monotonic() + 30
+    while len(backend.terminated) < expected and time.monotonic() < deadline:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    manager.toggle_blocking(False)
+    return elapsed, expected, len(backend.terminated), list(manager.terminator.attempts), manager.metrics
+
+
+def bench_linux(rounds):
+    backend = LinuxBackend()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        processes = backend.enumerate()
+    elapsed = time.perf_counter() - start
+    print(f"enumerated {len(processes)} processes: {elapsed / rounds * 1000:.2f} ms per sweep")
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    count = int(args[0]) if args else 20000
+    if "--linux" in sys.argv:
+        bench_linux(max(1, count // 1000))
+    else:
+        bench_fake(count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Launch-to-decision latency through the event dispatcher
+
+Runs anywhere (no AppKit needed): a FakeEventSource feeds synthetic launches
+into an EventDispatcher whose handler performs a blocklist lookup.
+
+    python benchmarks/bench_launch_latency.py [launches]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from events import EventDispatcher, FakeEventSource
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+
+def main():
+    launches = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    blocked = {f"/Applications/Blocked{i}.app" for i in range(500)}
+    decisions = []
+
+    def handler(event):
+        decisions.append(event.process.path in blocked)
+
+    source = FakeEventSource()
+    dispatcher = EventDispatcher(source, handler, reconcile_interval=3600)
+    dispatcher.start()
+
+    for pid in range(launches):
+        source.launch(pid, f"/Applications/Blocked{pid % 1000}.app")
+        # Space launches out so we measure latency, not queue depth
+        if pid % 50 == 0:
+            time.sleep(0.001)
+
+    deadline = time.monotonic() + 10
+    while len(dispatcher.latencies) < launches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    dispatcher.stop()
+
+    latencies = [l * 1e6 for l in dispatcher.latencies]
+    print(f"launches: {launches}  decided: {len(decisions)}  blocked: {sum(decisions)}")
+    for pct in (50, 90, 99, 100):
+        print(f"p{pct:<3} launch-to-decision: {percentile(latencies, pct):9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Engine throughput on a synthetic week-long trace, replayed on a virtual clock
+
+Writes a trace of launches and exits spread over seven days (a fraction of
+them blocked), then replays it as fast as possible and reports events/s.
+
+    python benchmarks/bench_replay.py [launches]
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from events import LAUNCHED, TERMINATED, ProcessEvent, ProcessInfo
+from replay import ReplayHarness
+from rules import PATH_PREFIX, Rule
+from tracefile import TraceWriter, read_trace
+
+WEEK = 7 * 24 * 3600
+
+
+def write_trace(path, launches):
+    rng = random.Random(1)
+    events = []
+    for pid in range(1000, 1000 + launches):
+        start = rng.uniform(0, WEEK)
+        blocked = pid % 20 == 0
+        process = ProcessInfo(pid, f"/opt/games/game{pid % 50}" if blocked else f"/usr/bin/tool{pid % 500}",
+                              start_time=1.7e9 + start)
+        events.append(ProcessEvent(LAUNCHED, process, start))
+        events.append(ProcessEvent(TERMINATED, ProcessInfo(pid), start + rng.expovariate(1 / 600)))
+    events.sort(key=lambda event: event.timestamp)
+    with TraceWriter(path) as writer:
+        for event in events:
+            writer.write(event)
+    return len(events)
+
+
+def main():
+    launches = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    path = os.path.join(tempfile.mkdtemp(), "week.bbtrace")
+    count = write_trace(path, launches)
+    print(f"trace: {count} events, {os.path.getsize(path) / count:.1f} bytes/event")
+
+    start = time.perf_counter()
+    events = list(read_trace(path))
+    print(f"decode: {len(events) / (time.perf_counter() - start):,.0f} events/s")
+
+    harness = ReplayHarness(events, speed=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        harness.manager.add_rule(Rule(PATH_PREFIX, "/opt/games"))
+        start = time.perf_counter()
+        harness.run(until=WEEK)
+        elapsed = time.perf_counter() - start
+    print(f"replayed one virtual week in {elapsed:.2f} s: {count / elapsed:,.0f} events/s, "
+          f"{harness.sweeps} sweeps, {len(harness.terminator.kills)} kills")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Rule matcher micro-benchmark
+
+Compiles 10k synthetic rules of every kind, times adding and removing one
+app's rules on top of them, and matches 100k synthetic process records.
+
+    python benchmarks/bench_rules.py [records] [rules]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from events import ProcessInfo
+from rules import BUNDLE_ID, EXECUTABLE, GLOB, PATH, PATH_PREFIX, REGEX, TEAM_ID, Rule, RuleSet, RuleSnapshot
+
+
+def make_rules(count):
+    rules = []
+    share = count // 8
+    for i in range(share):
+        rules.append(Rule(BUNDLE_ID, f"com.vendor{i}.app"))
+        rules.append(Rule(PATH, f"/Applications/App{i}.app"))
+        rules.append(Rule(PATH_PREFIX, f"/opt/suite{i}"))
+        rules.append(Rule(EXECUTABLE, f"tool{i}"))
+        rules.append(Rule(TEAM_ID, f"TEAM{i:06d}"))
+        rules.append(Rule(GLOB, f"/Users/*/Games{i}/*.app"))
+        rules.append(Rule(GLOB, f"/Volumes/Games/Title{i}*.app"))
+        rules.append(Rule(REGEX, rf"/srv/studio{i}/(alpha|beta)/[^/]+\.app"))
+    # A handful of patterns with no literal directory
+    rules += [Rule(GLOB, "*Steam*.app"), Rule(REGEX, r".*/Minecraft[^/]*\.app")]
+    return rules
+
+
+def make_records(count, rule_count):
+    rng = random.Random(1)
+    share = rule_count // 8
+    records = []
+    for pid in range(count):
+        i = rng.randrange(share * 2)  # roughly half of the records miss
+        kind = pid % 8
+        if kind == 0:
+            records.append(ProcessInfo(pid, f"/Applications/X{i}.app", f"com.vendor{i}.app"))
+        elif kind == 1:
+            records.append(ProcessInfo(pid, f"/Applications/App{i}.app"))
+        elif kind == 2:
+            records.append(ProcessInfo(pid, f"/opt/suite{i}/bin/run"))
+        elif kind == 3:
+            records.append(ProcessInfo(pid, f"/usr/local/bin/tool{i}"))
+        elif kind == 4:
+            records.append(ProcessInfo(pid, f"/Applications/Y{i}.app", team_id=f"TEAM{i:06d}"))
+        elif kind == 5:
+            records.append(ProcessInfo(pid, f"/Users/me/Games{i}/Play.app"))
+        elif kind == 6:
+            records.append(ProcessInfo(pid, f"/srv/studio{i}/beta/Run.app"))
+        else:
+            records.append(ProcessInfo(pid, f"/usr/bin/daemon{i}"))
+    return records
+
+
+def main():
+    record_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rule_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+
+    rules = make_rules(rule_count)
+    start = time.perf_counter()
+    ruleset = RuleSet(rules)
+    compile_time = time.perf_counter() - start
+
+    snapshot = RuleSnapshot({"bench": tuple(rules)})
+    edits = 50
+    start = time.perf_counter()
+    for i in range(edits):
+        path = f"/Applications/Edit{i}.app"
+        snapshot = snapshot.with_app(path, [Rule(PATH, path), Rule(GLOB, f"{path}/*/Edit{i}*")])
+        snapshot = snapshot.without_app(path)
+    edit_time = (time.perf_counter() - start) / (edits * 2)
+
+    records = make_records(record_count, rule_count)
+    start = time.perf_counter()
+    matched = sum(1 for record in records if ruleset.match(record))
+    match_time = time.perf_counter() - start
+
+    print(f"rules: {len(ruleset)}  compile: {compile_time * 1000:.1f} ms  "
+          f"per app edit: {edit_time * 1000:.2f} ms")
+    print(f"records: {record_count}  matched: {matched}  "
+          f"total: {match_time * 1000:.1f} ms  per decision: {match_time / record_count * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
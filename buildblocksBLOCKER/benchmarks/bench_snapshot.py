@@ -0,0 +1,110 @@
+"""Settings load/write cost: JSON versus the binary snapshot format
+
+For 1k/10k/100k blocked entries, writes both formats and then loads each
+in a fresh interpreter, reporting wall time and peak RSS growth. "lookup"
+opens the snapshot and reads one entry; "full" decodes every entry.
+
+    python benchmarks/bench_snapshot.py [sizes...]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from settings_snapshot import encode_snapshot
+
+LOADERS = {
+    "json": """
+with open(path) as f:
+    document = json.load(f)
+value = document["blocked_apps"][probe]
+""",
+    "snapshot lookup": """
+document = load_snapshot(path).document()
+value = document["blocked_apps"][probe]
+""",
+    "snapshot full": """
+document = load_snapshot(path).document()
+apps = dict(document["blocked_apps"].items())
+value = apps[probe]
+""",
+}
+
+CHILD = """
+import json, resource, sys, time
+sys.path.insert(0, {src!r})
+from settings_snapshot import load_snapshot
+path, probe = {path!r}, {probe!r}
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - start
+grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+# ru_maxrss is bytes on macOS, KiB elsewhere
+print(elapsed, grown / 1024 if sys.platform == "darwin" else grown)
+"""
+
+
+def make_document(count):
+    return {
+        "blocked_apps": {f"App {i:06d}": f"/Applications/Vendor {i % 97}/App {i:06d}.app"
+                         for i in range(count)},
+        "salt": "c2FsdHNhbHRzYWx0c2FsdA==",
+        "downtime_enabled": False,
+    }
+
+
+def measure(path, loader, probe):
+    script = CHILD.format(src=SRC, path=path, probe=probe, body=LOADERS[loader])
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    elapsed, rss_kib = output.stdout.split()
+    return float(elapsed), float(rss_kib)
+
+
+def write_files(count, directory):
+    """Write both formats; prints the write times in seconds"""
+    document = make_document(count)
+    json_path = os.path.join(directory, f"{count}.json")
+    start = time.perf_counter()
+    with open(json_path, "w") as f:
+        json.dump(document, f, indent=2)
+    json_write = time.perf_counter() - start
+
+    snapshot_path = os.path.join(directory, f"{count}.snapshot")
+    start = time.perf_counter()
+    with open(snapshot_path, "wb") as f:
+        f.write(encode_snapshot(document))
+    print(json_write, time.perf_counter() - start)
+
+
+def main():
+    if sys.argv[1:2] == ["--write"]:
+        write_files(int(sys.argv[2]), sys.argv[3])
+        return
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    directory = tempfile.mkdtemp()
+    print(f"{'entries':>8}  {'format':<16} {'size':>9} {'write':>9} {'load':>9} {'peak RSS':>10}")
+    for count in sizes:
+        # Linux carries peak RSS across fork+exec, so the parent stays small
+        # and the documents are built in a child of their own
+        output = subprocess.run([sys.executable, __file__, "--write", str(count), directory],
+                                capture_output=True, text=True, check=True)
+        json_write, snapshot_write = map(float, output.stdout.split())
+        probe = f"App {count // 2:06d}"
+        for loader in LOADERS:
+            if loader == "json":
+                path, write = os.path.join(directory, f"{count}.json"), json_write
+            else:
+                path, write = os.path.join(directory, f"{count}.snapshot"), snapshot_write
+            elapsed, rss = measure(path, loader, probe)
+            print(f"{count:>8}  {loader:<16} {os.path.getsize(path) / 1024:>7.0f} KiB "
+                  f"{write * 1000:>6.1f} ms {elapsed * 1000:>6.2f} ms {rss / 1024:>7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
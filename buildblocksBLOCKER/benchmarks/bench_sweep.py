@@ -0,0 +1,89 @@
+"""Reconciliation sweep cost against a simulated 5k-entry process table
+
+Compares a full sweep (identify and match every running process, as the old
+monitor loop did) with the incremental ProcessTable sweep, counting backend
+identify calls as a stand-in for AppKit bridge calls.
+
+    python benchmarks/bench_sweep.py [processes] [sweeps] [churn per sweep]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from backends import FakeBackend
+from blocker import BlockingManager
+
+
+class CountingBackend(FakeBackend):
+    def __init__(self):
+        super().__init__()
+        self.identify_calls = 0
+
+    def identify(self, pid):
+        self.identify_calls += 1
+        return super().identify(pid)
+
+    def enumerate(self):
+        self.identify_calls += len(self.processes)
+        return super().enumerate()
+
+
+def populate(backend, count):
+    for pid in range(1, count + 1):
+        backend.spawn(pid, f"/usr/bin/tool{pid}")
+
+
+def churn(backend, next_pid, count):
+    for pid in list(backend.processes)[:count]:
+        del backend.processes[pid]
+    for pid in range(next_pid, next_pid + count):
+        backend.spawn(pid, f"/usr/bin/tool{pid}")
+    return next_pid + count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    sweeps = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    churn_count = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        backend = CountingBackend()
+        manager = BlockingManager(backend)
+        for i in range(50):
+            manager.add_app(f"/opt/blocked/app{i}")
+    populate(backend, count)
+    next_pid = count + 1
+
+    # Full sweep: what _monitor_processes used to do every second
+    backend.identify_calls = 0
+    start = time.perf_counter()
+    for _ in range(sweeps):
+        next_pid = churn(backend, next_pid, churn_count)
+        for process in backend.enumerate():
+            manager.decide(process)
+    full_time = time.perf_counter() - start
+    full_calls = backend.identify_calls
+
+    # Incremental sweep through the process table
+    manager._reconcile()
+    backend.identify_calls = 0
+    start = time.perf_counter()
+    for _ in range(sweeps):
+        next_pid = churn(backend, next_pid, churn_count)
+        manager._reconcile()
+    incremental_time = time.perf_counter() - start
+    incremental_calls = backend.identify_calls
+
+    print(f"{count} processes, {churn_count} launches per sweep, {sweeps} sweeps")
+    print(f"full sweep:        {full_time / sweeps * 1000:8.3f} ms/sweep  "
+          f"{full_calls / sweeps:8.1f} identify calls/sweep")
+    print(f"incremental sweep: {incremental_time / sweeps * 1000:8.3f} ms/sweep  "
+          f"{incremental_calls / sweeps:8.1f} identify calls/sweep")
+
+
+if __name__ == "__main__":
+    main()
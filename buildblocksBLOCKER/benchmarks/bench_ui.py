@@ -0,0 +1,180 @@
+"""Offscreen benchmarks for the app's custom painting
+
+Time GameButton repaints with and without the shared render cache, and
+the cost of styling a main window (first polish, theme switches, one
+app-wide stylesheet against per-widget ones):
+
+    python benchmarks/bench_ui.py paint [--buttons N] [--frames N]
+    python benchmarks/bench_ui.py polish [--sections N] [--switches N]
+
+Runs on Qt's offscreen platform unless QT_QPA_PLATFORM is already set.
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from PyQt6.QtCore import QEvent, QSize, QStringListModel
+from PyQt6.QtGui import QImage
+from PyQt6.QtWidgets import (QApplication, QCheckBox, QLabel, QLineEdit, QListView, QMainWindow,
+                             QTimeEdit, QVBoxLayout, QWidget)
+
+from game_widgets import BUTTON_CACHE, ICON_FACTORIES, GameButton
+from main import GameStyledFrame
+from styles import STYLE_TEMPLATE, THEMES
+from themes import ThemeManager, stylesheet
+
+BUTTON_SIZE = QSize(220, 44)
+
+
+def _paint_buttons(buttons, frames: int) -> float:
+    """Seconds per paintEvent, alternating hover and checked like a user would"""
+    image = QImage(BUTTON_SIZE, QImage.Format.Format_ARGB32_Premultiplied)
+    start = time.perf_counter()
+    for frame in range(frames):
+        for button in buttons:
+            button.hover = frame % 2 == 0
+            button.setChecked(frame % 4 < 2)
+            button.render(image)
+    return (time.perf_counter() - start) / (frames * len(buttons))
+
+
+def bench_paint(count: int, frames: int):
+    icon_types = list(ICON_FACTORIES) + [None]
+    start = time.perf_counter()
+    buttons = []
+    for index in range(count):
+        button = GameButton(f"Button {index}", icon_type=icon_types[index % len(icon_types)])
+        button.setCheckable(True)
+        button.resize(BUTTON_SIZE)
+        buttons.append(button)
+    created = time.perf_counter() - start
+    print(f"created {count} buttons in {created * 1000:.1f} ms")
+
+    BUTTON_CACHE.enabled = False
+    uncached = _paint_buttons(buttons, frames)
+    BUTTON_CACHE.enabled = True
+    BUTTON_CACHE.invalidate()
+    cached = _paint_buttons(buttons, frames)
+    print(f"paint without cache {uncached * 1e6:8.1f} us")
+    print(f"paint with cache    {cached * 1e6:8.1f} us  ({uncached / cached:.1f}x)")
+
+
+def _build_window(sections: int) -> QMainWindow:
+    """A main window with the app's kinds of widgets, sections times over"""
+    window = QMainWindow()
+    central = QWidget()
+    layout = QVBoxLayout(central)
+    icon_types = list(ICON_FACTORIES)
+    for index in range(sections):
+        frame = GameStyledFrame(f"Section {index}")
+        for button in range(3):
+            frame.content_layout.addWidget(
+                GameButton(f"Action {button}", icon_type=icon_types[button % len(icon_types)]))
+        frame.content_layout.addWidget(QCheckBox("Option"))
+        frame.content_layout.addWidget(QTimeEdit())
+        frame.content_layout.addWidget(QLineEdit())
+        notice = QLabel("Notice")
+        notice.setObjectName("DevNotice")
+        frame.content_layout.addWidget(notice)
+        apps = QListView()
+        apps.setModel(QStringListModel([f"App {row}" for row in range(50)], apps))
+        frame.content_layout.addWidget(apps)
+        layout.addWidget(frame)
+    window.setCentralWidget(central)
+    window.resize(1000, 700)
+    return window
+
+
+def _show(app: QApplication, window: QMainWindow) -> float:
+    """Seconds to show window, polishing every widget, and paint it once"""
+    start = time.perf_counter()
+    window.show()
+    app.processEvents()
+    window.grab()
+    return time.perf_counter() - start
+
+
+def _close(app: QApplication, window: QMainWindow, shown: bool = False):
+    if shown:
+        _show(app, window)
+    window.close()
+    window.deleteLater()
+    # processEvents() alone leaves deferred deletes queued outside exec()
+    app.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)
+
+
+def bench_polish(app: QApplication, sections: int, switches: int):
+    start = time.perf_counter()
+    for _ in range(switches):
+        for palette in THEMES.values():
+            STYLE_TEMPLATE.substitute(palette)
+    rendered = (time.perf_counter() - start) / (switches * len(THEMES))
+    for name in THEMES:
+        stylesheet(name)
+    start = time.perf_counter()
+    for _ in range(switches):
+        for name in THEMES:
+            stylesheet(name)
+    cached = (time.perf_counter() - start) / (switches * len(THEMES))
+    print(f"stylesheet render   {rendered * 1e6:8.1f} us")
+    print(f"stylesheet cached   {cached * 1e6:8.1f} us")
+
+    # Once unstyled first, so neither run below pays Qt's one-time setup
+    _close(app, _build_window(sections), shown=True)
+
+    # Every widget carrying its own copy of the sheet, parsed per widget
+    window = _build_window(sections)
+    start = time.perf_counter()
+    for widget in window.findChildren(QWidget):
+        widget.setStyleSheet(stylesheet("game"))
+    inline = time.perf_counter() - start + _show(app, window)
+    _close(app, window)
+
+    # The app's way: the theme is applied before the window is built
+    themes = ThemeManager(app)
+    start = time.perf_counter()
+    themes.apply("game")
+    window = _build_window(sections)
+    shared = time.perf_counter() - start + _show(app, window)
+    count = len(window.findChildren(QWidget))
+    print(f"first polish, sheet per widget  {inline * 1000:8.1f} ms  ({count} widgets)")
+    print(f"first polish, app-wide sheet    {shared * 1000:8.1f} ms  ({inline / shared:.1f}x)")
+
+    names = [name for name in THEMES if name != "game"] + ["game"]
+    # Each theme's icon atlas is built (or loaded) on first use; not counted
+    for name in names:
+        themes.apply(name)
+        app.processEvents()
+        window.grab()
+    start = time.perf_counter()
+    for _ in range(switches):
+        for name in names:
+            themes.apply(name)
+            app.processEvents()
+            window.grab()
+    switch = (time.perf_counter() - start) / (switches * len(names))
+    print(f"theme switch        {switch * 1000:8.1f} ms  (repolish and repaint)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BuildBlock widget rendering offscreen")
+    parser.add_argument("benchmark", choices=("paint", "polish"))
+    parser.add_argument("--buttons", type=int, default=24)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--sections", type=int, default=6)
+    parser.add_argument("--switches", type=int, default=10)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    if args.benchmark == "paint":
+        bench_paint(args.buttons, args.frames)
+    elif args.benchmark == "polish":
+        bench_polish(app, args.sections, args.switches)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Stress test: mutate rules at high frequency while the engine runs
+
+One thread adds and removes apps as fast as it can while another spawns
+processes through FakeBackend. A core set of apps stays blocked the whole
+time, so every one of their launches must still be terminated, and no
+thread may raise.
+
+    python benchmarks/stress_rules.py [seconds]
+"""
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from backends import FakeBackend
+from blocker import BlockingManager
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    errors = []
+    published = []
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        backend = FakeBackend()
+        manager = BlockingManager(backend)
+        manager.add_listener(lambda snapshot: published.append(snapshot.version))
+        manager.add_apps(f"/opt/core/app{i}" for i in range(20))
+        manager.toggle_blocking(True)
+
+        stop = threading.Event()
+        mutations = [0]
+        core_launches = [0]
+
+        def mutate():
+            i = 0
+            try:
+                while not stop.is_set():
+                    path = f"/opt/churn/app{i % 200}"
+                    if i % 2:
+                        manager.remove_app(path)
+                    else:
+                        manager.add_app(path)
+                    i += 1
+                mutations[0] = i
+            except Exception as e:
+                errors.append(e)
+
+        def spawn():
+            pid = 1
+            try:
+                while not stop.is_set():
+                    if pid % 4 == 0:
+                        backend.spawn(pid, f"/opt/core/app{pid % 20}")
+                        core_launches[0] += 1
+                    else:
+                        backend.spawn(pid, f"/opt/churn/app{pid % 200}")
+                    pid += 1
+                    if pid % 100 == 0:
+                        time.sleep(0.001)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=mutate), threading.Thread(target=spawn)]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        # Let the engine drain its queue
+        deadline = time.monotonic() + 10
+        core_pids = lambda: [p for p in backend.processes.values() if p.path.startswith("/opt/core/")]
+        while core_pids() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        manager.toggle_blocking(False)
+
+    survivors = core_pids()
+    print(f"rule mutations: {mutations[0]} ({mutations[0] / duration:,.0f}/s), "
+          f"snapshots published: {len(published)}")
+    print(f"core launches: {core_launches[0]}, survivors: {len(survivors)}, errors: {len(errors)}")
+    for error in errors[:5]:
+        print(f"  {type(error).__name__}: {error}")
+    sys.exit(1 if errors or survivors else 0)
+
+
+if __name__ == "__main__":
+    main()
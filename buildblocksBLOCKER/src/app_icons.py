@@ -0,0 +1,223 @@
+"""Application icons loaded off the GUI thread, with disk and memory caches
+
+IconService.icon() returns at once: a cached icon, or a placeholder while a
+worker thread resolves the bundle's icon. Decoded thumbnails are kept as
+PNG files keyed by bundle path, modification time and pixel size, so the
+next start only reads small files, and the most recently used icons stay
+in memory. ready(path) fires when a requested icon becomes available.
+"""
+import hashlib
+import os
+import plistlib
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from PyQt6.QtCore import QObject, QSize, Qt, pyqtSignal
+from PyQt6.QtGui import QIcon, QImage, QImageReader, QPixmap
+
+from icons import GameIcons
+from logs import get_logger
+
+log = get_logger(__name__)
+
+# Logical size of icons in the blocked-apps list
+ICON_SIZE = 32
+# Icons kept in memory, least recently used dropped first
+MEMORY_ICONS = 512
+# Thumbnails kept on disk; the least recently used are pruned at startup
+DISK_ICONS = 4096
+ICON_WORKERS = 2
+
+
+def default_cache_dir() -> str:
+    return os.path.expanduser("~/Library/Caches/BuildBlock/icons")
+
+
+def _cache_name(path: str, mtime_ns: int, pixels: int) -> str:
+    digest = hashlib.sha1(f"{path}\0{mtime_ns}\0{pixels}".encode()).hexdigest()
+    return f"{digest}.png"
+
+
+def _bundle_icon_file(path: str) -> Optional[str]:
+    """The icon file named in a macOS bundle's Info.plist"""
+    try:
+        with open(os.path.join(path, "Contents", "Info.plist"), "rb") as f:
+            info = plistlib.load(f)
+    except (OSError, ValueError, plistlib.InvalidFileException):
+        return None
+    name = info.get("CFBundleIconFile") if isinstance(info, dict) else None
+    if not isinstance(name, str) or not name:
+        return None
+    if not os.path.splitext(name)[1]:
+        name += ".icns"
+    icon_file = os.path.join(path, "Contents", "Resources", name)
+    return icon_file if os.path.isfile(icon_file) else None
+
+
+def _read_image(path: str, pixels: int) -> Optional[QImage]:
+    reader = QImageReader(path)
+    if not reader.canRead():
+        return None
+    reader.setScaledSize(QSize(pixels, pixels))
+    image = reader.read()
+    return None if image.isNull() else image
+
+
+def _workspace_icon(path: str, pixels: int) -> Optional[QImage]:
+    """The icon Finder shows for path (macOS only)"""
+    try:
+        from AppKit import NSWorkspace
+        image = NSWorkspace.sharedWorkspace().iconForFile_(path)
+        image.setSize_((pixels, pixels))
+        data = image.TIFFRepresentation()
+    except Exception as e:
+        log.debug("No workspace icon for %s: %s", path, e)
+        return None
+    if data is None:
+        return None
+    image = QImage.fromData(bytes(data))
+    return None if image.isNull() else image
+
+
+def load_image(path: str, pixels: int) -> Optional[QImage]:
+    """Decode the icon of the application at path; safe on any thread"""
+    if os.path.isdir(path):
+        icon_file = _bundle_icon_file(path)
+    else:
+        icon_file = path
+    image = _read_image(icon_file, pixels) if icon_file else None
+    if image is None and sys.platform == "darwin":
+        image = _workspace_icon(path, pixels)
+    if image is not None and image.size() != QSize(pixels, pixels):
+        image = image.scaled(pixels, pixels, Qt.AspectRatioMode.KeepAspectRatio,
+                             Qt.TransformationMode.SmoothTransformation)
+    return image
+
+
+class _Signals(QObject):
+    """Delivers decoded images from the workers to the GUI thread"""
+    loaded = pyqtSignal(str, int, int, object)
+
+
+class IconService(QObject):
+    """Resolves application icons on worker threads
+
+    Use from the GUI thread only. Workers do every file access (stat, disk
+    cache, bundle) and hand back a QImage; QIcons are made here.
+    """
+    ready = pyqtSignal(str)
+
+    def __init__(self, cache_dir: Optional[str] = None, parent=None):
+        super().__init__(parent)
+        self.cache_dir = cache_dir or default_cache_dir()
+        # (path, size, pixels) -> icon, most recently used last
+        self._memory: "OrderedDict[Tuple[str, int, int], QIcon]" = OrderedDict()
+        self._pending = set()
+        self._placeholders: Dict[int, QIcon] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._signals = _Signals(self)
+        self._signals.loaded.connect(self._loaded)
+
+    def icon(self, path: str, size: int = ICON_SIZE, dpr: float = 1.0) -> QIcon:
+        """Icon for path, or a placeholder until ready(path) is emitted"""
+        pixels = max(1, round(size * dpr))
+        key = (path, size, pixels)
+        icon = self._memory.get(key)
+        if icon is not None:
+            self._memory.move_to_end(key)
+            return icon
+        if key not in self._pending:
+            self._pending.add(key)
+            self._submit(self._resolve, path, size, pixels)
+        return self.placeholder(size)
+
+    def placeholder(self, size: int = ICON_SIZE) -> QIcon:
+        icon = self._placeholders.get(size)
+        if icon is None:
+            icon = self._placeholders[size] = GameIcons.create_app_placeholder_icon(size)
+        return icon
+
+    def invalidate(self, path: str):
+        """Forget path's icons in memory (the disk cache follows its mtime)"""
+        for key in [key for key in self._memory if key[0] == path]:
+            del self._memory[key]
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _submit(self, function, *args):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=ICON_WORKERS, thread_name_prefix="icons")
+                self._pool.submit(self._prune_disk)
+            self._pool.submit(function, *args)
+
+    def _resolve(self, path: str, size: int, pixels: int):
+        try:
+            image = self._cached_image(path, pixels)
+        except Exception as e:
+            log.warning("Could not load icon for %s: %s", path, e)
+            image = None
+        self._signals.loaded.emit(path, size, pixels, image)
+
+    def _cached_image(self, path: str, pixels: int) -> Optional[QImage]:
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached = os.path.join(self.cache_dir, _cache_name(path, mtime_ns, pixels))
+        image = QImage(cached)
+        if not image.isNull():
+            try:
+                # Mark it recently used for pruning
+                os.utime(cached)
+            except OSError:
+                pass
+            return image
+        image = load_image(path, pixels)
+        if image is not None:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                temporary = f"{cached}.{threading.get_ident()}.tmp"
+                if image.save(temporary, "PNG"):
+                    os.replace(temporary, cached)
+            except OSError as e:
+                log.debug("Could not cache icon for %s: %s", path, e)
+        return image
+
+    def _prune_disk(self):
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".png")]
+        except OSError:
+            return
+        if len(entries) <= DISK_ICONS:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - DISK_ICONS]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _loaded(self, path: str, size: int, pixels: int, image: Optional[QImage]):
+        key = (path, size, pixels)
+        self._pending.discard(key)
+        if image is None:
+            # Remembered, so it is not looked up again this session
+            icon = self.placeholder(size)
+        else:
+            pixmap = QPixmap.fromImage(image)
+            pixmap.setDevicePixelRatio(pixels / size)
+            icon = QIcon(pixmap)
+        self._memory[key] = icon
+        self._memory.move_to_end(key)
+        while len(self._memory) > MEMORY_ICONS:
+            self._memory.popitem(last=False)
+        self.ready.emit(path)
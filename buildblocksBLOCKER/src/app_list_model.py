@@ -0,0 +1,196 @@
+"""Model and search filter behind the blocked-apps list
+
+BlockedAppsModel holds just the name and path of each blocked app and
+answers the view's data() calls on demand, so a list view with uniform
+item sizes only touches the rows on screen; icons are asked for then too.
+Changes arrive in batches, each one a single row insert or a few removals.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, QSize, QSortFilterProxyModel, Qt
+from PyQt6.QtGui import QIcon
+
+PATH_ROLE = Qt.ItemDataRole.UserRole + 1
+ROW_SIZE = QSize(200, 40)
+# Removing more separate runs of rows than this resets the model instead
+MAX_REMOVE_RUNS = 32
+
+
+class BlockedAppsModel(QAbstractListModel):
+    """Blocked apps in the order they were added, keyed by display name"""
+
+    def __init__(self, icon_for: Callable[[str], QIcon], parent=None):
+        super().__init__(parent)
+        # Icon for a path; may return a placeholder and call icon_ready later
+        self.icon_for = icon_for
+        self._names: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._paths: Dict[str, str] = {}
+        self._by_path: Dict[str, str] = {}
+        # Case-folded names for searching, made once per name
+        self._keys: Dict[str, str] = {}
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._names)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._names):
+            return None
+        name = self._names[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return name
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.icon_for(self._paths[name])
+        if role in (Qt.ItemDataRole.ToolTipRole, PATH_ROLE):
+            return self._paths[name]
+        if role == Qt.ItemDataRole.SizeHintRole:
+            return ROW_SIZE
+        return None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._paths
+
+    def name_at(self, row: int) -> str:
+        return self._names[row]
+
+    def path(self, name: str) -> Optional[str]:
+        return self._paths.get(name)
+
+    def search_key(self, name: str) -> str:
+        return self._keys[name]
+
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    def add_apps(self, apps: Dict[str, str]) -> Dict[str, str]:
+        """Add or repoint apps by name; returns the ones that changed"""
+        changed = {}
+        new = []
+        for name, path in apps.items():
+            old = self._paths.get(name)
+            if old == path:
+                continue
+            changed[name] = path
+            if old is None:
+                new.append(name)
+            else:
+                # Same name, different bundle: update the row in place
+                self._by_path.pop(old, None)
+                self._paths[name] = path
+                self._by_path[path] = name
+                index = self.index(self._rows[name])
+                self.dataChanged.emit(index, index)
+        if new:
+            first = len(self._names)
+            self.beginInsertRows(QModelIndex(), first, first + len(new) - 1)
+            for row, name in enumerate(new, first):
+                path = apps[name]
+                self._names.append(name)
+                self._rows[name] = row
+                self._paths[name] = path
+                self._by_path[path] = name
+                self._keys[name] = name.casefold()
+            self.endInsertRows()
+        return changed
+
+    def remove_apps(self, names: Iterable[str]) -> Dict[str, str]:
+        """Remove apps by name; returns {name: path} of those that were present"""
+        rows = sorted({self._rows[name] for name in names if name in self._rows})
+        if not rows:
+            return {}
+        removed = {self._names[row]: self._paths[self._names[row]] for row in rows}
+        # Contiguous runs, last first so earlier row numbers stay valid
+        runs = []
+        for row in rows:
+            if runs and runs[-1][1] == row - 1:
+                runs[-1][1] = row
+            else:
+                runs.append([row, row])
+        reset = len(runs) > MAX_REMOVE_RUNS
+        if reset:
+            self.beginResetModel()
+        for first, last in reversed(runs):
+            if not reset:
+                self.beginRemoveRows(QModelIndex(), first, last)
+            del self._names[first:last + 1]
+            if not reset:
+                self.endRemoveRows()
+        for name, path in removed.items():
+            del self._rows[name]
+            del self._paths[name]
+            del self._keys[name]
+            self._by_path.pop(path, None)
+        for row in range(rows[0], len(self._names)):
+            self._rows[self._names[row]] = row
+        if reset:
+            self.endResetModel()
+        return removed
+
+    def clear(self):
+        self.beginResetModel()
+        self._names.clear()
+        self._rows.clear()
+        self._paths.clear()
+        self._by_path.clear()
+        self._keys.clear()
+        self.endResetModel()
+
+    def icon_ready(self, path: str):
+        """Repaint the row showing path once its icon has loaded"""
+        name = self._by_path.get(path)
+        if name is not None:
+            index = self.index(self._rows[name])
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+
+class AppFilterProxyModel(QSortFilterProxyModel):
+    """Case-insensitive substring search over a BlockedAppsModel
+
+    Remembers which names were checked against the query and which matched.
+    Typing more characters only re-checks the previous matches, and rows
+    added later are checked once, when the proxy first sees them.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._query = ""
+        self._matches: Set[str] = set()
+        self._checked: Set[str] = set()
+        # filterAcceptsRow runs once per row; avoid sourceModel() calls there
+        self._source: Optional[BlockedAppsModel] = None
+
+    def setSourceModel(self, model: BlockedAppsModel):
+        self._source = model
+        super().setSourceModel(model)
+
+    def set_query(self, text: str):
+        query = text.strip().casefold()
+        if query == self._query:
+            return
+        source = self._source
+        if self._query and self._query in query:
+            # Narrower: anything it matches also matched the old query
+            self._matches = {name for name in self._matches
+                             if name in source and query in source.search_key(name)}
+        else:
+            self._matches = set()
+            self._checked = set()
+        self._query = query
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        if not self._query:
+            return True
+        name = self._source.name_at(source_row)
+        if name in self._matches:
+            return True
+        if name in self._checked:
+            return False
+        self._checked.add(name)
+        if self._query in self._source.search_key(name):
+            self._matches.add(name)
+            return True
+        return False
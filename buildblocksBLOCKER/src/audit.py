@@ -0,0 +1,583 @@
+"""Append-only, hash-chained audit log of who changed what
+
+Records are queued in memory and written by a background thread in
+batches; each batch ends with a seal holding the SHA-256 of the previous
+seal plus every byte since, and is fsynced once. Segments rotate by size
+and each one starts with the last hash of the one before, so the chain
+runs across files. Deleting old segments records the hash they ended
+with in an anchor file, so cutting segments off the front is detected too.
+
+Enforcement events (APP_BLOCKED) go to a stream of their own in
+DIR/enforcement, with its own chain and size budget, so a flood of them
+cannot rotate policy changes away. Pass that directory to read them.
+
+    python src/audit.py verify [DIR]
+    python src/audit.py export [DIR] [--since T] [--until T] [--kind KIND ...]
+
+T is a Unix timestamp or an ISO 8601 date/time; export writes JSON lines.
+"""
+import argparse
+import getpass
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+# Segment layout: MAGIC, version byte, varint sequence number, the 32-byte
+# hash that ends the previous segment (zeros for the first), then records.
+# Every record starts with a tag byte; integers are unsigned LEB128 varints.
+#
+#   _STRING  length, utf-8 bytes          defines the next string id (from 1)
+#   _EVENT   time, kind id, length, JSON   time in microseconds since the epoch
+#   _SEAL    count, 32-byte hash          closes a batch of count events
+#
+# A seal's hash is SHA-256(previous hash + every byte after the previous
+# seal, or after the header, up to this seal's tag).
+MAGIC = b"BBAUDIT"
+VERSION = 1
+
+_STRING = 0
+_EVENT = 1
+_SEAL = 2
+_HASH_SIZE = 32
+_ZERO_HASH = bytes(_HASH_SIZE)
+
+# A batch is written once this many events are queued...
+BATCH_SIZE = 256
+# ...or this many seconds after its first event
+BATCH_DELAY = 0.5
+# Start a new segment once the current one is this large
+SEGMENT_BYTES = 1024 * 1024
+# Oldest segments beyond this many are deleted
+MAX_SEGMENTS = 32
+# Events kept in memory while the disk is failing, before dropping new ones
+MAX_QUEUED = 100000
+
+# Subdirectory of the audit directory holding the enforcement stream
+ENFORCEMENT_STREAM = "enforcement"
+# Sequence number and last hash of the newest segment rotation deleted
+ANCHOR_NAME = "anchor.json"
+
+# Event kinds
+AUDIT_STARTED = "audit_started"
+BLOCKING_TOGGLED = "blocking_toggled"
+DOWNTIME_TOGGLED = "downtime_toggled"
+APP_ADDED = "app_added"
+APP_REMOVED = "app_removed"
+PASSWORD_SET = "password_set"
+PASSWORD_RESET = "password_reset"
+UNLOCK_FAILED = "unlock_failed"
+FACTORY_RESET = "factory_reset"
+SETTINGS_PUSHED = "settings_pushed"
+APP_BLOCKED = "app_blocked"
+
+
+class AuditError(Exception):
+    pass
+
+
+def default_audit_dir() -> str:
+    return os.path.expanduser("~/Library/Application Support/AppBlocker/audit")
+
+
+def _varint(value: int, out: bytearray):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _segment_name(sequence: int) -> str:
+    return f"audit-{sequence:08d}.log"
+
+
+def read_anchor(directory: str) -> Optional[Tuple[int, bytes]]:
+    """(sequence, last hash) of the newest deleted segment, or None if none was"""
+    try:
+        with open(os.path.join(directory, ANCHOR_NAME)) as f:
+            anchor = json.load(f)
+        return int(anchor["sequence"]), bytes.fromhex(anchor["hash"])
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise AuditError(f"Unreadable {ANCHOR_NAME}: {e}")
+
+
+def _write_anchor(directory: str, sequence: int, last_hash: bytes):
+    path = os.path.join(directory, ANCHOR_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"sequence": sequence, "hash": last_hash.hex()}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def list_segments(directory: str) -> List[Tuple[int, str]]:
+    """(sequence, path) of every segment, oldest first"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    segments = []
+    for name in names:
+        if name.startswith("audit-") and name.endswith(".log"):
+            try:
+                segments.append((int(name[6:-4]), os.path.join(directory, name)))
+            except ValueError:
+                pass
+    return sorted(segments)
+
+
+class AuditEvent:
+    __slots__ = ("time", "kind", "fields", "segment", "sealed")
+
+    def __init__(self, time: float, kind: str, fields: Dict[str, Any], segment: int, sealed: bool):
+        self.time = time
+        self.kind = kind
+        self.fields = fields
+        self.segment = segment
+        # False for events after the last seal (e.g. cut off by a crash)
+        self.sealed = sealed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "time": datetime.fromtimestamp(self.time).astimezone().isoformat(timespec="microseconds"),
+            "kind": self.kind,
+            "segment": self.segment,
+            "sealed": self.sealed,
+            **self.fields,
+        }
+
+    def __repr__(self):
+        return f"AuditEvent({self.time:.6f}, {self.kind!r}, {self.fields!r})"
+
+
+class _Segment:
+    """Parsed view of one segment file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = f.read()
+        data = self.data
+        if not data.startswith(MAGIC) or len(data) <= len(MAGIC):
+            raise AuditError(f"{path} is not an audit log segment")
+        if data[len(MAGIC)] != VERSION:
+            raise AuditError(f"Unsupported audit log version {data[len(MAGIC)]}")
+        self.pos = len(MAGIC) + 1
+        self.sequence = self.varint()
+        self.previous_hash = self.take(_HASH_SIZE)
+        self.body_start = self.pos
+
+    def varint(self) -> int:
+        data, pos = self.data, self.pos
+        value = shift = 0
+        while True:
+            if pos >= len(data):
+                raise AuditError("Truncated record")
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                self.pos = pos
+                return value
+            shift += 7
+
+    def take(self, size: int) -> bytes:
+        if self.pos + size > len(self.data):
+            raise AuditError("Truncated record")
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return chunk
+
+    def records(self, decode: bool) -> Iterator[Tuple[int, Any]]:
+        """(tag, value) per record: string, (time, kind id, JSON) or (count, hash)
+
+        JSON is left as bytes unless decode is set. A torn final record ends
+        the iteration with AuditError.
+        """
+        data = self.data
+        while self.pos < len(data):
+            tag = data[self.pos]
+            self.pos += 1
+            if tag == _STRING:
+                length = self.varint()
+                raw = self.take(length)
+                yield tag, raw.decode() if decode else raw
+            elif tag == _EVENT:
+                micros = self.varint()
+                kind = self.varint()
+                length = self.varint()
+                raw = self.take(length)
+                yield tag, (micros, kind, json.loads(raw) if decode else raw)
+            elif tag == _SEAL:
+                seal_at = self.pos - 1
+                count = self.varint()
+                digest = self.take(_HASH_SIZE)
+                yield tag, (count, digest, seal_at)
+            else:
+                raise AuditError(f"Unknown record tag {tag} at offset {self.pos - 1}")
+
+
+class AuditReport:
+    """Result of verify()"""
+
+    def __init__(self):
+        self.segments = 0
+        self.events = 0
+        self.batches = 0
+        # Bytes after the last seal of a segment, left by a crash mid-batch.
+        # Not an error: nothing sealed was changed, and a crash cannot be
+        # told apart from someone cutting off the unsealed end.
+        self.unsealed_bytes = 0
+        self.errors: List[str] = []
+        self.last_hash = _ZERO_HASH
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def __str__(self):
+        status = "OK" if self.ok else "TAMPERED OR DAMAGED"
+        lines = [f"{status}: {self.segments} segments, {self.batches} batches, {self.events} events"]
+        if self.unsealed_bytes:
+            lines.append(f"{self.unsealed_bytes} unsealed bytes after interrupted writes")
+        lines.extend(self.errors)
+        return "\n".join(lines)
+
+
+def verify(directory: str) -> AuditReport:
+    """Check every seal and the links between segments
+
+    Only hashing and record framing are done, no JSON decoding. History
+    deleted by rotation is checked against the anchor file: the log must
+    start right after it (or at segment 0 if nothing was deleted).
+    """
+    report = AuditReport()
+    segments = list_segments(directory)
+    try:
+        anchor = read_anchor(directory)
+    except AuditError as e:
+        report.errors.append(str(e))
+        anchor = None
+    first_sequence = anchor[0] + 1 if anchor else 0
+    if segments and segments[0][0] > first_sequence:
+        report.errors.append(f"segments {first_sequence}..{segments[0][0] - 1} are missing "
+                             f"from the start of the log")
+    expected_hash = None
+    expected_sequence = None
+    for sequence, path in segments:
+        name = os.path.basename(path)
+        try:
+            segment = _Segment(path)
+        except (OSError, AuditError) as e:
+            report.errors.append(f"{name}: {e}")
+            expected_hash = expected_sequence = None
+            continue
+        report.segments += 1
+        if segment.sequence != sequence:
+            report.errors.append(f"{name}: header says segment {segment.sequence}")
+        if expected_sequence is not None and sequence != expected_sequence:
+            report.errors.append(f"{name}: segments {expected_sequence}..{sequence - 1} are missing")
+        elif expected_hash is not None and segment.previous_hash != expected_hash:
+            report.errors.append(f"{name}: does not continue the previous segment's chain")
+        elif anchor and sequence == anchor[0] + 1 and segment.previous_hash != anchor[1]:
+            report.errors.append(f"{name}: does not continue the deleted segments' chain")
+        chain = segment.previous_hash
+        batch_start = segment.body_start
+        events = 0
+        try:
+            for tag, value in segment.records(decode=False):
+                if tag == _EVENT:
+                    events += 1
+                elif tag == _SEAL:
+                    count, digest, seal_at = value
+                    actual = hashlib.sha256(chain + segment.data[batch_start:seal_at]).digest()
+                    if count != events or actual != digest:
+                        report.errors.append(f"{name}: batch ending at offset {seal_at} does not match its seal")
+                    report.events += events
+                    report.batches += 1
+                    chain = digest
+                    batch_start = segment.pos
+                    events = 0
+        except AuditError:
+            # A torn record; the rest is counted as unsealed
+            pass
+        report.unsealed_bytes += len(segment.data) - batch_start
+        expected_hash = chain
+        expected_sequence = sequence + 1
+        report.last_hash = chain
+    return report
+
+
+def read_audit(directory: str, since: Optional[float] = None,
+               until: Optional[float] = None) -> Iterator[AuditEvent]:
+    """Stream events in order, optionally limited to [since, until)
+
+    Segments wholly before since are skipped after reading their header and
+    first event. Use verify() to check the chain; this only parses.
+    """
+    segments = list_segments(directory)
+    for index, (sequence, path) in enumerate(segments):
+        if since is not None and index + 1 < len(segments):
+            # Skip a segment if the next one already starts before since
+            first = _first_event_time(segments[index + 1][1])
+            if first is not None and first < since:
+                continue
+        try:
+            segment = _Segment(path)
+        except (OSError, AuditError) as e:
+            log.warning("Skipping audit segment %s: %s", path, e)
+            continue
+        strings: List[str] = [""]
+        pending: List[AuditEvent] = []
+        try:
+            for tag, value in segment.records(decode=True):
+                if tag == _STRING:
+                    strings.append(value)
+                elif tag == _EVENT:
+                    micros, kind, fields = value
+                    when = micros / 1e6
+                    if until is not None and when >= until:
+                        return
+                    if since is None or when >= since:
+                        pending.append(AuditEvent(when, strings[kind], fields, sequence, False))
+                else:
+                    for event in pending:
+                        event.sealed = True
+                        yield event
+                    pending = []
+        except (AuditError, ValueError):
+            pass
+        # Events a crash left unsealed are still worth seeing
+        yield from pending
+
+
+def _first_event_time(path: str) -> Optional[float]:
+    try:
+        segment = _Segment(path)
+        for tag, value in segment.records(decode=False):
+            if tag == _EVENT:
+                return value[0] / 1e6
+    except (OSError, AuditError):
+        pass
+    return None
+
+
+class AuditLog:
+    """Queues audit events and writes them from a background thread
+
+    record() only appends to an in-memory queue, so the monitor and
+    terminator threads can log every enforcement without touching the disk.
+    The writer encodes, hashes and fsyncs a batch at a time (see BATCH_SIZE
+    and BATCH_DELAY). Each run starts a new segment whose first event says
+    which user, host and process wrote it.
+    """
+
+    def __init__(self, directory: Optional[str] = None, segment_bytes: int = SEGMENT_BYTES,
+                 max_segments: int = MAX_SEGMENTS):
+        self.directory = directory or default_audit_dir()
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._closed = False
+        self._file = None
+        self._strings: Dict[str, int] = {}
+        self._size = 0
+        self._sequence = 0
+        self._hash = _ZERO_HASH
+        self.dropped = 0
+        self._thread = None
+
+    def start(self):
+        """Open a new segment after the existing ones and start the writer"""
+        os.makedirs(self.directory, exist_ok=True)
+        segments = list_segments(self.directory)
+        if segments:
+            report = verify(self.directory)
+            if not report.ok:
+                log.error("Audit log failed verification:\n%s", report)
+            self._sequence = segments[-1][0] + 1
+            self._hash = report.last_hash
+        self._open_segment()
+        self.record(AUDIT_STARTED, user=getpass.getuser(), host=socket.gethostname(), pid=os.getpid())
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, kind: str, **fields):
+        """Queue an event; fields must be JSON serializable. Never blocks on I/O."""
+        event = (time.time(), kind, fields)
+        with self._lock:
+            if self._closed:
+                return
+            if len(self._queue) >= MAX_QUEUED:
+                self.dropped += 1
+                return
+            self._queue.append(event)
+            if len(self._queue) == 1 or len(self._queue) >= BATCH_SIZE:
+                self._wake.notify()
+
+    def close(self):
+        """Write everything queued and stop the writer"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while not self._queue and not self._closed:
+                    self._wake.wait()
+                # Let a batch fill up unless it is already full
+                deadline = time.monotonic() + BATCH_DELAY
+                while len(self._queue) < BATCH_SIZE and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wake.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), BATCH_SIZE))]
+                closed = self._closed and not self._queue
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except OSError as e:
+                    log.error("Error writing audit log: %s", e)
+                    with self._lock:
+                        # Retry these first; the next seal will cover them
+                        self._queue.extendleft(reversed(batch))
+                    if closed:
+                        return
+                    time.sleep(BATCH_DELAY)
+                    continue
+            if closed:
+                return
+
+    def _encode(self, batch) -> bytearray:
+        out = bytearray()
+        for when, kind, fields in batch:
+            kind_id = self._strings.get(kind)
+            if kind_id is None:
+                encoded = kind.encode()
+                out.append(_STRING)
+                _varint(len(encoded), out)
+                out += encoded
+                kind_id = self._strings[kind] = len(self._strings) + 1
+            payload = json.dumps(fields, separators=(",", ":"), default=str).encode()
+            out.append(_EVENT)
+            _varint(round(when * 1e6), out)
+            _varint(kind_id, out)
+            _varint(len(payload), out)
+            out += payload
+        return out
+
+    def _write_batch(self, batch):
+        if self._size >= self.segment_bytes:
+            self._rotate()
+        strings = dict(self._strings)
+        out = self._encode(batch)
+        digest = hashlib.sha256(self._hash + out).digest()
+        out.append(_SEAL)
+        _varint(len(batch), out)
+        out += digest
+        try:
+            self._file.write(out)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError:
+            # The batch will be encoded again, strings included
+            self._strings = strings
+            self._file.truncate(self._size)
+            raise
+        self._size += len(out)
+        self._hash = digest
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, _segment_name(self._sequence))
+        header = bytearray(MAGIC + bytes([VERSION]))
+        _varint(self._sequence, header)
+        header += self._hash
+        self._file = open(path, "xb")
+        self._file.write(header)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._size = len(header)
+        self._strings = {}
+
+    def _rotate(self):
+        self._file.close()
+        self._sequence += 1
+        self._open_segment()
+        segments = list_segments(self.directory)
+        excess = max(0, len(segments) - self.max_segments)
+        if not excess:
+            return
+        try:
+            # The oldest segment kept starts with the hash the deleted ones end with
+            kept = segments[excess]
+            _write_anchor(self.directory, kept[0] - 1, _Segment(kept[1]).previous_hash)
+        except (OSError, AuditError) as e:
+            log.warning("Could not record the audit log anchor, keeping old segments: %s", e)
+            return
+        for _, path in segments[:excess]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                log.warning("Could not remove old audit segment %s: %s", path, e)
+
+
+def _parse_time(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify or export the BuildBlock audit log")
+    parser.add_argument("command", choices=("verify", "export"))
+    parser.add_argument("directory", nargs="?", default=default_audit_dir())
+    parser.add_argument("--since", type=_parse_time, help="Unix time or ISO 8601")
+    parser.add_argument("--until", type=_parse_time, help="Unix time or ISO 8601")
+    parser.add_argument("--kind", action="append", help="only events of this kind")
+    parser.add_argument("-o", "--output", help="write JSON lines here instead of stdout")
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        start = time.perf_counter()
+        report = verify(args.directory)
+        print(report)
+        print(f"verified in {time.perf_counter() - start:.3f} s")
+        sys.exit(0 if report.ok else 1)
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for event in read_audit(args.directory, args.since, args.until):
+            if args.kind and event.kind not in args.kind:
+                continue
+            output.write(json.dumps(event.to_dict()) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
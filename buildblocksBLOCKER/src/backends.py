@@ -0,0 +1,367 @@
+import os
+import signal
+import sys
+from typing import Callable, Dict, List, Optional
+
+from logs import get_logger
+from rules import BUNDLE_ID, PATH, Rule
+from events import (
+    EventSource,
+    FakeEventSource,
+    ProcessInfo,
+    WorkspaceEventSource,
+    running_app_info,
+)
+
+log = get_logger(__name__)
+
+
+_screen_observer_class = None
+
+
+def _screen_lock_observer_class():
+    """Create the Objective-C observer class once (PyObjC forbids redefining it)"""
+    global _screen_observer_class
+    if _screen_observer_class is None:
+        import objc
+        from Foundation import NSObject
+
+        class BBScreenLockObserver(NSObject):
+            def initWithCallback_(self, callback):
+                self = objc.super(BBScreenLockObserver, self).init()
+                if self is None:
+                    return None
+                self.callback = callback
+                return self
+
+            def screenLocked_(self, notification):
+                self.callback(True)
+
+            def screenUnlocked_(self, notification):
+                self.callback(False)
+
+        _screen_observer_class = BBScreenLockObserver
+    return _screen_observer_class
+
+
+class ProcessBackend:
+    """Platform interface the blocking engine talks to
+
+    A backend knows how to enumerate running processes, watch for new ones,
+    identify a pid and terminate a process. Everything platform specific
+    lives behind this interface so BlockingManager runs anywhere.
+    """
+    name = "base"
+
+    def check_permissions(self, prompt: bool = False) -> bool:
+        """Return True if we are allowed to manage other processes"""
+        return True
+
+    def is_valid_app(self, app_path: str) -> bool:
+        """Check that app_path is something this backend can block"""
+        return os.path.exists(app_path)
+
+    def app_rules(self, app_path: str) -> List[Rule]:
+        """Rules that block app_path, wherever a copy of it lives"""
+        return [Rule(PATH, app_path)]
+
+    def team_id(self, process: ProcessInfo) -> Optional[str]:
+        """Code-signing team identifier of a process, if the platform has one"""
+        return None
+
+    def watch_screen_lock(self, callback: Callable[[bool], None]):
+        """Call callback(locked) when the screen locks or unlocks, if supported"""
+
+    def enumerate(self) -> List[ProcessInfo]:
+        """List every running process"""
+        raise NotImplementedError
+
+    def list_pids(self) -> List[int]:
+        """List running pids only, as cheaply as the platform allows"""
+        return [process.pid for process in self.enumerate()]
+
+    def watch(self) -> EventSource:
+        """Create an event source reporting launches on this platform"""
+        raise NotImplementedError
+
+    def identify(self, pid: int) -> Optional[ProcessInfo]:
+        """Look up a single process, or None if it is gone"""
+        raise NotImplementedError
+
+    def start_time(self, pid: int) -> Optional[float]:
+        """Start time of a pid, cheaper than identify(); None if unknown"""
+        return None
+
+    def terminate(self, process: ProcessInfo, force: bool = False) -> bool:
+        """Ask a process to quit, or kill it outright when force is set"""
+        raise NotImplementedError
+
+    def is_running(self, process: ProcessInfo) -> bool:
+        """Check whether a previously identified process is still alive"""
+        return self.identify(process.pid) is not None
+
+
+class AppKitBackend(ProcessBackend):
+    """macOS backend built on NSWorkspace / NSRunningApplication"""
+    name = "appkit"
+
+    def __init__(self):
+        from AppKit import NSWorkspace
+        self.workspace = NSWorkspace.sharedWorkspace()
+        # Bundle path -> team identifier (or None when unsigned)
+        self._team_ids: Dict[str, Optional[str]] = {}
+        self.load_private_frameworks()
+
+    def load_private_frameworks(self):
+        """Load required private frameworks"""
+        try:
+            import objc
+            # Load Apple's private frameworks
+            objc.loadBundle('CoreServices',
+                          bundle_path='/System/Library/Frameworks/CoreServices.framework',
+                          module_globals=globals())
+
+            objc.loadBundle('ApplicationServices',
+                          bundle_path='/System/Library/Frameworks/ApplicationServices.framework',
+                          module_globals=globals())
+        except Exception as e:
+            log.error("Failed to load frameworks: %s", e)
+
+    def check_permissions(self, prompt: bool = False) -> bool:
+        """Check Accessibility trust, optionally triggering the system prompt"""
+        try:
+            from ApplicationServices import AXIsProcessTrusted, AXIsProcessTrustedWithOptions
+            from Foundation import NSDictionary
+
+            if AXIsProcessTrusted():
+                return True
+            if prompt:
+                # This will trigger the system permission prompt
+                options = NSDictionary.dictionaryWithObject_forKey_(False, "AXTrustedCheckOptionPrompt")
+                AXIsProcessTrustedWithOptions(options)
+            return False
+        except Exception as e:
+            log.warning("Error checking permissions: %s", e)
+            return False
+
+    def is_valid_app(self, app_path: str) -> bool:
+        from Foundation import NSBundle
+        return bool(NSBundle.bundleWithPath_(app_path))
+
+    def app_rules(self, app_path: str) -> List[Rule]:
+        from Foundation import NSBundle
+        rules = [Rule(PATH, app_path)]
+        bundle = NSBundle.bundleWithPath_(app_path)
+        bundle_id = bundle.bundleIdentifier() if bundle else None
+        if bundle_id:
+            # Catches renamed or moved copies of the same app
+            rules.append(Rule(BUNDLE_ID, bundle_id))
+        return rules
+
+    def team_id(self, process: ProcessInfo) -> Optional[str]:
+        if not process.path:
+            return None
+        if process.path not in self._team_ids:
+            self._team_ids[process.path] = self._read_team_id(process.path)
+        return self._team_ids[process.path]
+
+    def _read_team_id(self, path: str) -> Optional[str]:
+        try:
+            import Security
+            from Foundation import NSURL
+            url = NSURL.fileURLWithPath_(path)
+            err, code = Security.SecStaticCodeCreateWithPath(url, 0, None)
+            if err != 0:
+                return None
+            err, info = Security.SecCodeCopySigningInformation(
+                code, Security.kSecCSSigningInformation, None)
+            if err != 0 or info is None:
+                return None
+            return info.get(Security.kSecCodeInfoTeamIdentifier)
+        except Exception as e:
+            log.debug("Failed to read team id for %s: %s", path, e)
+            return None
+
+    def watch_screen_lock(self, callback: Callable[[bool], None]):
+        from Foundation import NSDistributedNotificationCenter
+        observer = _screen_lock_observer_class().alloc().initWithCallback_(callback)
+        center = NSDistributedNotificationCenter.defaultCenter()
+        center.addObserver_selector_name_object_(observer, "screenLocked:", "com.apple.screenIsLocked", None)
+        center.addObserver_selector_name_object_(observer, "screenUnlocked:", "com.apple.screenIsUnlocked", None)
+        # The notification center does not retain its observers
+        self._screen_observer = observer
+
+    def _info(self, app) -> ProcessInfo:
+        process = running_app_info(app)
+        process.start_time = self.start_time(process.pid)
+        return process
+
+    def enumerate(self) -> List[ProcessInfo]:
+        return [self._info(app) for app in self.workspace.runningApplications()]
+
+    def list_pids(self) -> List[int]:
+        # One bridge call per app instead of the four in running_app_info
+        return [app.processIdentifier() for app in self.workspace.runningApplications()]
+
+    def watch(self) -> EventSource:
+        return WorkspaceEventSource()
+
+    def identify(self, pid: int) -> Optional[ProcessInfo]:
+        from AppKit import NSRunningApplication
+        app = NSRunningApplication.runningApplicationWithProcessIdentifier_(pid)
+        return self._info(app) if app else None
+
+    def start_time(self, pid: int) -> Optional[float]:
+        try:
+            import psutil
+            return psutil.Process(pid).create_time()
+        except Exception:
+            # No psutil, or the process is gone or not ours to inspect
+            return None
+
+    def terminate(self, process: ProcessInfo, force: bool = False) -> bool:
+        from AppKit import NSRunningApplication
+        app = NSRunningApplication.runningApplicationWithProcessIdentifier_(process.pid)
+        if app is None:
+            # Not a GUI app (or already gone): fall back to plain signals, but
+            # only if the pid still holds the process we identified. Without
+            # a recorded start time a reused pid cannot be ruled out.
+            if process.start_time is None or self.start_time(process.pid) != process.start_time:
+                return False
+            try:
+                os.kill(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+                return True
+            except OSError:
+                return False
+        return bool(app.forceTerminate() if force else app.terminate())
+
+    def is_running(self, process: ProcessInfo) -> bool:
+        from AppKit import NSRunningApplication
+        app = NSRunningApplication.runningApplicationWithProcessIdentifier_(process.pid)
+        return app is not None and not app.isTerminated()
+
+
+class LinuxBackend(ProcessBackend):
+    """psutil / procfs backend for Linux lab machines and CI"""
+    name = "linux"
+
+    def __init__(self, poll_interval: float = 1.0):
+        import psutil
+        self._psutil = psutil
+        self.poll_interval = poll_interval
+
+    def is_valid_app(self, app_path: str) -> bool:
+        return os.path.isfile(app_path) and os.access(app_path, os.X_OK)
+
+    def _info(self, proc) -> ProcessInfo:
+        info = proc.info
+        return ProcessInfo(info["pid"], info.get("exe"), None, info.get("name"), info.get("create_time"))
+
+    def enumerate(self) -> List[ProcessInfo]:
+        processes = []
+        for proc in self._psutil.process_iter(["pid", "exe", "name", "create_time"]):
+            processes.append(self._info(proc))
+        return processes
+
+    def list_pids(self) -> List[int]:
+        return self._psutil.pids()
+
+    def watch(self) -> EventSource:
+        from proc_connector import linux_event_source
+        return linux_event_source(self.identify, self.poll_interval)
+
+    def identify(self, pid: int) -> Optional[ProcessInfo]:
+        psutil = self._psutil
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                return ProcessInfo(pid, proc.exe(), None, proc.name(), proc.create_time())
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return None
+
+    def start_time(self, pid: int) -> Optional[float]:
+        psutil = self._psutil
+        try:
+            # Readable for every user's processes, unlike exe()
+            return psutil.Process(pid).create_time()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return None
+
+    def terminate(self, process: ProcessInfo, force: bool = False) -> bool:
+        psutil = self._psutil
+        try:
+            proc = psutil.Process(process.pid)
+            # Guard against pid reuse since we identified the process
+            if process.start_time is not None and proc.create_time() != process.start_time:
+                return False
+            if force:
+                proc.kill()
+            else:
+                proc.terminate()
+            return True
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return False
+
+    def is_running(self, process: ProcessInfo) -> bool:
+        psutil = self._psutil
+        try:
+            proc = psutil.Process(process.pid)
+            if process.start_time is not None and proc.create_time() != process.start_time:
+                return False
+            return proc.status() != psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            return False
+
+
+class FakeBackend(ProcessBackend):
+    """In-memory process table for tests, benchmarks and load tests"""
+    name = "fake"
+
+    def __init__(self):
+        self.processes: Dict[int, ProcessInfo] = {}
+        self.source = FakeEventSource()
+        # (pid, force) for every terminate call, in order
+        self.terminated = []
+
+    def is_valid_app(self, app_path: str) -> bool:
+        return True
+
+    def spawn(self, pid: int, path: str, bundle_id: Optional[str] = None,
+              name: Optional[str] = None, start_time: Optional[float] = None):
+        """Add a process to the table and announce its launch"""
+        process = ProcessInfo(pid, path, bundle_id, name or os.path.basename(path), start_time)
+        self.processes[pid] = process
+        return self.source.launch(pid, path, bundle_id, process.name)
+
+    def enumerate(self) -> List[ProcessInfo]:
+        return list(self.processes.values())
+
+    def list_pids(self) -> List[int]:
+        return list(self.processes)
+
+    def watch(self) -> EventSource:
+        return self.source
+
+    def identify(self, pid: int) -> Optional[ProcessInfo]:
+        return self.processes.get(pid)
+
+    def start_time(self, pid: int) -> Optional[float]:
+        process = self.processes.get(pid)
+        return process.start_time if process is not None else None
+
+    def is_running(self, process: ProcessInfo) -> bool:
+        return process.pid in self.processes
+
+    def terminate(self, process: ProcessInfo, force: bool = False) -> bool:
+        self.terminated.append((process.pid, force))
+        if self.processes.pop(process.pid, None) is None:
+            return False
+        self.source.exit(process.pid)
+        return True
+
+
+def get_backend() -> ProcessBackend:
+    """Pick the backend for the current platform"""
+    if sys.platform == "darwin":
+        return AppKitBackend()
+    return LinuxBackend()
@@ -1,62 +1,84 @@
-import psutil
-import os
-import time
-import threading
-from typing import Set
-import subprocess
+import logging
 import sys
-import objc
-from Foundation import (
-    NSWorkspace, 
-    NSBundle, 
-    NSDictionary
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+from audit import APP_BLOCKED
+from backends import ProcessBackend, get_backend
+from events import (
+    EventDispatcher,
+    ProcessEvent,
+    ProcessInfo,
+    LAUNCHED,
+    TERMINATED,
 )
-from AppKit import NSRunningApplication
-from ApplicationServices import AXIsProcessTrusted, AXIsProcessTrustedWithOptions, kAXTrustedCheckOptionPrompt
-from PyQt6.QtWidgets import QMessageBox
+from logs import get_logger
+from metrics import (
+    DECIDE_TO_SIGNAL,
+    DETECT_TO_DECIDE,
+    DETECT_TO_EXIT,
+    SIGNAL_TO_EXIT,
+    MetricsRegistry,
+)
+from process_table import ProcessTable
+from rules import Rule, RuleSet, RuleSnapshot
+from scheduler import MonitorScheduler
+from terminator import Terminator
+from tracefile import TraceWriter
+
+log = get_logger(__name__)
 
 class BlockingManager:
-    def __init__(self):
-        self.blocked_apps: Set[str] = set()
+    def __init__(self, backend: Optional[ProcessBackend] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        # Current rules; replaced wholesale on every change, never mutated
+        self.snapshot = RuleSnapshot()
+        self._write_lock = threading.Lock()
+        self._listeners: List[Callable[[RuleSnapshot], None]] = []
+        self._screen_lock_listeners: List[Callable[[bool], None]] = []
         self.is_active = False
         self.downtime_mode = False
-        self.monitor_thread = None
+        self.dispatcher: Optional[EventDispatcher] = None
         self.has_permissions = False
+        # Monotonic clock for every timestamp and deadline (virtual in replays)
+        self.clock = clock
+        # Optional TraceWriter recording every event the engine handles
+        self.recorder = None
+        # Optional AuditLog receiving one event per finished enforcement
+        self.audit = None
+        # Single thread applying update_apps_async() batches in order
+        self._loader: Optional[ThreadPoolExecutor] = None
         
-        if sys.platform == "darwin":
-            self.setup_macos_permissions()
-        
-        # Load private frameworks
-        self.workspace = NSWorkspace.sharedWorkspace()
-        self.load_private_frameworks()
+        # Platform specific process access (AppKit on macOS, psutil on Linux)
+        self.backend = backend or get_backend()
+        self.event_source = self.backend.watch()
+        # Per-stage enforcement latencies, labelled by rule kind and backend
+        self.metrics = MetricsRegistry()
+        self.terminator = Terminator(self.backend, clock=clock,
+                                     on_finished=self._record_enforcement)
+        # Known processes and cached decisions, owned by the dispatcher thread
+        self.table = ProcessTable(self.backend.identify, self.backend.start_time)
+        # Wakeup planning for the dispatcher thread
+        self.scheduler = MonitorScheduler(clock=clock)
+        self.scheduler.set_enforcing(False)
+        self.backend.watch_screen_lock(self._screen_lock_changed)
+        self.setup_permissions()
     
-    def setup_macos_permissions(self):
-        """Setup and check macOS permissions"""
-        try:
-            # Import required frameworks
-            from ApplicationServices import AXIsProcessTrusted, AXIsProcessTrustedWithOptions
-            from Foundation import NSDictionary
-            
-            # Check if we have permissions
-            trusted = AXIsProcessTrusted()
-            if not trusted:
-                # This will trigger the system permission prompt
-                options = NSDictionary.dictionaryWithObject_forKey_(False, "AXTrustedCheckOptionPrompt")
-                AXIsProcessTrustedWithOptions(options)
-                
-                # Show our custom guidance
-                self.show_permission_guidance()
-                return False
-            
+    def setup_permissions(self):
+        """Setup and check process-management permissions"""
+        if self.backend.check_permissions(prompt=True):
             self.has_permissions = True
             return True
-            
-        except Exception as e:
-            print(f"Error checking permissions: {e}")
-            return False
+        
+        if sys.platform == "darwin":
+            # Show our custom guidance
+            self.show_permission_guidance()
+        return False
     
     def show_permission_guidance(self):
         """Show guidance for enabling permissions"""
+        from PyQt6.QtWidgets import QMessageBox
         msg = QMessageBox()
         msg.setIcon(QMessageBox.Icon.Information)
         msg.setWindowTitle("Permission Required")
@@ -68,140 +90,295 @@ class BlockingManager:
         )
         msg.exec()
     
+    @property
+    def blocked_apps(self) -> frozenset:
+        """Paths of the blocked applications (read-only)"""
+        return self.snapshot.paths
+
+    @property
+    def rules(self) -> RuleSet:
+        return self.snapshot.rules
+
+    def add_listener(self, callback: Callable[[RuleSnapshot], None]):
+        """Call callback with each newly published snapshot (on the writer's thread)"""
+        self._listeners.append(callback)
+
+    def _update(self, change: Callable[[RuleSnapshot], RuleSnapshot]):
+        """Apply change to the current snapshot and publish the result"""
+        with self._write_lock:
+            snapshot = change(self.snapshot)
+            self.snapshot = snapshot
+        self._update_scheduler()
+        if self.dispatcher:
+            # Re-check running processes against the new rules right away
+            self.dispatcher.request_sweep()
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                log.exception("Rule listener error: %s", e)
+
+    def _run_on_monitor(self, function: Callable[[], None]):
+        """Run function on the dispatcher thread, or right here if it is stopped"""
+        dispatcher = self.dispatcher
+        if dispatcher and dispatcher.is_alive():
+            dispatcher.call(function)
+        else:
+            function()
+
+    def _update_scheduler(self):
+        enforcing = bool(self.snapshot.rules) or self.downtime_mode
+        self._run_on_monitor(lambda: self.scheduler.set_enforcing(enforcing))
+
+    def add_screen_lock_listener(self, callback: Callable[[bool], None]):
+        """Call callback(locked) when the screen locks or unlocks (on the notifying thread)"""
+        self._screen_lock_listeners.append(callback)
+
+    def _screen_lock_changed(self, locked: bool):
+        self._run_on_monitor(lambda: self.scheduler.set_screen_locked(locked))
+        for callback in self._screen_lock_listeners:
+            try:
+                callback(locked)
+            except Exception as e:
+                log.exception("Screen lock listener error: %s", e)
+
+    def wakeups_per_minute(self) -> int:
+        """How often the monitor thread woke up over the last minute"""
+        return self.scheduler.wakeups_per_minute()
+
     def add_app(self, app_path: str):
         """Add an application to block list"""
         try:
             # Verify it's a valid app bundle
-            bundle = NSBundle.bundleWithPath_(app_path)
-            if bundle:
-                self.blocked_apps.add(app_path)
-                print(f"Successfully added {app_path} to block list")  # Debug print
-                print(f"Current blocked apps: {self.blocked_apps}")  # Debug print
+            if self.backend.is_valid_app(app_path):
+                app_rules = self.backend.app_rules(app_path)
+                self._update(lambda snapshot: snapshot.with_app(app_path, app_rules))
+                log.info("Added %s to block list", app_path)
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Current blocked apps: %s", sorted(self.blocked_apps))
                 return True
-            print(f"Failed to add {app_path} - not a valid bundle")  # Debug print
+            log.warning("Failed to add %s - not a valid bundle", app_path)
             return False
         except Exception as e:
-            print(f"Error adding app: {e}")
+            log.error("Error adding app: %s", e)
             return False
     
+    def add_apps(self, app_paths: Iterable[str]):
+        """Add several applications with a single rule recompilation"""
+        valid = {}
+        for app_path in app_paths:
+            try:
+                if self.backend.is_valid_app(app_path):
+                    valid[app_path] = self.backend.app_rules(app_path)
+            except Exception as e:
+                log.error("Error adding app: %s", e)
+
+        def change(snapshot):
+            apps = dict(snapshot.apps)
+            apps.update((path, tuple(rules)) for path, rules in valid.items())
+            return RuleSnapshot(apps, snapshot.extra, snapshot.version + 1, snapshot.rules)
+
+        self._update(change)
+        return list(valid)
+
+    def add_rule(self, rule: Rule):
+        """Block everything matching rule"""
+        self._update(lambda snapshot: snapshot.with_rule(rule))
+
+    def remove_rule(self, rule: Rule):
+        """Stop blocking by rule"""
+        self._update(lambda snapshot: snapshot.without_rule(rule))
+
     def toggle_blocking(self, state: bool):
         """Toggle the blocking state"""
-        print(f"Toggling blocking to {state}")  # Debug print
+        log.debug("Toggling blocking to %s", state)
         if state and not self.has_permissions:
-            print("No permissions, requesting...")  # Debug print
-            self.setup_macos_permissions()
+            log.warning("No permissions, requesting...")
+            self.setup_permissions()
             return False
         
         self.is_active = state
         if state:
-            print("Starting blocking thread...")  # Debug print
             self.start_blocking()
         else:
-            print("Stopping blocking...")  # Debug print
             self.stop_blocking()
         return True
     
-    def _monitor_processes(self):
-        """Monitor and terminate blocked processes"""
-        print(f"Starting monitor with blocked apps: {self.blocked_apps}")
-        
-        while self.is_active:
+    def decide(self, process: ProcessInfo, rules: Optional[RuleSet] = None) -> Optional[Rule]:
+        """Return the rule that blocks process, or None if it may run"""
+        if rules is None:
+            rules = self.rules
+        if rules.team_ids and process.team_id is None:
+            process.team_id = self.backend.team_id(process)
+        return rules.match(process)
+
+    def _handle_event(self, event: ProcessEvent):
+        """Decide whether a launched/activated process must be blocked"""
+        if self.recorder:
+            self.recorder.write(event)
+        if event.kind == TERMINATED:
+            self.table.forget(event.process.pid)
+            self.terminator.exited(event.process.pid)
+            return
+        self.table.add(event.process)
+        rule = self.table.decide(event.process, self.rules, self.decide)
+        if rule:
+            self._enforce(event.process, rule, event.timestamp)
+
+    def _reconcile(self):
+        """Safety-net sweep, evaluating only what changed since the last one"""
+        # Processes found by a sweep count as detected when it started
+        detected = self.clock()
+        rules = self.rules
+        new = self.table.sync(self.backend.list_pids())
+        # A rule change means every known process needs a fresh decision
+        candidates = list(self.table.processes.values()) if self.table.stale(rules) else new
+        for process in candidates:
             try:
-                workspace = NSWorkspace.sharedWorkspace()
-                running_apps = workspace.runningApplications()
-                
-                for app in running_apps:
-                    try:
-                        if not app.bundleURL():
-                            continue
-                            
-                        app_path = app.bundleURL().path()
-                        if app_path in self.blocked_apps:
-                            print(f"Blocking {app_path}")
-                            
-                            # Use Apple Events to quit the app
-                            bundle_id = app.bundleIdentifier()
-                            if bundle_id:
-                                script = f'''
-                                    tell application "System Events"
-                                        tell application "{bundle_id}"
-                                            quit
-                                        end tell
-                                    end tell
-                                '''
-                                os.system(f"osascript -e '{script}'")
-                                print(f"Sent quit command to {bundle_id}")
-                                
-                    except Exception as e:
-                        print(f"Error handling app: {e}")
-                        
+                self.table.decide(process, rules, self.decide)
             except Exception as e:
-                print(f"Monitor error: {e}")
-            time.sleep(1) 
-    
+                log.exception("Error handling app: %s", e)
+        # Anything still blocked and running gets another attempt
+        for pid in list(self.table.blocked):
+            process = self.table.processes[pid]
+            self._enforce(process, self.table.decide(process, rules, self.decide), detected)
+
+    def _enforce(self, process: ProcessInfo, rule: Optional[Rule] = None,
+                 detected: Optional[float] = None):
+        """Hand a blocked process to the termination pipeline"""
+        if self.terminator.submit(process, detected, rule):
+            log.info("Blocking %s", process.path)
+
+    def _record_enforcement(self, attempt):
+        """Feed a finished kill attempt's stage timings into the histograms"""
+        rule = attempt.rule
+        # Rule kinds and backends are few; rule values would be a series per rule
+        labels = {
+            "rule": rule.kind if rule else "manual",
+            "backend": self.backend.name,
+        }
+        if self.audit is not None:
+            process = attempt.process
+            self.audit.record(APP_BLOCKED, pid=process.pid, path=process.path,
+                              bundle_id=process.bundle_id,
+                              rule=f"{rule.kind}:{rule.value}" if rule else "manual",
+                              success=attempt.success, forced=attempt.forced)
+        self.metrics.observe(DETECT_TO_DECIDE, attempt.requested - attempt.detected, **labels)
+        if attempt.signaled is None:
+            return
+        self.metrics.observe(DECIDE_TO_SIGNAL, attempt.signaled - attempt.requested, **labels)
+        if attempt.success:
+            self.metrics.observe(SIGNAL_TO_EXIT, attempt.finished - attempt.signaled, **labels)
+            self.metrics.observe(DETECT_TO_EXIT, attempt.finished - attempt.detected, **labels)
+
     def remove_app(self, app_path: str):
         """Remove an application from block list"""
-        self.blocked_apps.discard(app_path)
-        print(f"Removed {app_path} from block list")
+        self._update(lambda snapshot: snapshot.without_app(app_path))
+        log.info("Removed %s from block list", app_path)
+
+    def remove_apps(self, app_paths: Iterable[str]):
+        """Remove several applications with a single rule recompilation"""
+        removed = set(app_paths)
+
+        def change(snapshot):
+            apps = {path: rules for path, rules in snapshot.apps.items() if path not in removed}
+            return RuleSnapshot(apps, snapshot.extra, snapshot.version + 1, snapshot.rules)
+
+        self._update(change)
+
+    def update_apps_async(self, added: Iterable[str] = (), removed: Iterable[str] = (),
+                          clear: bool = False) -> Future:
+        """Apply a batch of block list changes on a background thread
+
+        Validating thousands of bundles reads each one from disk, so the GUI
+        hands batches over here. Batches are applied in the order given;
+        within one, clear goes first, then removals, then additions.
+        """
+        added, removed = list(added), list(removed)
+
+        def apply():
+            if clear:
+                self.clear_apps()
+            if removed:
+                self.remove_apps(removed)
+            if added:
+                self.add_apps(added)
+
+        with self._write_lock:
+            if self._loader is None:
+                self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rule-loader")
+            return self._loader.submit(apply)
+
+    def clear_apps(self):
+        """Remove every application from the block list"""
+        self._update(lambda snapshot: snapshot.cleared())
     
     def set_downtime_mode(self, enabled: bool):
         """Set downtime mode"""
         self.downtime_mode = enabled
+        self._update_scheduler()
         if enabled and not self.is_active:
             self.start_blocking()
     
     def start_blocking(self):
-        """Start the blocking monitor thread"""
-        if not self.monitor_thread or not self.monitor_thread.is_alive():
-            print("Starting blocking thread")
-            self.monitor_thread = threading.Thread(target=self._monitor_processes, daemon=True)
-            self.monitor_thread.start()
+        """Start listening for launches and dispatching them"""
+        if not self.dispatcher or not self.dispatcher.is_alive():
+            log.info("Starting blocking thread")
+            self.terminator.start()
+            self.dispatcher = EventDispatcher(
+                self.event_source,
+                self._handle_event,
+                reconcile=self._reconcile,
+                clock=self.clock,
+                scheduler=self.scheduler,
+            )
+            self.dispatcher.start()
     
     def stop_blocking(self):
-        """Stop the blocking monitor thread"""
-        print("Stopping blocking")
-        self.is_active = False 
+        """Stop the blocking dispatcher"""
+        log.info("Stopping blocking")
+        self.is_active = False
+        if self.dispatcher:
+            self.dispatcher.stop()
+            self.dispatcher = None
+        self.terminator.stop() 
     
-    def load_private_frameworks(self):
-        """Load required private frameworks"""
-        try:
-            # Load Apple's private frameworks
-            objc.loadBundle('CoreServices',
-                          bundle_path='/System/Library/Frameworks/CoreServices.framework',
-                          module_globals=globals())
-                          
-            objc.loadBundle('ApplicationServices',
-                          bundle_path='/System/Library/Frameworks/ApplicationServices.framework',
-                          module_globals=globals())
-        except Exception as e:
-            print(f"Failed to load frameworks: {e}")
+    def start_recording(self, path: str):
+        """Record every event the engine handles to a trace file for replay"""
+        writer = TraceWriter(path)
+
+        def begin():
+            self._close_recorder()
+            # Running processes first, so a replay starts from the same state
+            now = self.clock()
+            for process in self.backend.enumerate():
+                writer.write(ProcessEvent(LAUNCHED, process, now))
+            self.recorder = writer
+
+        self._run_on_monitor(begin)
+
+    def stop_recording(self):
+        """Finish the current trace file, if any"""
+        self._run_on_monitor(self._close_recorder)
+
+    def _close_recorder(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
 
     def check_permissions(self):
         """Check and request permissions properly"""
-        try:
-            # Check if we have accessibility permissions
-            trusted = AXIsProcessTrusted()
-            if not trusted:
-                # Request permissions through official API
-                options = {kAXTrustedCheckOptionPrompt: True}
-                AXIsProcessTrustedWithOptions(options)
-                return False
-            return True
-        except Exception as e:
-            print(f"Permission check failed: {e}")
-            return False
+        return self.backend.check_permissions(prompt=True)
 
     def block_app(self, bundle_id):
-        """Block an app using official APIs"""
+        """Terminate every running instance of bundle_id"""
         try:
-            # Use private API to control app
-            running_apps = self.workspace.runningApplications()
-            for app in running_apps:
-                if app.bundleIdentifier() == bundle_id:
-                    # Use proper termination API
-                    app.terminate()
-                    return True
-            return False
+            blocked = False
+            for process in self.backend.enumerate():
+                if process.bundle_id == bundle_id:
+                    self.terminator.start()
+                    blocked = self.terminator.submit(process) or blocked
+            return blocked
         except Exception as e:
-            print(f"Failed to block app: {e}")
+            log.error("Failed to block app: %s", e)
             return False 
\ No newline at end of file
@@ -0,0 +1,331 @@
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from logs import get_logger
+from scheduler import SWEEP_INTERVAL, MonitorScheduler
+
+log = get_logger(__name__)
+
+# Event kinds
+LAUNCHED = "launched"
+ACTIVATED = "activated"
+TERMINATED = "terminated"
+
+_STOP = object()
+_observer_class = None
+
+
+class ProcessInfo:
+    """Identity of a running process as seen by the blocking engine"""
+    __slots__ = ("pid", "path", "bundle_id", "name", "start_time", "executable", "team_id")
+
+    def __init__(self, pid: int, path: Optional[str] = None, bundle_id: Optional[str] = None,
+                 name: Optional[str] = None, start_time: Optional[float] = None,
+                 executable: Optional[str] = None, team_id: Optional[str] = None):
+        self.pid = pid
+        # Bundle path on macOS, executable path elsewhere
+        self.path = path
+        self.bundle_id = bundle_id
+        self.name = name
+        self.start_time = start_time
+        # Executable file name, when it differs from the basename of path
+        self.executable = executable
+        # Code-signing team identifier, filled in lazily by the backend
+        self.team_id = team_id
+
+    def __repr__(self):
+        return f"ProcessInfo(pid={self.pid}, path={self.path!r}, bundle_id={self.bundle_id!r})"
+
+
+class ProcessEvent:
+    """A single launch/activate/exit notification"""
+    __slots__ = ("kind", "process", "timestamp")
+
+    def __init__(self, kind: str, process: ProcessInfo, timestamp: Optional[float] = None):
+        self.kind = kind
+        self.process = process
+        # Time the event was observed, used for latency measurements. Sources
+        # that cannot tell leave it None and EventDispatcher stamps it on
+        # receipt, so it is always on the dispatcher's clock.
+        self.timestamp = timestamp
+
+
+class EventSource:
+    """Base class for anything that reports process launches"""
+
+    def __init__(self):
+        self._callback: Optional[Callable[[ProcessEvent], None]] = None
+
+    def start(self, callback: Callable[[ProcessEvent], None]):
+        """Begin delivering events to callback"""
+        self._callback = callback
+
+    def stop(self):
+        """Stop delivering events"""
+        self._callback = None
+
+    def emit(self, event: ProcessEvent):
+        callback = self._callback
+        if callback:
+            callback(event)
+
+
+class FakeEventSource(EventSource):
+    """Event source driven by hand, for tests and latency measurements off macOS"""
+
+    def launch(self, pid: int, path: str, bundle_id: Optional[str] = None,
+               name: Optional[str] = None) -> ProcessEvent:
+        event = ProcessEvent(LAUNCHED, ProcessInfo(pid, path, bundle_id, name))
+        self.emit(event)
+        return event
+
+    def activate(self, pid: int, path: str, bundle_id: Optional[str] = None,
+                 name: Optional[str] = None) -> ProcessEvent:
+        event = ProcessEvent(ACTIVATED, ProcessInfo(pid, path, bundle_id, name))
+        self.emit(event)
+        return event
+
+    def exit(self, pid: int) -> ProcessEvent:
+        event = ProcessEvent(TERMINATED, ProcessInfo(pid))
+        self.emit(event)
+        return event
+
+
+class PollingEventSource(EventSource):
+    """Diffs successive process listings to synthesize launch/exit events
+
+    Used where the platform offers no launch notifications.
+    """
+
+    def __init__(self, snapshot: Callable[[], list], interval: float = 1.0):
+        super().__init__()
+        self.snapshot = snapshot
+        self.interval = interval
+        self._known = {}
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, callback):
+        super().start(callback)
+        if self._thread and self._thread.is_alive():
+            return
+        # Processes already running are handled by the reconciliation sweep
+        self._prime()
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        super().stop()
+        self._wake.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join()
+
+    def _prime(self):
+        self._known = {(p.pid, p.start_time): p for p in self.snapshot()}
+
+    def poll(self):
+        """Take one snapshot and emit events for whatever changed"""
+        current = {(p.pid, p.start_time): p for p in self.snapshot()}
+        for key, process in current.items():
+            if key not in self._known:
+                self.emit(ProcessEvent(LAUNCHED, process))
+        for key, process in self._known.items():
+            if key not in current:
+                self.emit(ProcessEvent(TERMINATED, process))
+        self._known = current
+
+    def _run(self):
+        while not self._wake.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                log.error("Process poll error: %s", e)
+
+
+def running_app_info(app) -> ProcessInfo:
+    """Build a ProcessInfo from an NSRunningApplication"""
+    url = app.bundleURL()
+    executable = app.executableURL()
+    return ProcessInfo(
+        app.processIdentifier(),
+        url.path() if url else None,
+        app.bundleIdentifier(),
+        app.localizedName(),
+        executable=executable.lastPathComponent() if executable else None,
+    )
+
+
+def _workspace_observer_class():
+    """Create the Objective-C observer class once (PyObjC forbids redefining it)"""
+    global _observer_class
+    if _observer_class is None:
+        import objc
+        from Foundation import NSObject
+        from AppKit import NSWorkspaceApplicationKey
+
+        class BBWorkspaceObserver(NSObject):
+            def initWithSource_(self, source):
+                self = objc.super(BBWorkspaceObserver, self).init()
+                if self is None:
+                    return None
+                self.source = source
+                return self
+
+            def appLaunched_(self, notification):
+                self._forward(LAUNCHED, notification)
+
+            def appActivated_(self, notification):
+                self._forward(ACTIVATED, notification)
+
+            def appTerminated_(self, notification):
+                self._forward(TERMINATED, notification)
+
+            @objc.python_method
+            def _forward(self, kind, notification):
+                try:
+                    app = notification.userInfo()[NSWorkspaceApplicationKey]
+                    self.source.emit(ProcessEvent(kind, running_app_info(app)))
+                except Exception as e:
+                    log.exception("Error handling workspace notification: %s", e)
+
+        _observer_class = BBWorkspaceObserver
+    return _observer_class
+
+
+class WorkspaceEventSource(EventSource):
+    """NSWorkspace did-launch / did-activate / did-terminate notifications (macOS)
+
+    Notifications are posted on the main run loop, which Qt drives on macOS.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._observer = None
+
+    def start(self, callback):
+        from AppKit import (
+            NSWorkspace,
+            NSWorkspaceDidLaunchApplicationNotification,
+            NSWorkspaceDidActivateApplicationNotification,
+            NSWorkspaceDidTerminateApplicationNotification,
+        )
+        super().start(callback)
+        if self._observer is not None:
+            return
+        self._observer = _workspace_observer_class().alloc().initWithSource_(self)
+        center = NSWorkspace.sharedWorkspace().notificationCenter()
+        for selector, name in (
+            ("appLaunched:", NSWorkspaceDidLaunchApplicationNotification),
+            ("appActivated:", NSWorkspaceDidActivateApplicationNotification),
+            ("appTerminated:", NSWorkspaceDidTerminateApplicationNotification),
+        ):
+            center.addObserver_selector_name_object_(self._observer, selector, name, None)
+
+    def stop(self):
+        super().stop()
+        if self._observer is None:
+            return
+        from AppKit import NSWorkspace
+        NSWorkspace.sharedWorkspace().notificationCenter().removeObserver_(self._observer)
+        self._observer = None
+
+
+class EventDispatcher:
+    """Funnels events from a source into a single handler thread
+
+    The thread sleeps until an event arrives or the scheduler's next
+    deadline (a reconciliation sweep or a timer), whichever comes first.
+    The reconcile callback is a full sweep that catches anything the source
+    missed.
+
+    Events are stamped with self.clock as the source emits them, unless the
+    source stamped them already (the proc connector passes the kernel's
+    CLOCK_MONOTONIC time, which is what the default clock reads).
+    """
+
+    def __init__(self, source: EventSource, handler: Callable[[ProcessEvent], None],
+                 reconcile: Optional[Callable[[], None]] = None,
+                 reconcile_interval: float = SWEEP_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic,
+                 scheduler: Optional[MonitorScheduler] = None):
+        self.source = source
+        self.handler = handler
+        self.reconcile = reconcile
+        self.clock = clock
+        self.scheduler = scheduler or MonitorScheduler(reconcile_interval, clock)
+        # Seconds from event observed to handler finished (launch-to-decision)
+        self.latencies = deque(maxlen=4096)
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        """Subscribe to the source and start the dispatch thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.source.start(self._receive)
+
+    def stop(self):
+        """Unsubscribe and stop the dispatch thread"""
+        self.source.stop()
+        self._queue.put(_STOP)
+
+    def _receive(self, event: ProcessEvent):
+        # Called on the source's thread
+        if event.timestamp is None:
+            event.timestamp = self.clock()
+        self._queue.put(event)
+
+    def is_alive(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def call(self, function: Callable[[], None]):
+        """Run function on the dispatch thread (scheduler state lives there)"""
+        self._queue.put(function)
+
+    def request_sweep(self):
+        """Run the reconcile callback as soon as the queued events are handled"""
+        self.call(self.scheduler.sweep_now)
+
+    def _sweep(self):
+        if self.reconcile:
+            try:
+                self.reconcile()
+            except Exception as e:
+                log.exception("Reconcile error: %s", e)
+        self.scheduler.sweep_done()
+
+    def _run(self):
+        scheduler = self.scheduler
+        # Sweep once up front so already-running apps are caught
+        self._sweep()
+
+        while True:
+            try:
+                event = self._queue.get(timeout=scheduler.timeout())
+            except queue.Empty:
+                event = None
+            scheduler.record_wakeup()
+
+            if event is _STOP:
+                break
+            if isinstance(event, ProcessEvent):
+                try:
+                    self.handler(event)
+                except Exception as e:
+                    log.exception("Error handling event: %s", e)
+                self.latencies.append(self.clock() - event.timestamp)
+            elif event is not None:
+                try:
+                    event()
+                except Exception as e:
+                    log.exception("Error in dispatcher call: %s", e)
+
+            scheduler.run_due_timers()
+            if scheduler.sweep_due():
+                self._sweep()
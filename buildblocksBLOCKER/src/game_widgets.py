@@ -1,28 +1,128 @@
+from collections import OrderedDict
 from PyQt6.QtWidgets import QPushButton, QFrame, QVBoxLayout, QLabel, QWidget
 from PyQt6.QtCore import Qt, QSize, QRect
-from PyQt6.QtGui import QPainter, QColor, QPen, QBrush, QLinearGradient
+from PyQt6.QtGui import QPainter, QColor, QPen, QBrush, QLinearGradient, QPixmap
 from icons import GameIcons
 
+# Colors of GameButton's chrome and text; theme changes call BUTTON_CACHE.invalidate()
+BUTTON_COLORS = {
+    "hover_top": "#2F3B46",
+    "hover_bottom": "#1E2328",
+    "border": "#785A28",
+    "border_checked": "#0AC8B9",
+    "text": "#C8AA6E",
+    "text_checked": "#0AC8B9",
+}
+ICON_SIZE = 24
+
+class ButtonRenderCache:
+    """Pre-rendered GameButton backgrounds, borders and icons
+    
+    Chrome pixmaps are keyed by (hover, checked, size, device pixel ratio),
+    so a resize or a move to another screen simply uses another entry; the
+    least recently used are dropped beyond max_entries. Icons are created
+    once per type and rasterized once per pixel size. Shared by every button.
+    """
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        # Off only for comparison in benchmarks/bench_ui.py
+        self.enabled = True
+        self._chrome = OrderedDict()
+        self._icons = {}
+        self._icon_pixmaps = {}
+        self._text_colors = {}
+    
+    def invalidate(self):
+        """Drop everything, e.g. after BUTTON_COLORS changed"""
+        self._chrome.clear()
+        self._icons.clear()
+        self._icon_pixmaps.clear()
+        self._text_colors.clear()
+    
+    def chrome(self, hover, checked, size, dpr):
+        key = (hover, checked, size.width(), size.height(), dpr)
+        pixmap = self._chrome.get(key)
+        if pixmap is None:
+            pixmap = self._chrome[key] = render_chrome(hover, checked, size, dpr)
+            if len(self._chrome) > self.max_entries:
+                self._chrome.popitem(last=False)
+        else:
+            self._chrome.move_to_end(key)
+        return pixmap
+    
+    def icon(self, icon_type):
+        icon = self._icons.get(icon_type)
+        if icon is None:
+            factory = ICON_FACTORIES.get(icon_type)
+            if factory is None:
+                return None
+            icon = self._icons[icon_type] = factory()
+        return icon
+    
+    def icon_pixmap(self, icon_type, size, dpr):
+        key = (icon_type, size, dpr)
+        pixmap = self._icon_pixmaps.get(key)
+        if pixmap is None:
+            pixmap = self.icon(icon_type).pixmap(QSize(size, size), dpr)
+            self._icon_pixmaps[key] = pixmap
+        return pixmap
+    
+    def text_color(self, checked):
+        color = self._text_colors.get(checked)
+        if color is None:
+            color = self._text_colors[checked] = QColor(
+                BUTTON_COLORS["text_checked" if checked else "text"])
+        return color
+
+def render_chrome(hover, checked, size, dpr):
+    """Background and border of a GameButton in the given state"""
+    pixmap = QPixmap(round(size.width() * dpr), round(size.height() * dpr))
+    pixmap.setDevicePixelRatio(dpr)
+    pixmap.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(pixmap)
+    paint_chrome(painter, hover, checked, QRect(0, 0, size.width(), size.height()))
+    painter.end()
+    return pixmap
+
+def paint_chrome(painter, hover, checked, rect):
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    
+    # Draw button background with hover effect
+    if hover:
+        gradient = QLinearGradient(0, 0, 0, rect.height())
+        gradient.setColorAt(0, QColor(BUTTON_COLORS["hover_top"]))
+        gradient.setColorAt(1, QColor(BUTTON_COLORS["hover_bottom"]))
+        painter.fillRect(rect, gradient)
+    
+    # Draw border
+    border_color = QColor(BUTTON_COLORS["border_checked" if checked else "border"])
+    painter.setPen(QPen(border_color, 2))
+    painter.drawRoundedRect(rect.adjusted(1, 1, -1, -1), 3, 3)
+
+ICON_FACTORIES = {
+    "guardian": GameIcons.create_shield_icon,
+    "add": GameIcons.create_add_icon,
+    "remove": GameIcons.create_remove_icon,
+    "time": GameIcons.create_time_icon,
+    "lockdown": GameIcons.create_lockdown_icon
+}
+
+BUTTON_CACHE = ButtonRenderCache()
+
 class GameButton(QPushButton):
     def __init__(self, text, icon_type=None, parent=None):
         super().__init__(text, parent)
         self.setObjectName("GameButton")
         self.hover = False
+        self.icon_type = icon_type if icon_type in ICON_FACTORIES else None
         
         # Set icon based on button type
-        if icon_type:
-            self.setIcon(self._get_icon(icon_type))
-            self.setIconSize(QSize(24, 24))
+        if self.icon_type:
+            self.setIcon(self._get_icon(self.icon_type))
+            self.setIconSize(QSize(ICON_SIZE, ICON_SIZE))
     
     def _get_icon(self, icon_type):
-        icon_map = {
-            "guardian": GameIcons.create_shield_icon,
-            "add": GameIcons.create_add_icon,
-            "remove": GameIcons.create_remove_icon,
-            "time": GameIcons.create_time_icon,
-            "lockdown": GameIcons.create_lockdown_icon
-        }
-        return icon_map.get(icon_type, lambda: None)()
+        return BUTTON_CACHE.icon(icon_type)
     
     def enterEvent(self, event):
         self.hover = True
@@ -36,25 +136,23 @@ class GameButton(QPushButton):
     
     def paintEvent(self, event):
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
-        # Draw button background with hover effect
-        if self.hover:
-            gradient = QLinearGradient(0, 0, 0, self.height())
-            gradient.setColorAt(0, QColor("#2F3B46"))
-            gradient.setColorAt(1, QColor("#1E2328"))
-            painter.fillRect(self.rect(), gradient)
+        checked = self.isChecked()
+        dpr = self.devicePixelRatioF()
+        cache = BUTTON_CACHE
         
-        # Draw border
-        border_color = QColor("#0AC8B9") if self.isChecked() else QColor("#785A28")
-        painter.setPen(QPen(border_color, 2))
-        painter.drawRoundedRect(self.rect().adjusted(1, 1, -1, -1), 3, 3)
+        # Background and border, rendered once per state, size and DPR
+        if cache.enabled:
+            painter.drawPixmap(0, 0, cache.chrome(self.hover, checked, self.size(), dpr))
+        else:
+            paint_chrome(painter, self.hover, checked, self.rect())
         
         # Draw text and icon
-        if self.icon():
-            icon_rect = QRect(8, (self.height() - 24) // 2, 24, 24)
-            self.icon().paint(painter, icon_rect)
+        icon_top = (self.height() - ICON_SIZE) // 2
+        if self.icon_type and cache.enabled:
+            painter.drawPixmap(8, icon_top, cache.icon_pixmap(self.icon_type, ICON_SIZE, dpr))
+        elif not self.icon().isNull():
+            self.icon().paint(painter, QRect(8, icon_top, ICON_SIZE, ICON_SIZE))
             
-        painter.setPen(QColor("#0AC8B9") if self.isChecked() else QColor("#C8AA6E"))
+        painter.setPen(cache.text_color(checked))
         text_rect = self.rect().adjusted(40, 0, -8, 0)  # Leave space for icon
         painter.drawText(text_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, self.text()) 
\ No newline at end of file
@@ -1,126 +1,300 @@
-from PyQt6.QtGui import QIcon, QPainter, QPixmap, QColor, QPen, QBrush, QPainterPath
-from PyQt6.QtCore import Qt, QRect, QPoint, QSize
+import hashlib
+import json
+import os
+from PyQt6.QtGui import (QIcon, QIconEngine, QImage, QPainter, QPixmap, QColor, QPen, QBrush,
+                         QPainterPath)
+from PyQt6.QtCore import Qt, QRect, QRectF, QSize
+from logs import get_logger
+
+log = get_logger(__name__)
+
+# Icons are drawn in a DESIGN x DESIGN space and scaled to each size
+DESIGN = 32
+# Logical sizes and device pixel ratios rasterized into the atlas
+ATLAS_SIZES = (16, 24, 32, 48, 64)
+ATLAS_SCALES = (1, 2)
+# Bump when the geometry below changes; colors are part of the cache key
+ATLAS_VERSION = 1
+
+ICON_COLORS = {
+    "frame": "#785A28",
+    "fill": "#005A82",
+    "accent": "#0AC8B9",
+    "tile": "#1E2328",
+}
+
+def _shield():
+    path = QPainterPath()
+    path.moveTo(16, 2)
+    path.lineTo(28, 32/3)
+    path.lineTo(28, 64/3)
+    path.quadTo(16, 30, 4, 64/3)
+    path.lineTo(4, 32/3)
+    path.lineTo(16, 2)
+    return [(path, "frame", "fill")]
+
+def _plus():
+    path = QPainterPath()
+    path.moveTo(8, 16)
+    path.lineTo(24, 16)
+    path.moveTo(16, 8)
+    path.lineTo(16, 24)
+    return [(path, "accent", None)]
+
+def _minus():
+    path = QPainterPath()
+    path.moveTo(8, 16)
+    path.lineTo(24, 16)
+    return [(path, "accent", None)]
+
+def _clock():
+    face = QPainterPath()
+    face.addEllipse(4, 4, 24, 24)
+    hands = QPainterPath()
+    hands.moveTo(16, 8)
+    hands.lineTo(16, 16)
+    hands.lineTo(24, 16)
+    return [(face, "frame", "fill"), (hands, "accent", None)]
+
+def _lock():
+    body = QPainterPath()
+    body.addRoundedRect(8, 14, 16, 14, 2, 2)
+    shackle = QPainterPath()
+    shackle.moveTo(11, 14)
+    shackle.lineTo(11, 10)
+    shackle.arcTo(11, 6, 10, 8, 180, -180)
+    shackle.lineTo(21, 14)
+    return [(body, "frame", "fill"), (shackle, "frame", None)]
+
+def _app_tile():
+    path = QPainterPath()
+    path.addRoundedRect(4, 4, 24, 24, DESIGN/6, DESIGN/6)
+    return [(path, "frame", "tile")]
+
+# Icon name -> builder of its (path, pen color, brush color) layers
+ICON_SHAPES = {
+    "shield": _shield,
+    "add": _plus,
+    "remove": _minus,
+    "time": _clock,
+    "lockdown": _lock,
+    "app_placeholder": _app_tile,
+}
+
+def default_atlas_path():
+    return os.path.expanduser("~/Library/Caches/BuildBlock/icon-atlas.png")
+
+class IconAtlas:
+    """Every icon at every size in one image, built or loaded on first use
+
+    Each icon's QPainterPaths are built once and rasterized at each pixel
+    size in ATLAS_SIZES x ATLAS_SCALES, one row per pixel size. With a
+    cache path the atlas is saved as PNG named after a hash of the version,
+    sizes and colors, so later starts decode one file instead of drawing.
+    Icons from icon() paint straight from the atlas's sub-rects.
+    """
+    def __init__(self, cache_path=None, colors=None):
+        self.cache_path = cache_path
+        self.colors = dict(colors or ICON_COLORS)
+        self.names = list(ICON_SHAPES)
+        self.pixel_sizes = sorted({size * scale for size in ATLAS_SIZES for scale in ATLAS_SCALES})
+        self._rows = {}
+        top = 0
+        for pixels in self.pixel_sizes:
+            self._rows[pixels] = top
+            top += pixels
+        self.size = QSize(max(self.pixel_sizes) * len(self.names), top)
+        self._image = None
+        self._pixmap = None
+        self._shapes = {}
+
+    def key(self):
+        spec = json.dumps([ATLAS_VERSION, self.names, self.pixel_sizes, self.colors])
+        return hashlib.sha1(spec.encode()).hexdigest()[:16]
+
+    def file_path(self):
+        if not self.cache_path:
+            return None
+        base, ext = os.path.splitext(self.cache_path)
+        return f"{base}-{self.key()}{ext or '.png'}"
+
+    def image(self):
+        if self._image is None:
+            self._image = self._load() or self._build()
+        return self._image
+
+    def pixmap(self):
+        """The whole atlas as a pixmap (GUI thread only)"""
+        if self._pixmap is None:
+            self._pixmap = QPixmap.fromImage(self.image())
+        return self._pixmap
+
+    def rect(self, name, pixels):
+        """Atlas rect of name's variant closest to pixels (the next larger if inexact)"""
+        pixels = next((size for size in self.pixel_sizes if size >= pixels), self.pixel_sizes[-1])
+        column = self.names.index(name)
+        return QRect(column * max(self.pixel_sizes), self._rows[pixels], pixels, pixels)
+
+    def icon(self, name):
+        if name not in ICON_SHAPES:
+            raise KeyError(f"Unknown icon {name!r}")
+        return QIcon(AtlasIconEngine(self, name))
+
+    def shapes(self, name):
+        shapes = self._shapes.get(name)
+        if shapes is None:
+            shapes = self._shapes[name] = ICON_SHAPES[name]()
+        return shapes
+
+    def paint_icon(self, painter, name, rect):
+        """Draw name's vector geometry into rect"""
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.translate(rect.x(), rect.y())
+        painter.scale(rect.width() / DESIGN, rect.height() / DESIGN)
+        for path, pen, brush in self.shapes(name):
+            painter.setPen(QPen(QColor(self.colors[pen]), 2))
+            painter.setBrush(QBrush(QColor(self.colors[brush])) if brush else Qt.BrushStyle.NoBrush)
+            painter.drawPath(path)
+        painter.restore()
+
+    def _build(self):
+        image = QImage(self.size, QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(image)
+        for name in self.names:
+            for pixels in self.pixel_sizes:
+                self.paint_icon(painter, name, QRectF(self.rect(name, pixels)))
+        painter.end()
+        path = self.file_path()
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temporary = f"{path}.tmp"
+                if image.save(temporary, "PNG"):
+                    os.replace(temporary, path)
+            except OSError as e:
+                log.warning("Could not save icon atlas: %s", e)
+        return image
+
+    def _load(self):
+        path = self.file_path()
+        if not path or not os.path.exists(path):
+            return None
+        image = QImage(path)
+        if image.isNull() or image.size() != self.size:
+            return None
+        return image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+
+class AtlasIconEngine(QIconEngine):
+    """QIcon backend drawing one atlas entry, picking the variant per size
+
+    Without an atlas it draws from the shared one current at paint time,
+    so its icons follow set_icon_colors().
+    """
+    def __init__(self, atlas, name):
+        super().__init__()
+        self._atlas = atlas
+        self.name = name
+
+    @property
+    def atlas(self):
+        return self._atlas or icon_atlas()
+
+    def paint(self, painter, rect, mode, state):
+        pixels = round(max(rect.width(), rect.height()) * painter.device().devicePixelRatioF())
+        source = self.atlas.rect(self.name, pixels)
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        if mode == QIcon.Mode.Disabled:
+            painter.setOpacity(0.4)
+        painter.drawPixmap(rect, self.atlas.pixmap(), source)
+        painter.restore()
+
+    def pixmap(self, size, mode, state):
+        return self.scaledPixmap(size, mode, state, 1.0)
+
+    def scaledPixmap(self, size, mode, state, scale):
+        width, height = round(size.width() * scale), round(size.height() * scale)
+        source = self.atlas.rect(self.name, max(width, height))
+        if mode == QIcon.Mode.Disabled or source.size() != QSize(width, height):
+            pixmap = QPixmap(width, height)
+            pixmap.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+            if mode == QIcon.Mode.Disabled:
+                painter.setOpacity(0.4)
+            painter.drawPixmap(QRect(0, 0, width, height), self.atlas.pixmap(), source)
+            painter.end()
+        else:
+            pixmap = self.atlas.pixmap().copy(source)
+        pixmap.setDevicePixelRatio(scale)
+        return pixmap
+
+    def actualSize(self, size, mode, state):
+        side = min(size.width(), size.height())
+        return QSize(side, side)
+
+    def availableSizes(self, mode=QIcon.Mode.Normal, state=QIcon.State.Off):
+        return [QSize(size, size) for size in ATLAS_SIZES]
+
+    def clone(self):
+        return AtlasIconEngine(self._atlas, self.name)
+
+    def key(self):
+        return "AtlasIconEngine"
+
+_atlas = None
+
+def icon_atlas():
+    """The shared atlas, persisted under ~/Library/Caches/BuildBlock"""
+    global _atlas
+    if _atlas is None:
+        _atlas = IconAtlas(default_atlas_path())
+    return _atlas
+
+def set_icon_colors(colors):
+    """Recolor every GameIcons icon (e.g. for a theme); cached pixmaps need redrawing"""
+    global _atlas
+    _atlas = IconAtlas(default_atlas_path(), dict(ICON_COLORS, **colors))
+
+def shared_icon(name):
+    """Icon drawn from whichever shared atlas is current"""
+    if name not in ICON_SHAPES:
+        raise KeyError(f"Unknown icon {name!r}")
+    return QIcon(AtlasIconEngine(None, name))
 
 class GameIcons:
+    """Game-styled icons, all served from the shared IconAtlas
+
+    The size argument is kept for callers; every icon has all ATLAS_SIZES.
+    """
     @staticmethod
     def create_shield_icon(size=32):
         """Create shield icon for Guardian/Protection"""
-        pixmap = QPixmap(size, size)
-        pixmap.fill(Qt.GlobalColor.transparent)
-        
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
-        # Draw shield shape
-        painter.setPen(QPen(QColor("#785A28"), 2))
-        painter.setBrush(QBrush(QColor("#005A82")))
-        
-        # Shield path
-        path = QPainterPath()
-        path.moveTo(size/2, 2)
-        path.lineTo(size-4, size/3)
-        path.lineTo(size-4, 2*size/3)
-        path.quadTo(size/2, size-2, 4, 2*size/3)
-        path.lineTo(4, size/3)
-        path.lineTo(size/2, 2)
-        
-        painter.drawPath(path)
-        painter.end()
-        
-        icon = QIcon()
-        icon.addPixmap(pixmap)
-        return icon
+        return shared_icon("shield")
 
     @staticmethod
     def create_add_icon(size=32):
         """Create add application icon"""
-        pixmap = QPixmap(size, size)
-        pixmap.fill(Qt.GlobalColor.transparent)
-        
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
-        # Draw plus symbol
-        painter.setPen(QPen(QColor("#0AC8B9"), 2))
-        painter.drawLine(size/4, size/2, 3*size/4, size/2)
-        painter.drawLine(size/2, size/4, size/2, 3*size/4)
-        
-        painter.end()
-        
-        icon = QIcon()
-        icon.addPixmap(pixmap)
-        return icon
+        return shared_icon("add")
 
     @staticmethod
     def create_remove_icon(size=32):
         """Create remove application icon"""
-        pixmap = QPixmap(size, size)
-        pixmap.fill(Qt.GlobalColor.transparent)
-        
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
-        # Draw minus symbol
-        painter.setPen(QPen(QColor("#0AC8B9"), 2))
-        painter.drawLine(size/4, size/2, 3*size/4, size/2)
-        
-        painter.end()
-        
-        icon = QIcon()
-        icon.addPixmap(pixmap)
-        return icon
+        return shared_icon("remove")
 
     @staticmethod
     def create_time_icon(size=32):
         """Create time/schedule icon"""
-        pixmap = QPixmap(size, size)
-        pixmap.fill(Qt.GlobalColor.transparent)
-        
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
-        # Draw clock circle
-        painter.setPen(QPen(QColor("#785A28"), 2))
-        painter.setBrush(QBrush(QColor("#005A82")))
-        painter.drawEllipse(4, 4, size-8, size-8)
-        
-        # Draw clock hands
-        painter.setPen(QPen(QColor("#0AC8B9"), 2))
-        painter.drawLine(size/2, size/2, size/2, size/4)
-        painter.drawLine(size/2, size/2, 3*size/4, size/2)
-        
-        painter.end()
-        
-        icon = QIcon()
-        icon.addPixmap(pixmap)
-        return icon
+        return shared_icon("time")
 
     @staticmethod
     def create_lockdown_icon(size=32):
         """Create lockdown/downtime icon"""
-        pixmap = QPixmap(size, size)
-        pixmap.fill(Qt.GlobalColor.transparent)
-        
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
-        # Draw lock body
-        painter.setPen(QPen(QColor("#785A28"), 2))
-        painter.setBrush(QBrush(QColor("#005A82")))
-        painter.drawRoundedRect(8, 14, 16, 14, 2, 2)
-        
-        # Draw lock shackle
-        path = QPainterPath()
-        path.moveTo(11, 14)
-        path.lineTo(11, 10)
-        path.arcTo(11, 6, 10, 8, 180, 180)
-        path.lineTo(21, 14)
-        
-        painter.setPen(QPen(QColor("#785A28"), 2))
-        painter.drawPath(path)
-        
-        painter.end()
-        
-        icon = QIcon()
-        icon.addPixmap(pixmap)
-        return icon 
\ No newline at end of file
+        return shared_icon("lockdown")
+
+    @staticmethod
+    def create_app_placeholder_icon(size=32):
+        """Create placeholder shown while an application's own icon loads"""
+        return shared_icon("app_placeholder")
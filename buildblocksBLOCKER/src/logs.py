@@ -0,0 +1,157 @@
+"""Leveled logging for the app, written off-thread to a rotating file
+
+Modules log through get_logger(__name__) with %-style arguments, so nothing
+is formatted for a disabled level. setup_logging() puts a queue in front of
+the file and console handlers. Callers, including the monitor thread, merge
+a record's arguments into its message (QueueHandler.prepare() runs on the
+calling thread) and enqueue it; a listener thread formats the line and does
+the I/O.
+DuplicateFilter keeps a message that repeats (a blocked app relaunching
+every second, a failing poll) from flooding the log.
+
+BUILDBLOCK_LOG_LEVEL (e.g. DEBUG) overrides the default level.
+"""
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+ROOT = "buildblock"
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s [%(threadName)s] %(message)s"
+# Rotate the log file at this size, keeping this many old ones
+LOG_BYTES = 1024 * 1024
+LOG_BACKUPS = 5
+# A message repeated within DUPLICATE_INTERVAL seconds is let through
+# DUPLICATE_BURST times, then counted until the interval is over
+DUPLICATE_INTERVAL = 60.0
+DUPLICATE_BURST = 3
+# Distinct messages tracked before stale ones are forgotten
+DUPLICATE_KEYS = 1024
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def default_log_dir() -> str:
+    return os.path.expanduser("~/Library/Logs/BuildBlock")
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a module, under the app's root logger"""
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+class DuplicateFilter(logging.Filter):
+    """Rate-limits records with the same logger, level, message and arguments
+
+    The check uses the unformatted message and its arguments, so a dropped
+    record is never formatted. The first record after a quiet interval
+    reports how many were dropped.
+    """
+
+    def __init__(self, interval: float = DUPLICATE_INTERVAL, burst: int = DUPLICATE_BURST,
+                 clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.clock = clock
+        self._lock = threading.Lock()
+        # key -> [window start, records seen in the window, records dropped]
+        self._seen: Dict[Tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.levelno, record.msg, record.args)
+        try:
+            hash(key)
+        except TypeError:
+            key = key[:3]
+        now = self.clock()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                entry[1] += 1
+                if entry[1] <= self.burst:
+                    return True
+                entry[2] += 1
+                return False
+            if len(self._seen) >= DUPLICATE_KEYS:
+                self._forget(now)
+            self._seen[key] = [now, 1, 0]
+        if entry is not None and entry[2]:
+            if record.args and isinstance(record.args, tuple):
+                record.msg = f"{record.msg} (%d repeats suppressed)"
+                record.args = record.args + (entry[2],)
+            elif not record.args:
+                # Never %-formatted without arguments, so a literal % is fine
+                record.msg = f"{record.msg} ({entry[2]} repeats suppressed)"
+        return True
+
+    def _forget(self, now: float):
+        stale = [key for key, entry in self._seen.items() if now - entry[0] >= self.interval]
+        for key in stale:
+            del self._seen[key]
+        if len(self._seen) >= DUPLICATE_KEYS:
+            self._seen.clear()
+
+
+def setup_logging(log_dir: Optional[str] = None, level: int = logging.INFO,
+                  console: bool = True) -> str:
+    """Route the app's logging through a queue to a rotating file (and stderr)
+
+    Returns the log file's path. Safe to call again; the previous setup is
+    shut down first.
+    """
+    shutdown_logging()
+    log_dir = log_dir or default_log_dir()
+    os.makedirs(log_dir, exist_ok=True)
+    path = os.path.join(log_dir, "buildblock.log")
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    file_handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=LOG_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+    file_handler.setFormatter(formatter)
+    handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler(sys.stderr)
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
+
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(DuplicateFilter())
+
+    root = logging.getLogger(ROOT)
+    override = os.environ.get("BUILDBLOCK_LOG_LEVEL")
+    if override:
+        level = logging.getLevelName(override.upper())
+        if not isinstance(level, int):
+            level = logging.INFO
+    root.setLevel(level)
+    root.propagate = False
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    global _listener
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    return path
+
+
+def shutdown_logging():
+    """Write out queued records and close the log file"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    root = logging.getLogger(ROOT)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.propagate = True
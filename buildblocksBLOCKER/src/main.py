@@ -1,18 +1,25 @@
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                           QPushButton, QListWidget, QLabel, QSystemTrayIcon, QFileDialog, 
-                           QMenu, QMessageBox, QCheckBox, QFrame, QListWidgetItem)
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QIcon, QAction
+                           QPushButton, QListView, QLabel, QSystemTrayIcon, QFileDialog, 
+                           QMenu, QMessageBox, QCheckBox, QFrame, QLineEdit)
+from PyQt6.QtCore import Qt, QSize, QObject, QTimer, pyqtSignal
+from PyQt6.QtGui import QIcon, QAction, QActionGroup
+import audit
+from app_icons import ICON_SIZE, IconService
+from app_list_model import AppFilterProxyModel, BlockedAppsModel
 from blocker import BlockingManager
+from logs import get_logger, setup_logging, shutdown_logging
+from metrics import MetricsServer
 import sys
 import os
-from typing import Dict
 from settings import Settings
 from password_dialog import PasswordDialog
 from security import Security
+from themes import DEFAULT_THEME, THEME_LABELS, ThemeManager
 from game_widgets import GameButton
 from tutorial import Tutorial
 
+log = get_logger(__name__)
+
 class GameStyledFrame(QFrame):
     """A styled frame for grouping elements"""
     def __init__(self, title: str, parent=None):
@@ -20,6 +27,8 @@ class GameStyledFrame(QFrame):
         self.setObjectName("HeaderSection")
         
         layout = QVBoxLayout(self)
+        # The stylesheet's padding spaces the section already
+        layout.setContentsMargins(0, 0, 0, 0)
         
         # Add header
         header = QLabel(title)
@@ -29,21 +38,57 @@ class GameStyledFrame(QFrame):
         # Content widget
         self.content = QWidget()
         self.content_layout = QVBoxLayout(self.content)
+        self.content_layout.setContentsMargins(0, 0, 0, 0)
         layout.addWidget(self.content)
 
-class AppListItem(QListWidgetItem):
-    def __init__(self, app_path: str, parent=None):
-        super().__init__(parent)
-        self.app_path = app_path
-        self.app_name = os.path.basename(app_path)
-        
-        # Get the app's icon (macOS specific)
-        icon = QIcon(app_path)
-        self.setIcon(icon)
-        self.setText(self.app_name)
-        
-        # Set size hint for better display
-        self.setSizeHint(QSize(200, 40))
+class RuleSignals(QObject):
+    """Carries rule snapshot changes from any thread to the GUI thread"""
+    changed = pyqtSignal(object)
+
+class ScreenLockSignals(QObject):
+    """Carries screen lock/unlock notifications to the GUI thread"""
+    changed = pyqtSignal(bool)
+
+class SettingsSignals(QObject):
+    """Turns externally reloaded settings into fine-grained GUI-thread signals"""
+    # ({name: path} added or repointed, {names} removed), once per reload
+    blocked_apps_changed = pyqtSignal(object, object)
+    downtime_changed = pyqtSignal(bool)
+    password_changed = pyqtSignal()
+    changed = pyqtSignal(object)
+    
+    def dispatch(self, changes):
+        """Emit one signal per kind of change reported by Settings.reload"""
+        password_changed = False
+        added, removed = {}, set()
+        for change in changes:
+            if change.path[0] == "blocked_apps":
+                self._collect_blocked_apps(change, added, removed)
+            elif change.path == ("downtime_enabled",):
+                self.downtime_changed.emit(change.new is True)
+            elif change.path in (("salt",), ("password_verifier",)):
+                password_changed = True
+        if added or removed:
+            self.blocked_apps_changed.emit(added, removed)
+        if password_changed:
+            self.password_changed.emit()
+        self.changed.emit(changes)
+    
+    def _collect_blocked_apps(self, change, added, removed):
+        if len(change.path) == 2:
+            # One entry added, removed or pointed at a different path
+            old = {change.path[1]: change.old} if not change.added else {}
+            new = {change.path[1]: change.new} if not change.removed else {}
+        else:
+            # The whole list was replaced
+            old = change.old if isinstance(change.old, dict) else {}
+            new = change.new if isinstance(change.new, dict) else {}
+        for name in old:
+            removed.add(name)
+            added.pop(name, None)
+        for name, path in new.items():
+            if isinstance(path, str):
+                added[name] = path
 
 class AppBlocker(QMainWindow):
     def __init__(self):
@@ -54,8 +99,44 @@ class AppBlocker(QMainWindow):
         # Initialize managers
         self.settings = Settings()
         self.blocking_manager = BlockingManager()
-        self.security = Security()
-        self.app_paths: Dict[str, str] = {}
+        # Who changed the policy and every enforcement, hash-chained on disk
+        audit_dir = os.path.join(self.settings.settings_dir, "audit")
+        self.audit = audit.AuditLog(audit_dir)
+        # Enforcements have a chain and size budget of their own
+        self.enforcement_audit = audit.AuditLog(os.path.join(audit_dir, audit.ENFORCEMENT_STREAM))
+        for audit_log in (self.audit, self.enforcement_audit):
+            try:
+                audit_log.start()
+            except OSError as e:
+                log.error("Could not open audit log %s: %s", audit_log.directory, e)
+                # Later events are dropped instead of queued
+                audit_log.close()
+        self.blocking_manager.audit = self.enforcement_audit
+        self.security = Security(algorithm=self.settings.get_kdf_algorithm())
+        # One app-wide stylesheet, set before any widget is polished
+        self.themes = ThemeManager(parent=self)
+        if not self.themes.apply(self.settings.get_theme()):
+            self.themes.apply(DEFAULT_THEME)
+        # Ends the unlocked password session once it times out
+        self.session_timer = QTimer(self)
+        self.session_timer.setSingleShot(True)
+        self.session_timer.timeout.connect(self.expire_session)
+        self.screen_lock_signals = ScreenLockSignals()
+        self.screen_lock_signals.changed.connect(self.on_screen_lock_changed)
+        self.blocking_manager.add_screen_lock_listener(self.screen_lock_signals.changed.emit)
+        # Bundle icons are decoded on worker threads and cached on disk
+        self.icons = IconService(parent=self)
+        
+        # Get notified whenever the engine publishes new rules
+        self.rule_signals = RuleSignals()
+        self.blocking_manager.add_listener(self.rule_signals.changed.emit)
+        
+        # Enforcement latency histograms for local scrapers
+        self.metrics_server = MetricsServer(self.blocking_manager.metrics)
+        try:
+            self.metrics_server.start()
+        except OSError as e:
+            log.warning("Could not start metrics socket: %s", e)
         
         # Main widget and layout
         main_widget = QWidget()
@@ -95,9 +176,28 @@ class AppBlocker(QMainWindow):
         
         # Blocked Apps Section
         apps_frame = GameStyledFrame("Protected Applications")
-        self.app_list = QListWidget()
+        self.app_model = BlockedAppsModel(self.app_icon, self)
+        self.icons.ready.connect(self.app_model.icon_ready)
+        self.app_filter = AppFilterProxyModel(self)
+        self.app_filter.setSourceModel(self.app_model)
+        self.app_search = QLineEdit()
+        self.app_search.setPlaceholderText("Search protected applications")
+        self.app_search.setClearButtonEnabled(True)
+        # Filter once typing pauses; each pass visits every row
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(lambda: self.app_filter.set_query(self.app_search.text()))
+        self.app_search.textChanged.connect(self.search_timer.start)
+        apps_frame.content_layout.addWidget(self.app_search)
+        self.app_list = QListView()
+        self.app_list.setModel(self.app_filter)
+        # Rows are laid out from the first one's size; only visible rows are asked for data
+        self.app_list.setUniformItemSizes(True)
+        self.app_list.setIconSize(QSize(ICON_SIZE, ICON_SIZE))
         apps_frame.content_layout.addWidget(self.app_list)
-        layout.addWidget(apps_frame)
+        # The list takes the height the styled sections leave over
+        layout.addWidget(apps_frame, 1)
         
         # Schedule Section
         schedule_frame = GameStyledFrame("Time Restrictions")
@@ -117,17 +217,7 @@ class AppBlocker(QMainWindow):
         )
 
         for notice in [dev_notice_1, dev_notice_2]:
-            notice.setStyleSheet("""
-                QLabel {
-                    color: #C8AA6E;
-                    background: #1E2328;
-                    border: 1px solid #785A28;
-                    border-radius: 4px;
-                    padding: 8px;
-                    font-style: italic;
-                    font-size: 13px;
-                }
-            """)
+            notice.setObjectName("DevNotice")
             notice.setAlignment(Qt.AlignmentFlag.AlignCenter)
             dev_notice_layout.addWidget(notice)
 
@@ -139,9 +229,26 @@ class AppBlocker(QMainWindow):
         self.setup_tray_menu()
         
         # Load saved apps and settings
+        self.rule_signals.changed.connect(self.on_rules_changed)
         self.load_saved_apps()
         self.load_settings()
+        
+        # Pick up settings.json changes pushed while we are running
+        self.settings_signals = SettingsSignals()
+        self.settings_signals.blocked_apps_changed.connect(self.on_blocked_apps_changed)
+        self.settings_signals.downtime_changed.connect(self.on_downtime_changed)
+        self.settings_signals.password_changed.connect(self.lock_session)
+        self.settings_signals.changed.connect(self.on_settings_pushed)
+        self.settings.add_listener(self.settings_signals.dispatch)
+        self.settings.start_watching()
         if not self.settings.has_password():
+            if self.settings.get_password_salt():
+                QMessageBox.information(
+                    self,
+                    "Set Password Again",
+                    "Your password was saved by an older version of BuildBlock\n"
+                    "that could not check it after a restart. Please set it again."
+                )
             self.setup_initial_password()
         
         # Check if we have necessary permissions before enabling blocking
@@ -178,6 +285,22 @@ class AppBlocker(QMainWindow):
         reset_action.triggered.connect(self.reset_password)
         menu.addAction(reset_action)
         
+        # Enforcement latency report
+        stats_action = QAction("Enforcement Stats", self)
+        stats_action.triggered.connect(self.show_enforcement_stats)
+        menu.addAction(stats_action)
+        
+        # Theme choices, one checked
+        theme_menu = menu.addMenu("Theme")
+        theme_group = QActionGroup(self)
+        for name, label in THEME_LABELS.items():
+            action = QAction(label, self)
+            action.setCheckable(True)
+            action.setChecked(name == self.themes.theme)
+            action.triggered.connect(lambda checked, name=name: self.set_theme(name))
+            theme_group.addAction(action)
+            theme_menu.addAction(action)
+        
         menu.addSeparator()
         
         # Quit action
@@ -187,6 +310,11 @@ class AppBlocker(QMainWindow):
         
         self.tray_icon.setContextMenu(menu)
     
+    def set_theme(self, name):
+        """Switch the whole app to a theme and remember it"""
+        if self.themes.apply(name):
+            self.settings.set_theme(name)
+    
     def tray_icon_activated(self, reason):
         """Handle tray icon activation (usually double-click)"""
         if reason == QSystemTrayIcon.ActivationReason.DoubleClick:
@@ -198,6 +326,17 @@ class AppBlocker(QMainWindow):
         self.raise_()
         self.activateWindow()
     
+    def show_enforcement_stats(self):
+        """Show launch-to-termination latencies per stage"""
+        manager = self.blocking_manager
+        QMessageBox.information(
+            self,
+            "Enforcement Stats",
+            f"{manager.metrics.summary()}\n\n"
+            f"Monitor wakeups in the last minute: {manager.wakeups_per_minute()}\n"
+            f"Full histograms: {self.metrics_server.path}"
+        )
+    
     def quit_application(self):
         """Clean shutdown of the application"""
         if self.block_toggle.isChecked():
@@ -223,6 +362,14 @@ class AppBlocker(QMainWindow):
             downtime_enabled=self.downtime_toggle.isChecked()
         )
         
+        self.metrics_server.stop()
+        self.session_timer.stop()
+        self.security.shutdown()
+        self.icons.shutdown()
+        self.blocking_manager.stop_recording()
+        self.settings.close()
+        self.audit.close()
+        self.enforcement_audit.close()
         QApplication.quit()
     
     def closeEvent(self, event):
@@ -267,11 +414,32 @@ class AppBlocker(QMainWindow):
     def load_saved_apps(self):
         """Load previously saved blocked apps"""
         saved_apps = self.settings.load_blocked_apps()
-        for name, path in saved_apps.items():
-            list_item = AppListItem(path)
-            self.app_list.addItem(list_item)
-            self.app_paths[list_item.app_name] = path
-            self.blocking_manager.add_app(path)
+        self.app_model.add_apps(saved_apps)
+        self.blocking_manager.update_apps_async(added=saved_apps.values())
+    
+    def app_icon(self, path: str) -> QIcon:
+        return self.icons.icon(path, ICON_SIZE, self.devicePixelRatioF())
+    
+    def on_rules_changed(self, snapshot):
+        """Reflect a newly published rule snapshot in the UI"""
+        self.tray_icon.setToolTip(f"BuildBlock - {len(snapshot.apps)} apps blocked")
+    
+    def on_blocked_apps_changed(self, added, removed):
+        """Blocked apps changed by a settings reload (before the policy is vaulted) or a vault unlock"""
+        gone = self.app_model.remove_apps(removed - added.keys())
+        old_paths = {name: self.app_model.path(name) for name in added if name in self.app_model}
+        changed = self.app_model.add_apps(added)
+        stale = list(gone.values()) + [old_paths[name] for name in changed if name in old_paths]
+        self.blocking_manager.update_apps_async(added=changed.values(), removed=stale)
+    
+    def on_settings_pushed(self, changes):
+        """Record settings changed on disk by someone other than this app"""
+        self.audit.record(audit.SETTINGS_PUSHED, paths=[list(change.path) for change in changes])
+    
+    def on_downtime_changed(self, enabled):
+        """Full lockdown changed by a settings reload (before the policy is vaulted) or a vault unlock"""
+        self.downtime_toggle.setChecked(enabled)
+        self.blocking_manager.set_downtime_mode(enabled)
     
     def browse_for_app(self):
         try:
@@ -285,23 +453,26 @@ class AppBlocker(QMainWindow):
             )
             
             if file_path:
-                # Create custom list item with icon
-                list_item = AppListItem(file_path)
-                self.app_list.addItem(list_item)
-                self.app_paths[list_item.app_name] = file_path
-                self.blocking_manager.add_app(file_path)
-                self.settings.save_blocked_apps(self.app_paths)
+                name = os.path.basename(file_path)
+                old_path = self.app_model.path(name)
+                if old_path == file_path:
+                    return
+                self.app_model.add_apps({name: file_path})
+                self.blocking_manager.update_apps_async(added=[file_path],
+                                                        removed=[old_path] if old_path else [])
+                self.settings.add_blocked_app(name, file_path)
+                self.audit.record(audit.APP_ADDED, name=name, path=file_path)
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to add application: {str(e)}")
     
     def remove_selected_app(self):
-        current_item = self.app_list.currentItem()
-        if current_item and isinstance(current_item, AppListItem):
-            app_path = current_item.app_path
-            self.app_list.takeItem(self.app_list.row(current_item))
-            self.blocking_manager.remove_app(app_path)
-            del self.app_paths[current_item.app_name]
-            self.settings.save_blocked_apps(self.app_paths)
+        index = self.app_list.currentIndex()
+        if index.isValid():
+            name = self.app_model.name_at(self.app_filter.mapToSource(index).row())
+            app_path = self.app_model.remove_apps([name])[name]
+            self.blocking_manager.update_apps_async(removed=[app_path])
+            self.settings.remove_blocked_app(name)
+            self.audit.record(audit.APP_REMOVED, name=name, path=app_path)
             
     def toggle_blocking(self, checked):
         """Toggle application blocking with password protection"""
@@ -323,7 +494,13 @@ class AppBlocker(QMainWindow):
             
             self.blocking_manager.toggle_blocking(False)
         
+        self.audit.record(audit.BLOCKING_TOGGLED, enabled=checked)
+        self.show_blocking_state(checked)
+    
+    def show_blocking_state(self, checked):
+        """Reflect whether blocking is on in the controls"""
         text = "Disable BuildBlock" if checked else "Enable BuildBlock"
+        self.block_toggle.setChecked(checked)
         self.block_toggle.setText(text)
         self.tray_toggle_action.setText(text)
         self.add_button.setEnabled(not checked)
@@ -341,46 +518,126 @@ class AppBlocker(QMainWindow):
                 return
         
         # Update settings
-        settings = self.settings.load_settings()
-        settings["downtime_enabled"] = checked
-        self.settings.save_settings(settings)
+        self.settings.set_downtime_enabled(checked)
         
         # Update blocking manager
         self.blocking_manager.set_downtime_mode(checked)
+        self.audit.record(audit.DOWNTIME_TOGGLED, enabled=checked)
     
     def setup_initial_password(self):
         """Set up the initial password"""
         while True:
-            dialog = PasswordDialog(self, is_setup=True)
+            dialog = PasswordDialog(self, is_setup=True, check=self.security.set_password_async)
             if dialog.exec():
-                password, confirm = dialog.get_confirmed_password()
-                if password == confirm and password:
-                    salt = self.security.set_password(password)
-                    self.settings.save_password_salt(salt)
-                    # Start tutorial after password setup
+                self.security.accept(dialog.result_value)
+                self.settings.save_password(*dialog.result_value.credentials())
+                self.unlock_policy()
+                self.audit.record(audit.PASSWORD_SET)
+                self.start_session_timer()
+                # Start tutorial after password setup
+                if not self.settings.get_tutorial_shown():
                     self.tutorial.start()
                     self.settings.set_tutorial_shown(True)
-                    break
-                else:
-                    QMessageBox.warning(self, "Error", "Passwords do not match or are empty!")
+                break
             else:
                 # User cancelled - can't proceed without password
                 sys.exit(1)
     
     def verify_password(self) -> bool:
         """Verify password before allowing sensitive operations"""
-        dialog = PasswordDialog(self)
-        if dialog.exec():
-            salt = self.settings.get_password_salt()
-            if self.security.verify_password(dialog.get_password(), salt):
-                return True
-            QMessageBox.warning(self, "Error", "Incorrect password!")
+        if self.security.is_unlocked():
+            # Entered recently; no prompt and no key derivation
+            self.security.touch()
+            self.start_session_timer()
+            return True
+        if self.settings.vault_unlocked:
+            # The session timed out before its timer fired
+            self.lock_session()
+        salt = self.settings.get_password_salt()
+        verifier = self.settings.get_password_verifier()
+        kdf = self.settings.get_kdf_params()
+        # The dialog derives the key on a worker thread and stays responsive
+        dialog = PasswordDialog(self, check=lambda password: self.security.verify_password_async(
+            password, salt, verifier, kdf))
+        accepted = dialog.exec()
+        if dialog.failures:
+            self.audit.record(audit.UNLOCK_FAILED, attempts=dialog.failures, unlocked=bool(accepted))
+        if accepted:
+            self.security.accept(dialog.result_value)
+            self.unlock_policy()
+            upgrade = self.security.take_upgrade()
+            if upgrade:
+                # Stored at a cost below what this machine can now afford
+                self.settings.save_password(*upgrade)
+                self.settings.rekey_vault(self.security)
+            self.start_session_timer()
+            return True
         return False
     
+    def unlock_policy(self) -> bool:
+        """Open the policy vault with the session, or with an earlier password it is wrapped for"""
+        if self.settings.unlock_vault(self.security):
+            return True
+        salt, kdf = self.settings.get_vault_key_kdf()
+        if salt is None or salt == self.settings.get_password_salt():
+            QMessageBox.warning(
+                self,
+                "Policy Locked",
+                "The saved blocking policy could not be opened and was left untouched.\n\n"
+                "The last known policy stays in force."
+            )
+            return False
+        # Wrapped for a previous password: unwrap with that one, rewrap with this one
+        previous = Security()
+        try:
+            while True:
+                dialog = PasswordDialog(
+                    self,
+                    check=lambda password: previous.load_key_async(password, salt, kdf),
+                    prompt="The blocking policy is still locked with an earlier password.\n"
+                           "Enter that password to unlock it:")
+                if not dialog.exec():
+                    return False
+                previous.accept(dialog.result_value)
+                if self.settings.rekey_vault(self.security, old_keyring=previous):
+                    return True
+                QMessageBox.warning(self, "Policy Locked", "That is not the earlier password.")
+        finally:
+            previous.shutdown()
+    
+    def start_session_timer(self):
+        """(Re)arm the timer that ends the unlocked session"""
+        remaining = self.security.remaining()
+        if remaining > 0:
+            # Round up so the session has surely expired when it fires
+            self.session_timer.start(int(remaining + 1) * 1000)
+    
+    def expire_session(self):
+        """Lock the session if it timed out, otherwise wait for the new deadline"""
+        if self.security.is_unlocked():
+            self.start_session_timer()
+        else:
+            self.lock_session()
+    
+    def lock_session(self):
+        """Forget the unlocked session; the next sensitive operation asks again"""
+        self.session_timer.stop()
+        self.settings.lock_vault()
+        self.security.lock()
+    
+    def on_screen_lock_changed(self, locked: bool):
+        if locked:
+            self.lock_session()
+    
     def load_settings(self):
-        """Load settings from file"""
-        settings = self.settings.load_settings()
-        self.downtime_toggle.setChecked(settings["downtime_enabled"])
+        """Apply saved settings; enforcement resumes before any password is entered"""
+        downtime = self.settings.get_downtime_enabled()
+        self.downtime_toggle.setChecked(downtime)
+        self.blocking_manager.set_downtime_mode(downtime)
+        if self.settings.get_last_state().get("blocking_enabled"):
+            # Turning protection back on never needs the password
+            if self.blocking_manager.toggle_blocking(True):
+                self.show_blocking_state(True)
     
     def show_schedule_dialog(self):
         """Show the schedule management dialog"""
@@ -390,11 +647,11 @@ class AppBlocker(QMainWindow):
             # Here you would handle the schedule data
             # For example:
             if schedule['apps'] is None:  # Block all apps
-                print("Blocking all apps during scheduled time")
+                log.info("Blocking all apps during scheduled time")
             else:
-                print(f"Blocking selected apps: {schedule['apps']}")
-            print(f"Schedule: {schedule['start_time']} to {schedule['end_time']}")
-            print(f"Days: {', '.join(schedule['days'])}")
+                log.info("Blocking selected apps: %s", schedule['apps'])
+            log.info("Schedule: %s to %s", schedule['start_time'], schedule['end_time'])
+            log.info("Days: %s", ', '.join(schedule['days']))
     
     def show_tutorial(self):
         """Show the tutorial again"""
@@ -425,17 +682,19 @@ class AppBlocker(QMainWindow):
         # Verify current password first
         if not self.verify_password():
             return
+        # The vault key is rewrapped below, so it must be open first
+        if not self.unlock_policy():
+            return
         
         # Now set new password
-        dialog = PasswordDialog(self, is_setup=True)
+        dialog = PasswordDialog(self, is_setup=True, check=self.security.set_password_async)
         if dialog.exec():
-            password, confirm = dialog.get_confirmed_password()
-            if password == confirm and password:
-                salt = self.security.set_password(password)
-                self.settings.save_password_salt(salt)
-                QMessageBox.information(self, "Success", "Password has been reset successfully!")
-            else:
-                QMessageBox.warning(self, "Error", "Passwords do not match or are empty!")
+            self.security.accept(dialog.result_value)
+            self.settings.save_password(*dialog.result_value.credentials())
+            self.settings.rekey_vault(self.security)
+            self.audit.record(audit.PASSWORD_RESET)
+            self.start_session_timer()
+            QMessageBox.information(self, "Success", "Password has been reset successfully!")
     
     def factory_reset(self):
         """Reset app to factory settings"""
@@ -449,21 +708,28 @@ class AppBlocker(QMainWindow):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            # Clear all settings
+            # Clear all settings; the audit log is kept
+            self.audit.record(audit.FACTORY_RESET, apps=len(self.app_model))
             self.settings.clear_settings()
             # Clear current state
-            self.app_list.clear()
-            self.app_paths.clear()
-            self.blocking_manager.blocked_apps.clear()
+            self.app_model.clear()
+            self.blocking_manager.update_apps_async(clear=True)
             # Reset password
             self.setup_initial_password()
             QMessageBox.information(self, "Reset Complete", "Application has been reset to factory settings.")
 
 def main():
+    # Debug output: BUILDBLOCK_LOG_LEVEL=DEBUG
+    setup_logging()
     app = QApplication(sys.argv)
     window = AppBlocker()
+    if "--record-trace" in sys.argv[:-1]:
+        # Capture the engine's event stream for src/replay.py
+        window.blocking_manager.start_recording(sys.argv[sys.argv.index("--record-trace") + 1])
     window.show()
-    sys.exit(app.exec())
+    code = app.exec()
+    shutdown_logging()
+    sys.exit(code)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,219 @@
+import json
+import math
+import os
+import socket
+import sys
+import threading
+from typing import Dict, Optional, Tuple
+
+# Linear sub-buckets per power of two; 16 keeps every bucket within ~6%
+SUB_BUCKETS = 16
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# Enforcement stages, each measured from the previous one
+DETECT_TO_DECIDE = "detect_to_decide"
+DECIDE_TO_SIGNAL = "decide_to_signal"
+SIGNAL_TO_EXIT = "signal_to_exit"
+DETECT_TO_EXIT = "detect_to_exit"
+
+
+class Histogram:
+    """HDR-style log-linear histogram of durations in seconds
+
+    Values are bucketed in microseconds: each power of two is split into
+    SUB_BUCKETS linear buckets, giving bounded relative error at any scale
+    with a handful of counters.
+    """
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    @staticmethod
+    def _index(micros: float) -> int:
+        if micros < SUB_BUCKETS:
+            return int(micros)
+        exponent = int(math.log2(micros))
+        offset = int((micros / 2 ** exponent - 1) * SUB_BUCKETS)
+        return exponent * SUB_BUCKETS + offset
+
+    @staticmethod
+    def _upper(index: int) -> float:
+        """Upper bound in seconds of a bucket"""
+        if index < SUB_BUCKETS:
+            return (index + 1) / 1e6
+        exponent, offset = divmod(index, SUB_BUCKETS)
+        return 2 ** exponent * (1 + (offset + 1) / SUB_BUCKETS) / 1e6
+
+    def record(self, seconds: float):
+        seconds = max(0.0, seconds)
+        index = self._index(seconds * 1e6)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.sum += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile, in seconds"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._upper(index), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "quantiles": {str(q): self.quantile(q) for q in QUANTILES},
+        }
+
+
+class MetricsRegistry:
+    """Labelled histograms shared between the engine threads and exporters"""
+
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.record(seconds)
+
+    def snapshot(self) -> list:
+        """[(name, labels, histogram dict)] for every series"""
+        with self._lock:
+            return [(name, dict(labels), histogram.to_dict())
+                    for (name, labels), histogram in sorted(self._histograms.items())]
+
+    def to_json(self) -> str:
+        return json.dumps([
+            {"name": name, "labels": labels, **data}
+            for name, labels, data in self.snapshot()
+        ], indent=2)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (summaries, in seconds)"""
+        lines = []
+        declared = set()
+        for name, labels, data in self.snapshot():
+            metric = f"buildblock_{name}_seconds"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} summary")
+                declared.add(metric)
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            for q, value in data["quantiles"].items():
+                quantile_labels = ",".join(filter(None, [label_text, f'quantile="{q}"']))
+                lines.append(f"{metric}{{{quantile_labels}}} {value}")
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{metric}_sum{suffix} {data['sum']}")
+            lines.append(f"{metric}_count{suffix} {data['count']}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Short human-readable report, one line per stage across all labels"""
+        merged: Dict[str, Histogram] = {}
+        with self._lock:
+            for (name, _), histogram in self._histograms.items():
+                total = merged.setdefault(name, Histogram())
+                for index, count in histogram.counts.items():
+                    total.counts[index] = total.counts.get(index, 0) + count
+                total.count += histogram.count
+                total.sum += histogram.sum
+                total.max = histogram.max if total.max is None else max(total.max, histogram.max)
+        if not merged:
+            return "No enforcements recorded yet."
+        lines = []
+        for name in sorted(merged):
+            histogram = merged[name]
+            p50, p99 = histogram.quantile(0.5), histogram.quantile(0.99)
+            lines.append(f"{name}: n={histogram.count}  p50={p50 * 1000:.1f} ms  "
+                         f"p99={p99 * 1000:.1f} ms  max={histogram.max * 1000:.1f} ms")
+        return "\n".join(lines)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def default_socket_path() -> str:
+    if sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support/AppBlocker")
+    else:
+        base = os.environ.get("XDG_RUNTIME_DIR") or os.path.expanduser("~/.cache/AppBlocker")
+    return os.path.join(base, "metrics.sock")
+
+
+class MetricsServer:
+    """Serves a registry dump on a local Unix socket
+
+    A client sends "json" or "prometheus" (the default) followed by a
+    newline and reads the dump until EOF, e.g.
+    `echo json | nc -U ~/Library/Application\\ Support/AppBlocker/metrics.sock`.
+    """
+
+    def __init__(self, registry: MetricsRegistry, path: Optional[str] = None):
+        self.registry = registry
+        self.path = path or default_socket_path()
+        self._sock = None
+        self._thread = None
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.path)
+        os.chmod(self.path, 0o600)
+        sock.listen(4)
+        self._sock = sock
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._sock is None:
+            return
+        # shutdown() wakes the blocked accept(); close() alone does not
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def _serve(self):
+        sock = self._sock
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                break
+            with conn:
+                try:
+                    conn.settimeout(1.0)
+                    request = conn.recv(64).decode(errors="ignore").strip().lower()
+                except OSError:
+                    request = ""
+                body = self.registry.to_json() if request == "json" else self.registry.to_prometheus()
+                try:
+                    conn.sendall(body.encode())
+                except OSError:
+                    pass
@@ -1,14 +1,42 @@
-from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QPushButton, QLabel
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QPushButton, QLabel, QProgressBar
+
+class FutureSignals(QObject):
+    """Delivers a finished Future to the GUI thread"""
+    done = pyqtSignal(object)
 
 class PasswordDialog(QDialog):
-    def __init__(self, parent=None, is_setup=False):
+    """Password prompt that can check the password without blocking the GUI
+
+    With check set, OK hands the password to check(password), which must
+    return a Future (e.g. Security.verify_password_async). The dialog shows a
+    busy indicator while the key is derived on a worker thread, stays open
+    with an error on a falsy result and accepts on a truthy one, which is
+    then available as result_value. The check itself must not unlock
+    anything; the caller applies result_value once exec() accepts.
+    """
+    def __init__(self, parent=None, is_setup=False,
+                 check: Optional[Callable[[str], Future]] = None, prompt: Optional[str] = None):
         super().__init__(parent)
         self.setWindowTitle("Password Required" if not is_setup else "Set Password")
         self.setModal(True)
+        self.is_setup = is_setup
+        self.check = check
+        self.result_value: Any = None
+        # Wrong passwords entered before the dialog closed
+        self.failures = 0
+        self._pending: Optional[Future] = None
+        self._signals = FutureSignals(self)
+        self._signals.done.connect(self._check_finished)
         
         layout = QVBoxLayout(self)
         
-        if is_setup:
+        if prompt:
+            layout.addWidget(QLabel(prompt))
+        elif is_setup:
             layout.addWidget(QLabel("Set a password to protect your settings:"))
         else:
             layout.addWidget(QLabel("Enter password to continue:"))
@@ -23,8 +51,19 @@ class PasswordDialog(QDialog):
             self.confirm_input.setPlaceholderText("Confirm Password")
             layout.addWidget(self.confirm_input)
         
+        # Busy indicator while the key is derived (PBKDF2 reports no progress)
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 0)
+        self.progress.setTextVisible(False)
+        self.progress.hide()
+        layout.addWidget(self.progress)
+        
+        self.status_label = QLabel()
+        self.status_label.hide()
+        layout.addWidget(self.status_label)
+        
         self.submit_button = QPushButton("OK")
-        self.submit_button.clicked.connect(self.accept)
+        self.submit_button.clicked.connect(self.submit)
         layout.addWidget(self.submit_button)
         
         self.password_input.returnPressed.connect(self.submit_button.click)
@@ -33,4 +72,58 @@ class PasswordDialog(QDialog):
         return self.password_input.text()
     
     def get_confirmed_password(self) -> tuple[str, str]:
-        return self.password_input.text(), self.confirm_input.text() 
\ No newline at end of file
+        return self.password_input.text(), self.confirm_input.text()
+    
+    def submit(self):
+        if self.check is None:
+            self.accept()
+            return
+        if self._pending is not None:
+            return
+        password = self.get_password()
+        if self.is_setup:
+            if not password or password != self.confirm_input.text():
+                self._show_error("Passwords do not match or are empty!")
+                return
+        self._set_busy(True)
+        self._pending = future = self.check(password)
+        # Runs on the worker thread; the signal hops to the GUI thread
+        future.add_done_callback(self._signals.done.emit)
+    
+    def _check_finished(self, future: Future):
+        if future is not self._pending:
+            return
+        self._pending = None
+        self._set_busy(False)
+        try:
+            result = future.result()
+        except Exception as e:
+            self._show_error(f"Could not check password: {e}")
+            return
+        if not result:
+            self.failures += 1
+            self._show_error("Incorrect password!")
+            self.password_input.clear()
+            return
+        self.result_value = result
+        self.accept()
+    
+    def _set_busy(self, busy: bool):
+        self.password_input.setEnabled(not busy)
+        if self.is_setup:
+            self.confirm_input.setEnabled(not busy)
+        self.submit_button.setEnabled(not busy)
+        self.progress.setVisible(busy)
+        self.status_label.setText("Deriving key..." if busy else "")
+        self.status_label.setVisible(busy)
+        if not busy:
+            self.password_input.setFocus()
+    
+    def _show_error(self, message: str):
+        self.status_label.setText(message)
+        self.status_label.show()
+    
+    def reject(self):
+        # A derivation still running finishes on its own; its result is ignored
+        self._pending = None
+        super().reject()
@@ -0,0 +1,214 @@
+import errno
+import os
+import selectors
+import socket
+import struct
+import threading
+from typing import Callable, Optional
+
+from events import (
+    EventSource,
+    LAUNCHED,
+    PollingEventSource,
+    ProcessEvent,
+    ProcessInfo,
+    TERMINATED,
+)
+from logs import get_logger
+
+log = get_logger(__name__)
+
+# <linux/netlink.h>, <linux/connector.h>, <linux/cn_proc.h>
+NETLINK_CONNECTOR = 11
+NLMSG_DONE = 3
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+PROC_CN_MCAST_LISTEN = 1
+PROC_CN_MCAST_IGNORE = 2
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_EXIT = 0x80000000
+
+_NLMSGHDR = struct.Struct("=IHHII")
+_CN_MSG = struct.Struct("=IIIIHH")
+_PROC_EVENT = struct.Struct("=IIQ")
+_EXEC_DATA = struct.Struct("=II")
+_HEADER_SIZE = _NLMSGHDR.size + _CN_MSG.size
+
+# Large receive buffer so bursts of execs are not dropped by the kernel
+RECEIVE_BUFFER = 4 * 1024 * 1024
+
+
+def proc_identify(pid: int) -> Optional[ProcessInfo]:
+    """Identify a pid straight from /proc, or None if it already exited"""
+    try:
+        exe = os.readlink(f"/proc/{pid}/exe")
+    except OSError:
+        return None
+    try:
+        with open(f"/proc/{pid}/comm") as f:
+            name = f.read().strip()
+    except OSError:
+        name = os.path.basename(exe)
+    return ProcessInfo(pid, exe, None, name)
+
+
+def list_pids():
+    """Numeric entries of /proc"""
+    return [int(entry) for entry in os.listdir("/proc") if entry.isdigit()]
+
+
+class ProcConnectorEventSource(EventSource):
+    """Linux exec/exit events from the kernel proc connector
+
+    Opening the socket needs CAP_NET_ADMIN; open() raises OSError otherwise,
+    see linux_event_source() for the fallback. start() opens and subscribes
+    the socket and stop() unsubscribes and closes it, so a source that is
+    not running has the kernel send it nothing.
+    """
+
+    def __init__(self, identify: Callable[[int], Optional[ProcessInfo]] = proc_identify):
+        super().__init__()
+        self.identify = identify
+        # Times the kernel reported our receive buffer overflowed
+        self.overruns = 0
+        self._sock = None
+        self._wake_r = None
+        self._wake_w = None
+        self._thread = None
+
+    def open(self):
+        """Create and subscribe the netlink socket"""
+        if self._sock is not None:
+            return
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+            # Port id 0 lets the kernel pick a unique one, so a second socket
+            # in this process (e.g. the availability probe) cannot collide
+            sock.bind((0, CN_IDX_PROC))
+            self._send_op(sock, PROC_CN_MCAST_LISTEN)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+
+    def close(self):
+        """Unsubscribe and close the netlink socket"""
+        if self._sock is None:
+            return
+        try:
+            self._send_op(self._sock, PROC_CN_MCAST_IGNORE)
+        except OSError:
+            pass
+        self._sock.close()
+        self._sock = None
+
+    def _send_op(self, sock, op: int):
+        payload = struct.pack("=I", op)
+        cn_msg = _CN_MSG.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(payload), 0) + payload
+        header = _NLMSGHDR.pack(_NLMSGHDR.size + len(cn_msg), NLMSG_DONE, 0, 0, sock.getsockname()[0])
+        sock.send(header + cn_msg)
+
+    def start(self, callback):
+        super().start(callback)
+        if self._thread and self._thread.is_alive():
+            return
+        self.open()
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        super().stop()
+        if self._thread and self._thread.is_alive():
+            os.write(self._wake_w, b"x")
+            self._thread.join()
+
+    def _close(self):
+        self.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+        self._wake_r = self._wake_w = None
+
+    def _run(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self._sock, selectors.EVENT_READ)
+        selector.register(self._wake_r, selectors.EVENT_READ)
+        try:
+            while True:
+                ready = selector.select()
+                if any(key.fileobj == self._wake_r for key, _ in ready):
+                    break
+                try:
+                    data = self._sock.recv(65536)
+                except OSError as e:
+                    if e.errno == errno.ENOBUFS:
+                        # Events were lost; the reconciliation sweep picks them up
+                        self.overruns += 1
+                        continue
+                    raise
+                self._parse(data)
+        except Exception as e:
+            log.error("Proc connector error: %s", e)
+        finally:
+            selector.close()
+            self._close()
+
+    def _parse(self, data: bytes):
+        offset = 0
+        while offset + _HEADER_SIZE + _PROC_EVENT.size <= len(data):
+            length = _NLMSGHDR.unpack_from(data, offset)[0]
+            what, _, timestamp_ns = _PROC_EVENT.unpack_from(data, offset + _HEADER_SIZE)
+            # The kernel stamps events with CLOCK_MONOTONIC, the same clock as
+            # time.monotonic(), so latency is measured from the exec itself
+            timestamp = timestamp_ns / 1e9
+            body = offset + _HEADER_SIZE + _PROC_EVENT.size
+            if what == PROC_EVENT_EXEC:
+                pid, tgid = _EXEC_DATA.unpack_from(data, body)
+                if pid == tgid:
+                    # A process that exits before we look is reported without a path
+                    process = self.identify(pid) or ProcessInfo(pid)
+                    self.emit(ProcessEvent(LAUNCHED, process, timestamp))
+            elif what == PROC_EVENT_EXIT:
+                pid, tgid = _EXEC_DATA.unpack_from(data, body)
+                if pid == tgid:
+                    self.emit(ProcessEvent(TERMINATED, ProcessInfo(pid), timestamp))
+            if length <= 0:
+                break
+            offset += (length + 3) & ~3
+
+
+class ProcScanEventSource(PollingEventSource):
+    """Fallback that diffs /proc pid listings, identifying only new pids"""
+
+    def __init__(self, identify: Callable[[int], Optional[ProcessInfo]] = proc_identify,
+                 interval: float = 1.0):
+        super().__init__(list_pids, interval)
+        self.identify = identify
+
+    def _prime(self):
+        self._known = set(self.snapshot())
+
+    def poll(self):
+        current = set(self.snapshot())
+        for pid in current - self._known:
+            process = self.identify(pid)
+            if process:
+                self.emit(ProcessEvent(LAUNCHED, process))
+        for pid in self._known - current:
+            self.emit(ProcessEvent(TERMINATED, ProcessInfo(pid)))
+        self._known = current
+
+
+def linux_event_source(identify: Callable[[int], Optional[ProcessInfo]] = proc_identify,
+                       interval: float = 1.0) -> EventSource:
+    """Proc connector if the kernel lets us subscribe, otherwise a /proc scan"""
+    source = ProcConnectorEventSource(identify)
+    try:
+        # Only a probe; start() subscribes for real
+        source.open()
+    except OSError as e:
+        log.warning("Proc connector unavailable (%s), falling back to /proc scan", e)
+        return ProcScanEventSource(identify, interval)
+    source.close()
+    return source
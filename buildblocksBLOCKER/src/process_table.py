@@ -0,0 +1,98 @@
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from events import ProcessInfo
+from rules import Rule, RuleSet
+
+
+class ProcessTable:
+    """PID -> identity table kept up to date from cheap pid listings
+
+    Only pids that are new since the previous sync get identified, and
+    decisions are cached per (pid, start time) until the rule set changes,
+    so a sweep costs O(new launches) backend calls rather than O(running).
+    Pids identify() cannot resolve (gone, or not ours to inspect) are
+    remembered with their start time and only retried once start_time()
+    reports a different process under the pid.
+
+    A pid reused between two syncs is not noticed by sync() alone; exit
+    events from the event source evict pids as they go away.
+    """
+
+    def __init__(self, identify: Callable[[int], Optional[ProcessInfo]],
+                 start_time: Callable[[int], Optional[float]] = lambda pid: None):
+        self.identify = identify
+        self.start_time = start_time
+        self.processes: Dict[int, ProcessInfo] = {}
+        # pid -> start time of pids identify() returned None for
+        self._unidentified: Dict[int, Optional[float]] = {}
+        # pids whose cached decision is "block"
+        self.blocked: Set[int] = set()
+        self._decisions: Dict[Tuple[int, Optional[float]], Optional[Rule]] = {}
+        self._rules_version = None
+
+    def __len__(self):
+        return len(self.processes)
+
+    def add(self, process: ProcessInfo):
+        """Record a process reported by an event source"""
+        old = self.processes.get(process.pid)
+        if old is not None and old.start_time != process.start_time:
+            self.forget(process.pid)
+        self._unidentified.pop(process.pid, None)
+        self.processes[process.pid] = process
+
+    def forget(self, pid: int):
+        """Drop a process that exited"""
+        process = self.processes.pop(pid, None)
+        self._unidentified.pop(pid, None)
+        self.blocked.discard(pid)
+        if process is not None:
+            self._decisions.pop((pid, process.start_time), None)
+
+    def sync(self, pids: Iterable[int]) -> List[ProcessInfo]:
+        """Reconcile with a fresh pid listing and return the new processes"""
+        current = set(pids)
+        for pid in [pid for pid in self.processes if pid not in current]:
+            self.forget(pid)
+        for pid in [pid for pid in self._unidentified if pid not in current]:
+            del self._unidentified[pid]
+
+        new = []
+        for pid in current:
+            if pid in self.processes:
+                continue
+            if pid in self._unidentified and self._unidentified[pid] == self.start_time(pid):
+                continue
+            process = self.identify(pid)
+            if process is not None:
+                self._unidentified.pop(pid, None)
+                self.processes[pid] = process
+                new.append(process)
+            else:
+                self._unidentified[pid] = self.start_time(pid)
+        return new
+
+    def decide(self, process: ProcessInfo, rules: RuleSet,
+               decide: Callable[[ProcessInfo, RuleSet], Optional[Rule]]) -> Optional[Rule]:
+        """Cached decision for process under rules"""
+        self._check_version(rules)
+        key = (process.pid, process.start_time)
+        if key in self._decisions:
+            return self._decisions[key]
+        rule = decide(process, rules)
+        self._decisions[key] = rule
+        if rule is not None:
+            self.blocked.add(process.pid)
+        else:
+            self.blocked.discard(process.pid)
+        return rule
+
+    def stale(self, rules: RuleSet) -> bool:
+        """True if decisions were made under a different rule set version"""
+        return self._rules_version != rules.version
+
+    def _check_version(self, rules: RuleSet):
+        if self._rules_version != rules.version:
+            self._decisions.clear()
+            self.blocked.clear()
+            self._rules_version = rules.version
@@ -0,0 +1,203 @@
+"""Replay a recorded process trace against the blocking engine
+
+Events are fed to BlockingManager on a virtual clock, with sweeps and
+scheduler timers fired at their virtual deadlines, so a long recording runs
+in a fraction of its real duration and the same trace always produces the
+same decisions.
+
+    python src/replay.py TRACE [--speed N] [--rule KIND:VALUE ...] [--until SECONDS]
+
+--speed 0 replays as fast as possible; the default is 1000x real time.
+"""
+import argparse
+import logging
+import time
+from collections import deque
+from typing import Callable, Iterable, Optional
+
+from backends import FakeBackend
+from blocker import BlockingManager
+from events import TERMINATED, ProcessEvent, ProcessInfo
+from logs import LOG_FORMAT, get_logger
+from rules import Rule
+from terminator import KillAttempt
+from tracefile import TraceError, read_trace
+
+log = get_logger(__name__)
+
+# Virtual seconds per real second during a replay
+REPLAY_SPEED = 1000.0
+
+
+class VirtualClock:
+    """Monotonic clock that only moves when told to"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance_to(self, when: float):
+        self.now = max(self.now, when)
+
+
+class FakeTerminator:
+    """Drop-in Terminator that kills instantly and keeps a log
+
+    A blocked process disappears from the backend at the virtual moment it
+    is submitted, the way a successful graceful quit would look.
+    """
+
+    def __init__(self, backend: FakeBackend, clock: Callable[[], float],
+                 on_finished: Optional[Callable[[KillAttempt], None]] = None):
+        self.backend = backend
+        self.clock = clock
+        self.on_finished = on_finished
+        self.attempts = deque(maxlen=1000)
+        # (virtual time, process, rule) for every kill, in order
+        self.kills = []
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def submit(self, process: ProcessInfo, detected: Optional[float] = None,
+               rule: Optional[Rule] = None) -> bool:
+        if self.backend.processes.pop(process.pid, None) is None:
+            return False
+        now = self.clock()
+        attempt = KillAttempt(process, now, detected, rule)
+        attempt.signaled = attempt.finished = now
+        attempt.success = True
+        self.kills.append((now, process, rule))
+        self.attempts.append(attempt)
+        if self.on_finished:
+            self.on_finished(attempt)
+        return True
+
+    def exited(self, pid: int):
+        pass
+
+    def in_flight(self) -> int:
+        return 0
+
+
+class ReplayHarness:
+    """Drives a BlockingManager from a list of events on a virtual clock"""
+
+    def __init__(self, events: Iterable[ProcessEvent], speed: Optional[float] = REPLAY_SPEED):
+        self.events = events
+        # Virtual seconds per real second; None or 0 for as fast as possible
+        self.speed = speed
+        self.clock = VirtualClock()
+        self.backend = FakeBackend()
+        self.manager = BlockingManager(self.backend, clock=self.clock)
+        self.terminator = FakeTerminator(self.backend, self.clock,
+                                         on_finished=self.manager._record_enforcement)
+        self.manager.terminator = self.terminator
+        self.events_replayed = 0
+        self.sweeps = 0
+
+    @classmethod
+    def from_trace(cls, path: str, speed: Optional[float] = REPLAY_SPEED) -> "ReplayHarness":
+        return cls(read_trace(path), speed)
+
+    def run(self, until: Optional[float] = None):
+        """Replay every event, then keep the clock running until until (if given)"""
+        manager = self.manager
+        manager.is_active = True
+        # Like EventDispatcher: sweep once before the first event
+        manager.scheduler.sweep_now()
+        self._wall_start = time.perf_counter()
+        self._virtual_start = self.clock()
+
+        for event in self.events:
+            self._advance(event.timestamp)
+            self._apply(event)
+        if until is not None:
+            self._advance(until)
+        manager.is_active = False
+
+    def _advance(self, when: float):
+        """Fire every sweep and timer due before when, then move the clock there"""
+        scheduler = self.manager.scheduler
+        while True:
+            deadline = scheduler.next_deadline()
+            if deadline is None or deadline > when:
+                break
+            self.clock.advance_to(deadline)
+            self._pace()
+            scheduler.record_wakeup()
+            scheduler.run_due_timers()
+            if scheduler.sweep_due():
+                try:
+                    self.manager._reconcile()
+                except Exception as e:
+                    log.exception("Reconcile error: %s", e)
+                scheduler.sweep_done()
+                self.sweeps += 1
+        self.clock.advance_to(when)
+        self._pace()
+
+    def _pace(self):
+        if not self.speed:
+            return
+        target = self._wall_start + (self.clock() - self._virtual_start) / self.speed
+        delay = target - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _apply(self, event: ProcessEvent):
+        process = event.process
+        if event.kind == TERMINATED:
+            self.backend.processes.pop(process.pid, None)
+        else:
+            self.backend.processes[process.pid] = process
+        self.manager.scheduler.record_wakeup()
+        try:
+            self.manager._handle_event(event)
+        except Exception as e:
+            log.exception("Error handling event: %s", e)
+        self.events_replayed += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a process trace against the blocking engine")
+    parser.add_argument("trace")
+    parser.add_argument("--speed", type=float, default=REPLAY_SPEED,
+                        help="virtual seconds per real second, 0 for as fast as possible")
+    parser.add_argument("--rule", action="append", default=[], metavar="KIND:VALUE",
+                        help="block rule, e.g. path:/Applications/Steam.app")
+    parser.add_argument("--until", type=float, help="keep the virtual clock running until this time")
+    parser.add_argument("--verbose", action="store_true", help="log the engine's decisions, not just problems")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING, format=LOG_FORMAT)
+
+    try:
+        rules = [Rule(kind, value) for kind, _, value in (spec.partition(":") for spec in args.rule)]
+    except ValueError as e:
+        parser.error(str(e))
+    harness = ReplayHarness.from_trace(args.trace, args.speed)
+    start = time.perf_counter()
+    for rule in rules:
+        harness.manager.add_rule(rule)
+    try:
+        harness.run(args.until)
+    except (OSError, TraceError) as e:
+        parser.exit(1, f"Cannot replay {args.trace}: {e}\n")
+    elapsed = time.perf_counter() - start
+
+    clock = harness.clock()
+    print(f"replayed {harness.events_replayed} events over {clock:.1f} virtual s "
+          f"in {elapsed:.2f} s ({harness.events_replayed / max(elapsed, 1e-9):,.0f} events/s), "
+          f"{harness.sweeps} sweeps")
+    for when, process, rule in harness.terminator.kills:
+        print(f"{when:12.3f}  killed pid {process.pid} {process.path}  ({rule})")
+    print(harness.manager.metrics.summary())
+
+
+if __name__ == "__main__":
+    main()
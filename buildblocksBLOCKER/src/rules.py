@@ -0,0 +1,423 @@
+import fnmatch
+import os
+import re
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from events import ProcessInfo
+
+# Rule kinds
+BUNDLE_ID = "bundle_id"
+PATH = "path"
+PATH_PREFIX = "path_prefix"
+EXECUTABLE = "executable"
+TEAM_ID = "team_id"
+GLOB = "glob"
+REGEX = "regex"
+
+KINDS = (BUNDLE_ID, PATH, PATH_PREFIX, EXECUTABLE, TEAM_ID, GLOB, REGEX)
+
+_REGEX_META = set(".^$*+?{}[]\\|()")
+_GLOB_META = set("*?[")
+# Backreferences by number or name; their groups renumber inside an alternation
+_BACKREFERENCE = re.compile(r"\\(?:[1-9]|g<)|\(\?P=")
+
+
+class Rule:
+    """A single block rule, e.g. Rule(BUNDLE_ID, "com.valvesoftware.steam")
+
+    Glob and regex rules are matched against the full process path. Regex
+    rules are compiled here, so an invalid one fails on its own.
+    """
+    __slots__ = ("kind", "value", "pattern")
+
+    def __init__(self, kind: str, value: str):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown rule kind: {kind}")
+        self.kind = kind
+        self.value = value
+        self.pattern = None
+        if kind == REGEX:
+            try:
+                self.pattern = re.compile(value)
+            except re.error as e:
+                raise ValueError(f"Invalid regex rule {value!r}: {e}") from None
+
+    @property
+    def combinable(self) -> bool:
+        """Whether the rule can share one alternation with other rules
+
+        Global inline flags, named groups and backreferences only work in a
+        pattern of their own.
+        """
+        if self.kind != REGEX:
+            return True
+        return (self.pattern.flags == re.compile("").flags and not self.pattern.groupindex
+                and not _BACKREFERENCE.search(self.value))
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and (self.kind, self.value) == (other.kind, other.value)
+
+    def __hash__(self):
+        return hash((self.kind, self.value))
+
+    def __repr__(self):
+        return f"Rule({self.kind!r}, {self.value!r})"
+
+
+def _normalize_dir(path: str) -> str:
+    return path.rstrip("/") + "/"
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    depth = 0
+    in_class = False
+    escaped = False
+    for ch in pattern:
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif in_class:
+            in_class = ch != "]"
+        elif ch == "[":
+            in_class = True
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            return True
+    return False
+
+
+def _literal_prefix(rule: Rule) -> str:
+    """Literal text every path matching a glob/regex rule must start with"""
+    pattern = rule.value
+    if rule.kind == GLOB:
+        for i, ch in enumerate(pattern):
+            if ch in _GLOB_META:
+                return pattern[:i]
+        return pattern
+
+    if pattern.startswith("^"):
+        # Patterns are always anchored at the start anyway
+        pattern = pattern[1:]
+    if _has_top_level_alternation(pattern):
+        return ""
+    for i, ch in enumerate(pattern):
+        if ch in _REGEX_META:
+            if ch in "*?{":
+                # The quantifier makes the previous character optional
+                i -= 1
+            return pattern[:max(i, 0)]
+    return pattern
+
+
+def _literal_component(rule: Rule, prefix: str) -> str:
+    """Longest literal path component of a glob past its literal prefix, or ''
+
+    Globs are anchored at both ends, so a literal component between two
+    slashes (or at the end) must appear as a whole component of any path
+    the glob matches.
+    """
+    if rule.kind != GLOB:
+        return ""
+    best = ""
+    offset = 0
+    for component in rule.value.split("/"):
+        end = offset + len(component)
+        if end > len(prefix) and component and not (_GLOB_META & set(component)):
+            if len(component) > len(best):
+                best = component
+        offset = end + 1
+    return best
+
+
+def _ancestors(path: str) -> List[str]:
+    """'/a/b/c' -> ['/', '/a/', '/a/b/', '/a/b/c/']"""
+    dirs = []
+    index = path.find("/")
+    while index != -1:
+        dirs.append(path[:index + 1])
+        index = path.find("/", index + 1)
+    if not path.endswith("/"):
+        dirs.append(path + "/")
+    return dirs
+
+
+def _index_key(rule: Rule) -> Tuple[str, str]:
+    prefix = _literal_prefix(rule)
+    return prefix, _literal_component(rule, prefix)
+
+
+class _PatternGroup:
+    """Glob/regex rules sharing an index key, compiled into one regex
+
+    Rules that cannot share an alternation (see Rule.combinable) keep their
+    own compiled pattern and are tried after it.
+    """
+    __slots__ = ("rules", "regex", "separate")
+
+    def __init__(self):
+        self.rules: List[Rule] = []
+        self.regex = None
+        self.separate: List[Rule] = []
+
+    def compile(self):
+        parts = []
+        combined = []
+        self.separate = []
+        for rule in self.rules:
+            if not rule.combinable:
+                self.separate.append(rule)
+                continue
+            source = fnmatch.translate(rule.value) if rule.kind == GLOB else f"(?:{rule.value})\\Z"
+            parts.append(f"(?P<r{len(combined)}>{source})")
+            combined.append(rule)
+        self.rules = combined + self.separate
+        self.regex = re.compile("|".join(parts)) if parts else None
+
+    def match(self, path: str) -> Optional[Rule]:
+        if self.regex is not None:
+            m = self.regex.match(path)
+            if m:
+                return self.rules[int(m.lastgroup[1:])]
+        for rule in self.separate:
+            if rule.pattern.fullmatch(path):
+                return rule
+        return None
+
+
+class _PatternIndex:
+    """Glob/regex rules indexed by literal prefix, then by literal component
+
+    A lookup probes the path once per distinct prefix length and, within a
+    prefix, once per path component, then runs only the small combined regex
+    of each hit. Rules with neither index key share a single combined regex.
+    Regex rules are only indexed by their literal prefix, so thousands of
+    regexes behind the same prefix still cost one large alternation.
+
+    Compiled groups are never modified, so copy() shares them and update()
+    recompiles only the groups it adds rules to or removes rules from.
+    """
+
+    def __init__(self, rules: Iterable[Rule] = ()):
+        # prefix -> component ('' for none) -> group
+        self.groups: Dict[str, Dict[str, _PatternGroup]] = {}
+        self.prefix_lengths: List[int] = []
+        self.update(rules)
+
+    def copy(self) -> "_PatternIndex":
+        index = _PatternIndex()
+        index.groups = {prefix: dict(by_component) for prefix, by_component in self.groups.items()}
+        index.prefix_lengths = self.prefix_lengths
+        return index
+
+    def update(self, added: Iterable[Rule] = (), removed: Iterable[Rule] = ()):
+        """Add and remove rules in place"""
+        # (prefix, component) -> the group's rules after the change, in order
+        changed: Dict[Tuple[str, str], Dict[Rule, None]] = {}
+
+        def rules_of(key):
+            rules = changed.get(key)
+            if rules is None:
+                group = self.groups.get(key[0], {}).get(key[1])
+                rules = changed[key] = dict.fromkeys(group.rules if group else ())
+            return rules
+
+        for rule in removed:
+            rules_of(_index_key(rule)).pop(rule, None)
+        for rule in added:
+            rules_of(_index_key(rule))[rule] = None
+
+        for (prefix, component), rules in changed.items():
+            by_component = self.groups.setdefault(prefix, {})
+            if rules:
+                group = by_component[component] = _PatternGroup()
+                group.rules = list(rules)
+                group.compile()
+            else:
+                by_component.pop(component, None)
+                if not by_component:
+                    del self.groups[prefix]
+        if changed:
+            self.prefix_lengths = sorted({len(prefix) for prefix in self.groups})
+
+    def __bool__(self):
+        return bool(self.groups)
+
+    def match(self, path: str) -> Optional[Rule]:
+        components = None
+        for length in self.prefix_lengths:
+            if length > len(path):
+                break
+            by_component = self.groups.get(path[:length])
+            if by_component is None:
+                continue
+            if len(by_component) > 1 or "" not in by_component:
+                if components is None:
+                    # '' is the key of the group without a component, tried last
+                    components = set(path.split("/"))
+                    components.discard("")
+                for component in components:
+                    group = by_component.get(component)
+                    if group:
+                        rule = group.match(path)
+                        if rule:
+                            return rule
+            group = by_component.get("")
+            if group:
+                rule = group.match(path)
+                if rule:
+                    return rule
+        return None
+
+
+class RuleSet:
+    """Block rules compiled for constant-time matching
+
+    Exact kinds are dict lookups, path prefixes are looked up once per
+    ancestor directory and patterns go through a _PatternIndex, so a decision
+    costs a bounded number of lookups rather than one comparison per rule.
+
+    Given a base RuleSet, only the rules that differ from it are indexed;
+    everything else, compiled pattern groups included, is reused.
+    """
+
+    def __init__(self, rules: Iterable[Rule] = (), version: int = 0,
+                 base: Optional["RuleSet"] = None):
+        self.rules = frozenset(rules)
+        # Bumped on every change so cached decisions can be invalidated
+        self.version = version
+        if base is None:
+            self.bundle_ids: Dict[str, Rule] = {}
+            self.paths: Dict[str, Rule] = {}
+            self.prefixes: Dict[str, Rule] = {}
+            self.executables: Dict[str, Rule] = {}
+            self.team_ids: Dict[str, Rule] = {}
+            self.patterns = _PatternIndex()
+            added, removed = self.rules, frozenset()
+        else:
+            self.bundle_ids = dict(base.bundle_ids)
+            self.paths = dict(base.paths)
+            self.prefixes = dict(base.prefixes)
+            self.executables = dict(base.executables)
+            self.team_ids = dict(base.team_ids)
+            self.patterns = base.patterns.copy()
+            added, removed = self.rules - base.rules, base.rules - self.rules
+
+        exact = {
+            BUNDLE_ID: self.bundle_ids,
+            PATH: self.paths,
+            EXECUTABLE: self.executables,
+            TEAM_ID: self.team_ids,
+        }
+        added_patterns = []
+        removed_patterns = []
+        for rule in removed:
+            if rule.kind in exact:
+                del exact[rule.kind][rule.value]
+            elif rule.kind == PATH_PREFIX:
+                self._remove_prefix(rule)
+            else:
+                removed_patterns.append(rule)
+        for rule in added:
+            if rule.kind in exact:
+                exact[rule.kind][rule.value] = rule
+            elif rule.kind == PATH_PREFIX:
+                self.prefixes[_normalize_dir(rule.value)] = rule
+            else:
+                added_patterns.append(rule)
+        self.patterns.update(added_patterns, removed_patterns)
+
+    def _remove_prefix(self, rule: Rule):
+        directory = _normalize_dir(rule.value)
+        if self.prefixes.get(directory) != rule:
+            return
+        del self.prefixes[directory]
+        # Another rule may name the same directory with or without the slash
+        for other in self.rules:
+            if other.kind == PATH_PREFIX and _normalize_dir(other.value) == directory:
+                self.prefixes[directory] = other
+                break
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, process: ProcessInfo) -> Optional[Rule]:
+        """Return the first rule blocking process, or None"""
+        if process.bundle_id and process.bundle_id in self.bundle_ids:
+            return self.bundle_ids[process.bundle_id]
+        if process.team_id and process.team_id in self.team_ids:
+            return self.team_ids[process.team_id]
+        executable = process.executable
+        if executable and executable in self.executables:
+            return self.executables[executable]
+
+        path = process.path
+        if not path:
+            return None
+        rule = self.paths.get(path)
+        if rule:
+            return rule
+        if not executable and os.path.basename(path) in self.executables:
+            return self.executables[os.path.basename(path)]
+
+        if self.prefixes:
+            for directory in _ancestors(path):
+                rule = self.prefixes.get(directory)
+                if rule:
+                    return rule
+        if self.patterns:
+            return self.patterns.match(path)
+        return None
+
+
+EMPTY_RULES = RuleSet()
+
+
+class RuleSnapshot:
+    """Immutable, versioned view of everything being blocked
+
+    Writers build a new snapshot and publish it with a single reference
+    swap, so readers on other threads never need a lock and never see a
+    half-applied change.
+    """
+    __slots__ = ("apps", "extra", "rules", "version")
+
+    def __init__(self, apps: Optional[Dict[str, Tuple[Rule, ...]]] = None,
+                 extra: Iterable[Rule] = (), version: int = 0, base: Optional[RuleSet] = None):
+        # Blocked app path -> the rules it expands to
+        self.apps = MappingProxyType(dict(apps or {}))
+        # Rules added directly rather than through an app
+        self.extra = frozenset(extra)
+        self.version = version
+        combined = set(self.extra)
+        for app_rules in self.apps.values():
+            combined.update(app_rules)
+        # Only the rules that differ from base's are compiled
+        self.rules = RuleSet(combined, version, base)
+
+    @property
+    def paths(self) -> frozenset:
+        return frozenset(self.apps)
+
+    def with_app(self, app_path: str, rules: Iterable[Rule]) -> "RuleSnapshot":
+        apps = dict(self.apps)
+        apps[app_path] = tuple(rules)
+        return RuleSnapshot(apps, self.extra, self.version + 1, self.rules)
+
+    def without_app(self, app_path: str) -> "RuleSnapshot":
+        apps = dict(self.apps)
+        apps.pop(app_path, None)
+        return RuleSnapshot(apps, self.extra, self.version + 1, self.rules)
+
+    def with_rule(self, rule: Rule) -> "RuleSnapshot":
+        return RuleSnapshot(self.apps, self.extra | {rule}, self.version + 1, self.rules)
+
+    def without_rule(self, rule: Rule) -> "RuleSnapshot":
+        return RuleSnapshot(self.apps, self.extra - {rule}, self.version + 1, self.rules)
+
+    def cleared(self) -> "RuleSnapshot":
+        return RuleSnapshot({}, self.extra, self.version + 1, self.rules)
@@ -0,0 +1,168 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+# Seconds between reconciliation sweeps on AC power
+SWEEP_INTERVAL = 30.0
+# Sweep interval multiplier while running on battery
+BATTERY_FACTOR = 4.0
+# Timers are rounded up to this grid so nearby deadlines share one wakeup
+COALESCE_WINDOW = 1.0
+
+
+def on_battery() -> bool:
+    """True if the machine is running on battery (False when unknown)"""
+    try:
+        import psutil
+        battery = psutil.sensors_battery()
+        return battery is not None and not battery.power_plugged
+    except Exception:
+        return False
+
+
+class Timer:
+    """Handle returned by MonitorScheduler.call_at"""
+    __slots__ = ("deadline", "callback", "cancelled")
+
+    def __init__(self, deadline: float, callback: Callable[[], None]):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class MonitorScheduler:
+    """Decides when the monitor thread next needs to wake up
+
+    The next wakeup is the earliest of the reconciliation sweep and any
+    timer registered by schedules or quotas. Sweeps stop entirely while there
+    is nothing to enforce or the screen is locked (launch events are still
+    delivered), and slow down on battery. Deadlines are coalesced onto a
+    COALESCE_WINDOW grid.
+    """
+
+    def __init__(self, sweep_interval: float = SWEEP_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic,
+                 coalesce_window: float = COALESCE_WINDOW,
+                 power_probe: Callable[[], bool] = on_battery):
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self.coalesce_window = coalesce_window
+        self.power_probe = power_probe
+        self.enforcing = True
+        self.screen_locked = False
+        self.on_battery = False
+        self.next_sweep: Optional[float] = None
+        self._timers = []
+        self._counter = itertools.count()
+        # Monotonic times of recent wakeups, for wakeups_per_minute() on other threads
+        self._wakeups = deque()
+        self._wakeups_lock = threading.Lock()
+
+    def _coalesce(self, deadline: float) -> float:
+        window = self.coalesce_window
+        if window <= 0:
+            return deadline
+        return math.ceil(deadline / window) * window
+
+    def current_sweep_interval(self) -> Optional[float]:
+        """Seconds between sweeps in the current state, None for no sweeps"""
+        if not self.enforcing or self.screen_locked:
+            return None
+        if self.on_battery:
+            return self.sweep_interval * BATTERY_FACTOR
+        return self.sweep_interval
+
+    def sweep_done(self):
+        """Schedule the next sweep after one just ran"""
+        self.on_battery = self.power_probe()
+        interval = self.current_sweep_interval()
+        self.next_sweep = None if interval is None else self._coalesce(self.clock() + interval)
+
+    def sweep_now(self):
+        self.next_sweep = self.clock()
+
+    def set_enforcing(self, enforcing: bool):
+        """Whether any rule is active; sweeps stop when nothing is"""
+        self.enforcing = enforcing
+        self._reschedule()
+
+    def set_screen_locked(self, locked: bool):
+        self.screen_locked = locked
+        if locked:
+            self.next_sweep = None
+        elif self.enforcing:
+            # Catch anything started while we were not sweeping
+            self.sweep_now()
+
+    def _reschedule(self):
+        interval = self.current_sweep_interval()
+        if interval is None:
+            self.next_sweep = None
+        elif self.next_sweep is None:
+            self.next_sweep = self._coalesce(self.clock() + interval)
+
+    def call_at(self, deadline: float, callback: Callable[[], None]) -> Timer:
+        """Run callback on the monitor thread at (or just after) deadline"""
+        timer = Timer(self._coalesce(deadline), callback)
+        heapq.heappush(self._timers, (timer.deadline, next(self._counter), timer))
+        return timer
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> Timer:
+        return self.call_at(self.clock() + delay, callback)
+
+    def next_deadline(self) -> Optional[float]:
+        """Clock time of the next wakeup, or None if only events can wake us"""
+        while self._timers and self._timers[0][2].cancelled:
+            heapq.heappop(self._timers)
+        deadlines = [d for d in (self.next_sweep, self._timers[0][0] if self._timers else None)
+                     if d is not None]
+        return min(deadlines) if deadlines else None
+
+    def timeout(self) -> Optional[float]:
+        """Seconds until the next wakeup, or None to sleep until an event"""
+        deadline = self.next_deadline()
+        if deadline is None:
+            return None
+        return max(0.0, deadline - self.clock())
+
+    def sweep_due(self) -> bool:
+        return self.next_sweep is not None and self.clock() >= self.next_sweep
+
+    def run_due_timers(self):
+        now = self.clock()
+        while self._timers and self._timers[0][0] <= now:
+            _, _, timer = heapq.heappop(self._timers)
+            if timer.cancelled:
+                continue
+            try:
+                timer.callback()
+            except Exception as e:
+                log.exception("Timer error: %s", e)
+
+    def record_wakeup(self):
+        now = self.clock()
+        with self._wakeups_lock:
+            self._wakeups.append(now)
+            self._prune_wakeups(now)
+
+    def wakeups_per_minute(self) -> int:
+        """Wakeups of the monitor thread over the last minute"""
+        now = self.clock()
+        with self._wakeups_lock:
+            self._prune_wakeups(now)
+            return len(self._wakeups)
+
+    def _prune_wakeups(self, now: float):
+        while self._wakeups and self._wakeups[0] < now - 60:
+            self._wakeups.popleft()
@@ -1,61 +1,409 @@
+"""Password hashing, verification and the unlocked session
+
+Print key derivation timings on this machine and the calibrated choice:
+
+    python src/security.py [--algorithm pbkdf2-sha256|scrypt] [--target SECONDS]
+"""
+import argparse
 import hashlib
+import hmac
 import os
 import base64
-from cryptography.fernet import Fernet
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+PBKDF2 = "pbkdf2-sha256"
+SCRYPT = "scrypt"
+ALGORITHMS = (PBKDF2, SCRYPT)
+
+# Iterations used before parameters were stored; also the PBKDF2 floor
+KDF_ITERATIONS = 100000
+# Calibration aims for a derivation taking about this long
+TARGET_SECONDS = 0.25
+# scrypt cost is log2(N) with r=8, p=1; each step doubles time and memory
+# (128 * r * N bytes, so 18 is 256 MiB)
+SCRYPT_MIN_LOG_N = 14
+SCRYPT_MAX_LOG_N = 18
+# Re-derive on unlock only when the stored PBKDF2 cost is this far below
+# the calibrated one, so timing noise does not rewrite the password
+UPGRADE_MARGIN = 0.75
+
+# Threads available for key derivations
+KDF_WORKERS = 2
+
+# An unlocked session ends after this many seconds without use...
+SESSION_IDLE_TIMEOUT = 5 * 60
+# ...and in any case this long after the password was entered
+SESSION_MAX_AGE = 30 * 60
+
+# The stored verifier is an HMAC of this label under the derived key, so it
+# can be checked without keeping (or being able to recover) the key itself
+_VERIFIER_LABEL = b"BuildBlock password verifier v1"
+
+
+class KdfParams:
+    """Key derivation algorithm and cost, stored next to the salt"""
+    __slots__ = ("algorithm", "cost")
+
+    def __init__(self, algorithm: str = PBKDF2, cost: int = KDF_ITERATIONS):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown key derivation algorithm: {algorithm}")
+        # PBKDF2: iterations; scrypt: log2(N)
+        self.algorithm = algorithm
+        self.cost = int(cost)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "KdfParams":
+        """Parameters from settings; None means the original fixed PBKDF2"""
+        if not data:
+            return cls()
+        return cls(data.get("algorithm", PBKDF2), data.get("cost", KDF_ITERATIONS))
+
+    def to_dict(self) -> Dict:
+        return {"algorithm": self.algorithm, "cost": self.cost}
+
+    def derive(self, password: str, salt: bytes) -> bytes:
+        """32-byte key for password; slow on purpose"""
+        if self.algorithm == SCRYPT:
+            kdf = Scrypt(salt=salt, length=32, n=2 ** self.cost, r=8, p=1)
+        else:
+            kdf = PBKDF2HMAC(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=salt,
+                iterations=self.cost,
+            )
+        return kdf.derive(password.encode())
+
+    def weaker_than(self, other: "KdfParams") -> bool:
+        """True if other is the same algorithm at a clearly higher cost"""
+        if self.algorithm != other.algorithm:
+            return False
+        if self.algorithm == SCRYPT:
+            return self.cost < other.cost
+        return self.cost < other.cost * UPGRADE_MARGIN
+
+    def __eq__(self, other):
+        return isinstance(other, KdfParams) and (self.algorithm, self.cost) == (other.algorithm, other.cost)
+
+    def __repr__(self):
+        return f"KdfParams({self.algorithm!r}, {self.cost})"
+
+
+def derive_key(password: str, salt: bytes, params: Optional[KdfParams] = None) -> bytes:
+    return (params or KdfParams()).derive(password, salt)
+
+
+def time_derivation(params: KdfParams) -> float:
+    """Seconds one derivation with params takes here"""
+    start = time.perf_counter()
+    params.derive("calibration", b"\0" * 16)
+    return time.perf_counter() - start
+
+
+def calibrate(algorithm: str = PBKDF2, target: float = TARGET_SECONDS) -> KdfParams:
+    """Cheapest parameters for algorithm that take about target seconds here
+
+    Never goes below KDF_ITERATIONS / SCRYPT_MIN_LOG_N, so a slow machine
+    waits longer rather than getting a weaker hash.
+    """
+    if algorithm == SCRYPT:
+        log_n = SCRYPT_MIN_LOG_N
+        elapsed = time_derivation(KdfParams(SCRYPT, log_n))
+        # Time is linear in N, so each step up doubles it
+        while log_n < SCRYPT_MAX_LOG_N and elapsed * 2 <= target * 1.25:
+            log_n += 1
+            elapsed *= 2
+        return KdfParams(SCRYPT, log_n)
+    probe = KdfParams(PBKDF2, 20000)
+    elapsed = max(time_derivation(probe), 1e-6)
+    iterations = int(probe.cost * target / elapsed) // 1000 * 1000
+    return KdfParams(PBKDF2, max(KDF_ITERATIONS, iterations))
+
+
+def make_verifier(key: bytes) -> bytes:
+    return hmac.new(bytes(key), _VERIFIER_LABEL, hashlib.sha256).digest()
+
+
+class DerivedKey:
+    """A key derived from a correct or new password, not yet in use
+
+    Returned by the *_async derivations so a worker never opens the session;
+    Security.accept() does that on the caller's thread.
+    """
+    __slots__ = ("key", "salt", "params", "upgrade")
+
+    def __init__(self, key: bytes, salt: bytes, params: KdfParams,
+                 upgrade: Optional[Tuple[bytes, bytes, KdfParams]] = None):
+        self.key = key
+        self.salt = salt
+        self.params = params
+        # (salt, key, params) of a costlier re-derivation, see take_upgrade()
+        self.upgrade = upgrade
+
+    def credentials(self) -> Tuple[bytes, bytes, Dict]:
+        """(salt, verifier, params as a dict), all to be stored"""
+        return self.salt, make_verifier(self.key), self.params.to_dict()
+
 
 class Security:
-    def __init__(self):
-        self._key = None
+    """Password checks plus a time-boxed unlocked session
+
+    A correct password unlocks a session holding the derived key in memory,
+    so repeated sensitive operations skip the prompt and the KDF. The session
+    ends after SESSION_IDLE_TIMEOUT without use, SESSION_MAX_AGE after
+    unlocking, or on lock(), which overwrites the key. Copies made by the
+    KDF and by Fernet are ordinary bytes objects and cannot be wiped, so
+    this is best effort.
+
+    The *_async variants run the slow key derivation on a worker pool and
+    return a Future of a DerivedKey (None for a wrong password), so the GUI
+    thread never waits for the KDF. Nothing is unlocked until the caller
+    passes the result to accept(), e.g. once the password dialog is accepted.
+
+    New passwords use parameters calibrated on this machine. When a password
+    stored at a lower cost is verified, it is re-derived at the calibrated
+    cost and take_upgrade() hands back the new credentials to save.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic,
+                 algorithm: str = PBKDF2, target: float = TARGET_SECONDS):
+        if algorithm not in ALGORITHMS:
+            # Comes from settings.json; a typo must not lock the user out
+            log.warning("Unknown key derivation algorithm %r, using %s", algorithm, PBKDF2)
+            algorithm = PBKDF2
+        self.clock = clock
+        # Used for new passwords; stored ones keep their own algorithm
+        self.algorithm = algorithm
+        self.target = target
+        # calibrate() results per algorithm, measured once per run
+        self._calibrated: Dict[str, KdfParams] = {}
+        # (salt, key, params) waiting to replace the stored password
+        self._upgrade: Optional[Tuple[bytes, bytes, KdfParams]] = None
+        # Session state is touched by the GUI thread and by KDF workers
+        self._lock = threading.RLock()
+        self._key: Optional[bytearray] = None
         self._fernet = None
-    
-    def set_password(self, password: str) -> bytes:
-        """Set up encryption with the given password"""
+        self._unlocked_at = 0.0
+        self._last_used = 0.0
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _submit(self, function, *args) -> Future:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=KDF_WORKERS, thread_name_prefix="kdf")
+            return self._pool.submit(function, *args)
+
+    def set_password_async(self, password: str) -> Future:
+        """Derive a new password's key on a worker thread; the Future yields a DerivedKey"""
+        return self._submit(self.new_password, password)
+
+    def verify_password_async(self, password: str, salt: Optional[bytes],
+                              verifier: Optional[bytes], params: Optional[Dict] = None) -> Future:
+        """Check a password on a worker thread; the Future yields a DerivedKey or None"""
+        return self._submit(self.check_password, password, salt, verifier, params)
+
+    def load_key_async(self, password: str, salt: bytes, params: Optional[Dict] = None) -> Future:
+        """Derive a key on a worker thread; the Future yields a DerivedKey or None"""
+        return self._submit(self.derive_key, password, salt, params)
+
+    def calibrated(self, algorithm: str) -> KdfParams:
+        """Parameters hitting self.target on this machine (measured on first use)"""
+        params = self._calibrated.get(algorithm)
+        if params is None:
+            params = self._calibrated[algorithm] = calibrate(algorithm, self.target)
+        return params
+
+    def shutdown(self):
+        """Lock the session and stop the worker pool (pending derivations are dropped)"""
+        self.lock()
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def set_password(self, password: str, params: Optional[KdfParams] = None) -> Tuple[bytes, bytes, Dict]:
+        """Set up encryption with the given password
+
+        Benchmarks this machine unless params are given. Returns (salt,
+        verifier, params as a dict), all to be stored.
+        """
+        derived = self.new_password(password, params)
+        self.accept(derived)
+        return derived.credentials()
+
+    def new_password(self, password: str, params: Optional[KdfParams] = None) -> DerivedKey:
+        """Key for a new password, without unlocking (safe on a worker thread)"""
         if not password:
             raise ValueError("Password cannot be empty")
-            
+
+        if params is None:
+            params = self._calibrated[self.algorithm] = calibrate(self.algorithm, self.target)
+        salt, key = self._new_key(password, params)
+        return DerivedKey(key, salt, params)
+
+    def _new_key(self, password: str, params: KdfParams) -> Tuple[bytes, bytes]:
         salt = os.urandom(16)
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        self._key = key
-        self._fernet = Fernet(key)
-        return salt
-        
-    def verify_password(self, password: str, salt: bytes) -> bool:
-        """Verify if the provided password matches the stored one"""
-        if not password or not salt:
+        return salt, params.derive(password, salt)
+
+    def verify_password(self, password: str, salt: Optional[bytes],
+                        verifier: Optional[bytes], params: Optional[Dict] = None) -> bool:
+        """Check password against the stored verifier; unlocks on success
+
+        params are the stored KdfParams dict (None for passwords saved before
+        they were recorded). A correct password stored below the calibrated
+        cost is re-derived; see take_upgrade().
+        """
+        derived = self.check_password(password, salt, verifier, params)
+        if derived is None:
             return False
-            
+        self.accept(derived)
+        return True
+
+    def check_password(self, password: str, salt: Optional[bytes], verifier: Optional[bytes],
+                       params: Optional[Dict] = None) -> Optional[DerivedKey]:
+        """The key of a correct password, or None, without unlocking (safe on a worker thread)"""
+        if not password or not salt or not verifier:
+            return None
+
         try:
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt,
-                iterations=100000,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-            return key == self._key
+            stored = KdfParams.from_dict(params)
+            key = stored.derive(password, salt)
         except Exception:
-            return False
-    
-    def load_key(self, password: str, salt: bytes) -> bool:
+            return None
+        if not hmac.compare_digest(make_verifier(key), verifier):
+            return None
+        upgrade = None
+        target = self.calibrated(stored.algorithm)
+        if stored.weaker_than(target):
+            upgrade = (*self._new_key(password, target), target)
+        return DerivedKey(key, salt, stored, upgrade)
+
+    def accept(self, derived: DerivedKey):
+        """Open the session with a key from new_password() or check_password()"""
+        with self._lock:
+            self._unlock(derived.key)
+            self._upgrade = derived.upgrade
+
+    def take_upgrade(self) -> Optional[Tuple[bytes, bytes, Dict]]:
+        """(salt, verifier, params) of a re-derived password to store, once
+
+        The session switches to the upgraded key only now, so anything
+        wrapped with the old one (like the settings vault key) can be
+        unwrapped first.
+        """
+        with self._lock:
+            upgrade, self._upgrade = self._upgrade, None
+            if upgrade is None:
+                return None
+            salt, key, params = upgrade
+            self._unlock(key)
+        return salt, make_verifier(key), params.to_dict()
+
+    def encrypt(self, data: bytes) -> bytes:
+        """Fernet token for data under the session key"""
+        with self._lock:
+            if self._fernet is None:
+                raise PermissionError("Password session is locked")
+            return self._fernet.encrypt(data)
+
+    def decrypt(self, token: bytes) -> bytes:
+        """Data from a token made by encrypt() with the same password"""
+        with self._lock:
+            if self._fernet is None:
+                raise PermissionError("Password session is locked")
+            try:
+                return self._fernet.decrypt(token)
+            except InvalidToken:
+                raise ValueError("Token was made with another key or modified")
+
+    def load_key(self, password: str, salt: bytes, params: Optional[Dict] = None) -> bool:
         """Load encryption key from password"""
+        derived = self.derive_key(password, salt, params)
+        if derived is None:
+            return False
+        self.accept(derived)
+        return True
+
+    def derive_key(self, password: str, salt: bytes, params: Optional[Dict] = None) -> Optional[DerivedKey]:
+        """Key for password, without unlocking (safe on a worker thread)"""
         try:
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt,
-                iterations=100000,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-            self._key = key
-            self._fernet = Fernet(key)
-            return True
+            stored = KdfParams.from_dict(params)
+            return DerivedKey(stored.derive(password, salt), salt, stored)
         except Exception:
-            return False 
\ No newline at end of file
+            return None
+
+    def _unlock(self, key: bytes):
+        with self._lock:
+            self.lock()
+            self._key = bytearray(key)
+            self._fernet = Fernet(base64.urlsafe_b64encode(key))
+            self._unlocked_at = self._last_used = self.clock()
+
+    def is_unlocked(self) -> bool:
+        """True while a session is open; ends it if it has timed out"""
+        with self._lock:
+            if self._key is None:
+                return False
+            if self.remaining() <= 0:
+                self.lock()
+                return False
+            return True
+
+    def touch(self):
+        """Count a sensitive operation as activity, postponing the idle timeout"""
+        with self._lock:
+            if self.is_unlocked():
+                self._last_used = self.clock()
+
+    def remaining(self) -> float:
+        """Seconds until the session times out (0 if locked)"""
+        with self._lock:
+            if self._key is None:
+                return 0.0
+            deadline = min(self._last_used + SESSION_IDLE_TIMEOUT,
+                           self._unlocked_at + SESSION_MAX_AGE)
+            return max(0.0, deadline - self.clock())
+
+    def lock(self):
+        """End the session and overwrite the key held for it"""
+        with self._lock:
+            if self._key is not None:
+                self._key[:] = bytes(len(self._key))
+            self._key = None
+            self._fernet = None
+            self._upgrade = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time password key derivation on this machine")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default=PBKDF2)
+    parser.add_argument("--target", type=float, default=TARGET_SECONDS,
+                        help="seconds a derivation should take")
+    args = parser.parse_args()
+
+    if args.algorithm == SCRYPT:
+        costs = range(SCRYPT_MIN_LOG_N, SCRYPT_MAX_LOG_N + 1)
+    else:
+        costs = [KDF_ITERATIONS * 2 ** i for i in range(5)]
+    for cost in costs:
+        params = KdfParams(args.algorithm, cost)
+        print(f"{params!r:36} {time_derivation(params) * 1000:8.1f} ms")
+
+    params = calibrate(args.algorithm, args.target)
+    print(f"calibrated for {args.target:.2f} s: {params!r} "
+          f"({time_derivation(params) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,103 +1,688 @@
+import atexit
+import copy
 import json
 import os
-from typing import Dict, Optional
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import base64
 
+from logs import get_logger
+from store import DELETE, SET, JournaledStore, Op, apply_op, atomic_write
+from vault import VAULT_SECTIONS, PolicyCache, Vault, VaultError, split_sections
+from watcher import FileWatcher, file_signature
+
+log = get_logger(__name__)
+
+# Seconds without changes before pending settings are written out
+FLUSH_DELAY = 0.5
+# Upper bound on how long a change can stay unwritten during a burst
+MAX_FLUSH_DELAY = 5.0
+
+
+class _Missing:
+    def __repr__(self):
+        return "MISSING"
+
+
+# Stands in for a key that is absent on one side of a SettingsChange
+MISSING = _Missing()
+
+
+class SettingsChange:
+    """One difference between two settings documents, e.g. an added blocked app"""
+    __slots__ = ("path", "old", "new")
+
+    def __init__(self, path: Tuple[str, ...], old: Any, new: Any):
+        self.path = path
+        self.old = old
+        self.new = new
+
+    @property
+    def added(self) -> bool:
+        return self.old is MISSING
+
+    @property
+    def removed(self) -> bool:
+        return self.new is MISSING
+
+    def __repr__(self):
+        return f"SettingsChange({self.path!r}, {self.old!r}, {self.new!r})"
+
+
+def diff_settings(old: Dict, new: Dict, path: Tuple[str, ...] = ()) -> List[SettingsChange]:
+    """Leaf-level differences between two documents, recursing into dicts"""
+    # Decode snapshot maps in bulk rather than one lookup per key
+    old = old if isinstance(old, dict) else dict(old.items())
+    new = new if isinstance(new, dict) else dict(new.items())
+    changes = []
+    for key in list(old) + [key for key in new if key not in old]:
+        before, after = old.get(key, MISSING), new.get(key, MISSING)
+        if isinstance(before, Mapping) and isinstance(after, Mapping):
+            changes.extend(diff_settings(before, after, path + (key,)))
+        elif before != after:
+            changes.append(SettingsChange(path + (key,), before, after))
+    return changes
+
+
+def _plain(value):
+    """value with lazily decoded snapshot maps turned into dicts"""
+    if isinstance(value, Mapping):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
+def default_settings() -> Dict:
+    return {
+        "blocked_apps": {},
+        "salt": None,
+        "password_verifier": None,
+        "kdf": None,
+        "downtime_enabled": False
+    }
+
+
 class Settings:
-    def __init__(self):
-        self.settings_dir = os.path.expanduser("~/Library/Application Support/AppBlocker")
+    """Application settings, served from memory and written behind
+
+    The file is read once at startup. Setters update the in-memory document
+    and wake a background flusher, which waits for a quiet period before
+    writing, so a burst of changes costs one write. flush() forces pending
+    changes out; it also runs at interpreter exit.
+
+    On disk, changes are appended to a journal and periodically folded into
+    an atomically replaced settings.json (see store.JournaledStore), so a
+    crash mid-write loses at most the last unflushed burst.
+
+    After start_watching(), a settings.json replaced from outside (e.g. pushed
+    by an admin) is reloaded and listeners get the list of SettingsChanges.
+
+    With binary=True (the default once settings.snapshot exists) checkpoints
+    use the memory-mapped settings_snapshot format for large blocklists;
+    settings.json then only serves import (including pushes) and export.
+
+    The first unlock_vault() moves the blocking policy (VAULT_SECTIONS) out
+    of the plain store into an encrypted vault.Vault, whose data key is kept
+    wrapped by the password session. From then on the policy only changes
+    through this process: pushed or imported documents cannot change it
+    (an import can while the vault is unlocked). Until the next unlock the
+    policy is served from an integrity-checked vault.PolicyCache, so
+    enforcement starts without a password; each unlock restores the vault's
+    policy over whatever the cache held. Without a usable cache the app
+    starts in full lockdown until the vault is unlocked, and that
+    placeholder policy is never written anywhere.
+    """
+
+    def __init__(self, settings_dir: Optional[str] = None, flush_delay: float = FLUSH_DELAY,
+                 binary: Optional[bool] = None):
+        self.settings_dir = settings_dir or os.path.expanduser("~/Library/Application Support/AppBlocker")
         self.settings_file = os.path.join(self.settings_dir, "settings.json")
+        self.snapshot_file = os.path.join(self.settings_dir, "settings.snapshot")
+        self.flush_delay = flush_delay
         self.ensure_settings_dir()
-        
+        if binary is None:
+            binary = os.path.exists(self.snapshot_file)
+        self.binary = binary
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        # Serializes writers so an older document never lands after a newer one
+        self._write_lock = threading.Lock()
+        if binary:
+            self._store = JournaledStore(self.snapshot_file)
+            if not os.path.exists(self.snapshot_file):
+                # First binary start: convert the JSON settings and their journal
+                json_store = JournaledStore(self.settings_file)
+                document = json_store.load(default_settings)
+                self._store.checkpoint(self._store.encode(document))
+                json_store.remove()
+        else:
+            self._store = JournaledStore(self.settings_file)
+        self._data = self._store.load(default_settings)
+        self.vault_file = os.path.join(self.settings_dir, "settings.vault")
+        self._vault = Vault(self.vault_file)
+        self._policy = PolicyCache(os.path.join(self.settings_dir, "policy.cache"),
+                                   os.path.join(self.settings_dir, "policy.key"))
+        # Policy generation last written to the cache, and whether it is stale
+        self._policy_generation = 0
+        self._policy_dirty = False
+        # False while the policy in memory is the lockdown stand-in for a
+        # missing or failed cache; it may then not replace the vault or cache
+        self._policy_verified = True
+        # True once the policy lives in the vault rather than the plain store;
+        # a deleted vault file does not turn the plaintext policy back on
+        self._vaulted = self._vault.exists() or "vault_key" in self._data
+        if self._vaulted:
+            self._load_policy_cache()
+        # settings.json as last seen, so only outside changes trigger a reload
+        self._json_signature = file_signature(self.settings_file)
+        # Journal operations not yet written, oldest first
+        self._pending: List[Op] = []
+        # Set when a change is too broad to journal and needs a full rewrite
+        self._rewrite = False
+        # Monotonic times of the first and latest unwritten change
+        self._dirty_since: Optional[float] = None
+        self._last_change: Optional[float] = None
+        self._closed = False
+        self._listeners: List[Callable[[List[SettingsChange]], None]] = []
+        self._watcher: Optional[FileWatcher] = None
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _load_policy_cache(self):
+        """Serve the policy from the cache until the vault is unlocked"""
+        self._data, stale = split_sections(self._data)
+        if stale:
+            # Plaintext policy left in the store; scrub it at the next flush
+            self._rewrite = True
+        defaults = default_settings()
+        sections = {name: defaults[name] for name in VAULT_SECTIONS if name in defaults}
+        cached = self._policy.load()
+        if cached is None:
+            log.warning("No usable policy cache; staying in full lockdown until the vault is unlocked")
+            self._policy_verified = False
+            sections.update(downtime_enabled=True,
+                            last_state={"blocking_enabled": True, "downtime_enabled": True})
+        else:
+            self._policy_generation, cached_sections = cached
+            sections.update(cached_sections)
+        self._data.update(sections)
+
+    def _stored_document(self) -> Dict:
+        """What goes into the plain store; caller holds self._lock"""
+        return split_sections(self._data)[0] if self._vaulted else self._data
+
     def ensure_settings_dir(self):
         if not os.path.exists(self.settings_dir):
             os.makedirs(self.settings_dir)
-    
+
+    def _get(self, key: str, expected: type, default: Any) -> Any:
+        """Value of key if it has the expected type, else default"""
+        with self._lock:
+            value = self._data.get(key, default)
+        return value if isinstance(value, expected) else default
+
+    def _set(self, key: str, value: Any):
+        self._change([(SET, [key], value)])
+
+    def _change(self, ops: List[Op]):
+        """Apply ops to the document and queue them for the journal"""
+        with self._lock:
+            for op in ops:
+                apply_op(self._data, op)
+            if self._vaulted:
+                for _, path, _ in ops:
+                    if path[0] in VAULT_SECTIONS:
+                        self._vault.mark_dirty(path, self._data.get(path[0]))
+                        self._policy_dirty = True
+                # The policy never reaches the plaintext journal
+                ops = [op for op in ops if op[1][0] not in VAULT_SECTIONS]
+            # Values are serialized at flush time, so keep private copies
+            self._pending.extend((kind, path, copy.deepcopy(value)) for kind, path, value in ops)
+            self._mark_dirty()
+
+    def _mark_dirty(self):
+        # Caller holds self._lock
+        now = time.monotonic()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        self._last_change = now
+        self._changed.notify()
+
+    def _flush_loop(self):
+        while True:
+            with self._changed:
+                while self._dirty_since is None and not self._closed:
+                    self._changed.wait()
+                if self._dirty_since is None:
+                    return
+                # Debounce: wait for a quiet period, but not forever
+                while not self._closed and self._dirty_since is not None:
+                    due = min(self._last_change + self.flush_delay,
+                              self._dirty_since + MAX_FLUSH_DELAY)
+                    remaining = due - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._changed.wait(remaining)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def flush(self):
+        """Write pending changes now"""
+        with self._write_lock:
+            with self._lock:
+                if self._dirty_since is None:
+                    return
+                ops, self._pending = self._pending, []
+                rewrite, self._rewrite = self._rewrite, False
+                payload = self._store.encode(self._stored_document()) if rewrite else None
+                policy = chunks = None
+                if self._policy_dirty and self._policy_verified:
+                    self._policy_dirty = False
+                    self._policy_generation += 1
+                    generation = self._policy_generation
+                    policy = PolicyCache.capture(self._data)
+                    if self._vault.unlocked:
+                        # While locked the marks stay until the next unlock
+                        chunks = self._vault.take_dirty(self._data)
+                self._dirty_since = None
+            try:
+                if not rewrite and ops and self._store.append(ops):
+                    with self._lock:
+                        payload = self._store.encode(self._stored_document())
+                    rewrite = True
+                if rewrite:
+                    self._store.checkpoint(payload)
+                if policy is not None:
+                    self._policy.write(self._policy.encode(generation, policy))
+                    if chunks is not None:
+                        self._vault.write(chunks, generation)
+            except (OSError, VaultError) as e:
+                log.error("Error saving settings: %s", e)
+                with self._lock:
+                    # Nothing partial is trusted; rewrite everything next time
+                    self._rewrite = True
+                    self._pending.clear()
+                    if self._vaulted:
+                        self._vault.mark_all_dirty()
+                        self._policy_dirty = True
+                    self._mark_dirty()
+
+    def close(self):
+        """Flush and stop the background writer"""
+        self.stop_watching()
+        with self._lock:
+            self._closed = True
+            self._changed.notify()
+        self.flush()
+        self._vault.lock()
+
+    def add_listener(self, callback: Callable[[List[SettingsChange]], None]):
+        """Call callback with the changes of each external reload (on the watcher thread)"""
+        self._listeners.append(callback)
+
+    def start_watching(self):
+        """Reload settings.json whenever something else changes it"""
+        if self._watcher is None:
+            self._watcher = FileWatcher(self.settings_file, self.reload)
+            self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def reload(self) -> List[SettingsChange]:
+        """Adopt settings.json if it was changed externally and return what changed
+
+        Unflushed local changes are dropped: the pushed file wins.
+        """
+        with self._write_lock:
+            signature = file_signature(self.settings_file)
+            known = self._json_signature if self.binary else self._store.signature
+            if signature is None or signature == known:
+                return []
+            try:
+                with open(self.settings_file, 'rb') as f:
+                    data = f.read()
+                document = json.loads(data)
+            except (OSError, ValueError):
+                # Probably still being written; the next event brings the rest
+                return []
+            if not isinstance(document, dict):
+                return []
+            if self.binary:
+                # Import: the snapshot gets rewritten from the pushed document
+                self._json_signature = signature
+                with self._lock:
+                    self._adopt_policy(document, trusted=False)
+                    old, self._data = self._data, document
+                    self._pending.clear()
+                    self._rewrite = True
+                    self._mark_dirty()
+            else:
+                with self._lock:
+                    # A pushed policy is dropped and scrubbed from the file
+                    scrub = self._adopt_policy(document, trusted=False)
+                    old, self._data = self._data, document
+                    self._pending.clear()
+                    self._rewrite = scrub
+                    self._dirty_since = None
+                    if scrub or self._policy_dirty:
+                        self._mark_dirty()
+                self._store.adopt(signature, data)
+
+        changes = diff_settings(old, document)
+        self._notify(changes)
+        return changes
+
+    def _adopt_policy(self, document: Dict, trusted: bool) -> bool:
+        """Prepare a replacement document once the policy lives in the vault
+
+        Policy sections are only taken from a trusted document and then
+        queued for the vault; otherwise the current ones replace them, as
+        they do for sections the document leaves out. The wrapped vault key
+        is always kept. True if the plain store must be rewritten to drop
+        the document's policy. Caller holds self._lock.
+        """
+        if not self._vaulted:
+            return False
+        scrub = False
+        for name in VAULT_SECTIONS:
+            if name in document:
+                scrub = True
+                if trusted:
+                    self._vault.mark_dirty([name])
+                    self._policy_dirty = True
+                    continue
+                if _plain(document[name]) != _plain(self._data.get(name)):
+                    log.warning("Ignoring %s from a settings document; the policy changes only with the password",
+                                name)
+                del document[name]
+            if name in self._data:
+                document[name] = self._data[name]
+        for key in ("vault_key", "vault_key_kdf"):
+            if key in self._data and document.get(key) != self._data[key]:
+                # Replacing or dropping the wrapped key would orphan the vault
+                document[key] = self._data[key]
+                scrub = True
+        return scrub
+
+    def _notify(self, changes: List[SettingsChange]):
+        if changes:
+            for callback in self._listeners:
+                try:
+                    callback(changes)
+                except Exception as e:
+                    log.exception("Settings listener error: %s", e)
+
+    @property
+    def vault_unlocked(self) -> bool:
+        return self._vault.unlocked
+
+    @property
+    def policy_verified(self) -> bool:
+        """False while the lockdown stand-in for a missing policy cache is in force"""
+        return self._policy_verified
+
+    def get_vault_key_kdf(self) -> Tuple[Optional[bytes], Optional[Dict]]:
+        """(salt, kdf params) of the password the vault key is wrapped for"""
+        wrap = self._get("vault_key_kdf", Mapping, {})
+        salt = wrap.get("salt")
+        return (base64.b64decode(salt.encode()) if isinstance(salt, str) else None,
+                wrap.get("kdf"))
+
+    def _wrap_vault_key(self, keyring, data_key: bytes) -> List[Op]:
+        """Ops storing data_key wrapped by keyring, the stored password's session"""
+        return [
+            (SET, ["vault_key"], keyring.encrypt(data_key).decode()),
+            (SET, ["vault_key_kdf"], {"salt": self._get("salt", str, None),
+                                      "kdf": self.get_kdf_params()}),
+        ]
+
+    def _may_replace_vault(self) -> bool:
+        """True if the policy in memory is safe to rebuild the vault from
+
+        Only a policy from a verified cache at least as new as the vault
+        qualifies; anything else would overwrite the one encrypted copy.
+        Caller holds self._write_lock.
+        """
+        if not self._vaulted:
+            return True
+        generation = self._vault.stored_generation()
+        return self._policy_verified and (generation is None or self._policy_generation >= generation)
+
+    def unlock_vault(self, keyring) -> bool:
+        """Decrypt the policy with the vault key, unwrapped by keyring
+
+        keyring is an unlocked Security (anything with encrypt/decrypt). The
+        first call creates the vault and moves the policy out of the plain
+        store. If the vault was modified, it is rebuilt only from a verified
+        cache at least as new as it (see _may_replace_vault). A vault that
+        is wrapped for another password is left alone, and the caller can
+        unlock it with that password's keyring. Listeners hear about sections
+        that differ from the cache. Returns True once unlocked.
+        """
+        self.flush()
+        with self._write_lock:
+            if self._vault.unlocked:
+                return True
+            changes = []
+            wrapped = self._get("vault_key", str, None)
+            sections = None
+            if self._vaulted and wrapped is not None:
+                try:
+                    data_key = keyring.decrypt(wrapped.encode())
+                except PermissionError as e:
+                    log.error("Cannot unlock settings vault: %s", e)
+                    return False
+                except ValueError:
+                    log.warning("Settings vault key is wrapped for another password; leaving the vault as it is")
+                    return False
+                try:
+                    sections = self._vault.unlock(data_key)
+                except VaultError as e:
+                    if not self._may_replace_vault():
+                        log.error("Settings vault unusable (%s); keeping it and enforcing the current policy", e)
+                        return False
+                    log.warning("Settings vault unusable (%s); recreating it from the verified policy cache", e)
+            elif not self._may_replace_vault():
+                log.error("Settings vault has no stored key; keeping it and enforcing the current policy")
+                return False
+            if sections is None:
+                data_key = Vault.new_key()
+                ops = self._wrap_vault_key(keyring, data_key)
+                with self._lock:
+                    self._vault.create(data_key)
+                    self._vaulted = True
+                    for op in ops:
+                        apply_op(self._data, op)
+                    # Checkpoint without the policy, which also empties the journal
+                    self._rewrite = True
+                    self._policy_dirty = True
+                    self._mark_dirty()
+            else:
+                with self._lock:
+                    # The vault is authoritative: anything that changed the
+                    # cache without the password is undone here
+                    if self._policy_generation > self._vault.generation:
+                        log.warning("Policy cache is newer than the vault; restoring the vault's policy")
+                    old = {name: self._data[name] for name in VAULT_SECTIONS if name in self._data}
+                    changes = diff_settings(old, sections)
+                    self._data.update(sections)
+                    self._policy_generation = self._vault.generation
+                    if not self._policy_verified:
+                        # The lockdown stand-in is gone; rewrite the cache
+                        self._policy_verified = True
+                        self._policy_dirty = True
+                    if changes or self._vault.dirty:
+                        self._policy_dirty = True
+                        self._mark_dirty()
+        self._notify(changes)
+        return True
+
+    def rekey_vault(self, keyring, old_keyring=None) -> bool:
+        """Wrap the vault key for the stored password, whose session is keyring
+
+        A locked vault is first unlocked with old_keyring, the session of the
+        password it is wrapped for. Without one that works, the vault stays
+        wrapped for the old password and False is returned.
+        """
+        if self._vaulted and not self._vault.unlocked:
+            if old_keyring is None or not self.unlock_vault(old_keyring):
+                log.error("Settings vault is locked; it stays wrapped for the previous password")
+                return False
+        data_key = self._vault.data_key
+        if data_key is None:
+            # No vault yet; the first unlock creates it for this password
+            return False
+        self._change(self._wrap_vault_key(keyring, data_key))
+        return True
+
+    def lock_vault(self):
+        """Write pending policy changes and forget the vault key"""
+        self.flush()
+        with self._write_lock:
+            self._vault.lock()
+
     def save_settings(self, settings_dict: Dict) -> None:
-        """Save all settings to file"""
-        with open(self.settings_file, 'w') as f:
-            json.dump(settings_dict, f, indent=2)
-    
+        """Replace all settings; the policy only while the vault is unlocked"""
+        with self._lock:
+            document = copy.deepcopy(settings_dict)
+            self._adopt_policy(document, trusted=self._vault.unlocked)
+            self._data = document
+            self._pending.clear()
+            self._rewrite = True
+            self._mark_dirty()
+
     def load_settings(self) -> Dict:
-        """Load all settings from file"""
-        if not os.path.exists(self.settings_file):
-            return {
-                "blocked_apps": {},
-                "salt": None,
-                "downtime_enabled": False
-            }
-        
-        try:
-            with open(self.settings_file, 'r') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return {
-                "blocked_apps": {},
-                "salt": None,
-                "downtime_enabled": False
-            }
-    
+        """Copy of all settings"""
+        with self._lock:
+            return _plain(self._data)
+
+    def export_json(self, path: Optional[str] = None):
+        """Write all settings as readable JSON (to settings.json by default)
+
+        A vaulted policy is only exported to an explicit path, never into
+        settings.json.
+        """
+        path = path or self.settings_file
+        with self._lock:
+            document = self._stored_document() if path == self.settings_file else self._data
+            payload = json.dumps(_plain(document), indent=2)
+        with self._write_lock:
+            atomic_write(path, payload.encode())
+            if path == self.settings_file:
+                self._json_signature = file_signature(path)
+                if not self.binary:
+                    # The export is the checkpoint now; journal against it
+                    self._store.adopt(self._json_signature, payload.encode())
+
+    def import_json(self, path: str):
+        """Replace all settings with a JSON export"""
+        with open(path, 'r') as f:
+            document = json.load(f)
+        if not isinstance(document, dict):
+            raise ValueError(f"{path} does not contain a settings object")
+        self.save_settings(document)
+
     def save_blocked_apps(self, app_paths: Dict[str, str]) -> None:
-        """Save blocked apps to settings file"""
-        settings = self.load_settings()
-        settings["blocked_apps"] = app_paths
-        self.save_settings(settings)
-    
-    def load_blocked_apps(self) -> Dict[str, str]:
-        """Load blocked apps from settings file"""
-        settings = self.load_settings()
-        return settings.get("blocked_apps", {})
-    
+        """Save blocked apps"""
+        self._set("blocked_apps", dict(app_paths))
+
+    def add_blocked_app(self, name: str, path: str) -> None:
+        """Add one blocked app (journals just this entry)"""
+        self._change([(SET, ["blocked_apps", name], path)])
+
+    def remove_blocked_app(self, name: str) -> None:
+        """Remove one blocked app"""
+        self._change([(DELETE, ["blocked_apps", name], None)])
+
+    def load_blocked_apps(self) -> Mapping:
+        """Load blocked apps"""
+        apps = self._get("blocked_apps", Mapping, {})
+        # Snapshot maps are read-only and decode lazily; hand them out as is
+        return apps if not isinstance(apps, dict) else dict(apps)
+
     def save_password_salt(self, salt: bytes) -> None:
         """Save password salt"""
-        settings = self.load_settings()
-        settings["salt"] = base64.b64encode(salt).decode('utf-8')
-        self.save_settings(settings)
-    
+        self._set("salt", base64.b64encode(salt).decode('utf-8'))
+
+    def save_password(self, salt: bytes, verifier: bytes, kdf: Optional[Dict] = None) -> None:
+        """Save the salt, verifier and key derivation parameters of a password together"""
+        self._change([
+            (SET, ["salt"], base64.b64encode(salt).decode('utf-8')),
+            (SET, ["password_verifier"], base64.b64encode(verifier).decode('utf-8')),
+            (SET, ["kdf"], kdf),
+        ])
+
+    def get_kdf_params(self) -> Optional[Dict]:
+        """Key derivation parameters of the stored password (None if never recorded)"""
+        return self._get("kdf", dict, None)
+
+    def get_kdf_algorithm(self) -> str:
+        """Key derivation algorithm for new passwords"""
+        return self._get("kdf_algorithm", str, "pbkdf2-sha256")
+
+    def get_password_verifier(self) -> Optional[bytes]:
+        """Get stored password verifier"""
+        verifier = self._get("password_verifier", str, None)
+        return base64.b64decode(verifier.encode('utf-8')) if verifier else None
+
     def get_password_salt(self) -> Optional[bytes]:
         """Get stored password salt"""
-        settings = self.load_settings()
-        salt = settings.get("salt")
+        salt = self._get("salt", str, None)
         return base64.b64decode(salt.encode('utf-8')) if salt else None
-    
+
     def has_password(self) -> bool:
         """Check if a password has been set"""
-        return self.get_password_salt() is not None
-    
+        # Settings from before verifiers were stored cannot check a password
+        return (self._get("salt", str, None) is not None
+                and self._get("password_verifier", str, None) is not None)
+
+    def get_downtime_enabled(self) -> bool:
+        """Check if full lockdown is on"""
+        return self._get("downtime_enabled", bool, False)
+
+    def set_downtime_enabled(self, enabled: bool):
+        """Set full lockdown state"""
+        self._set("downtime_enabled", bool(enabled))
+
     def save_state(self, blocking_enabled: bool, downtime_enabled: bool) -> None:
         """Save the current state of blocking and downtime"""
-        settings = self.load_settings()
-        settings["last_state"] = {
+        self._set("last_state", {
             "blocking_enabled": blocking_enabled,
             "downtime_enabled": downtime_enabled
-        }
-        self.save_settings(settings) 
-    
+        })
+
+    def get_last_state(self) -> Dict:
+        """State saved by save_state, or {} if there is none"""
+        return dict(self._get("last_state", Mapping, {}))
+
     def get_tutorial_shown(self) -> bool:
         """Check if tutorial has been shown"""
-        settings = self.load_settings()
-        return settings.get("tutorial_shown", False)
-    
+        return self._get("tutorial_shown", bool, False)
+
     def set_tutorial_shown(self, shown: bool):
         """Set tutorial shown state"""
-        settings = self.load_settings()
-        settings["tutorial_shown"] = shown
-        self.save_settings(settings) 
-    
+        self._set("tutorial_shown", bool(shown))
+
+    def get_theme(self) -> str:
+        """Get the name of the selected theme"""
+        return self._get("theme", str, "game")
+
+    def set_theme(self, name: str):
+        """Set the selected theme"""
+        self._set("theme", name)
+
     def clear_settings(self):
         """Clear all settings and start fresh"""
-        if os.path.exists(self.settings_file):
-            os.remove(self.settings_file)
-        
+        with self._write_lock:
+            with self._lock:
+                self._data = default_settings()
+                self._pending.clear()
+                self._rewrite = False
+                self._dirty_since = None
+                self._policy_dirty = False
+                self._policy_generation = 0
+                self._policy_verified = True
+                self._vaulted = False
+            self._store.remove()
+            self._vault.remove()
+            self._policy.remove()
+            if self.binary and os.path.exists(self.settings_file):
+                os.remove(self.settings_file)
+            self._json_signature = None
+
         # Reset to defaults
-        return {
-            "blocked_apps": {},
-            "salt": None,
-            "downtime_enabled": False
-        }
-    
+        return default_settings()
+
     def reset_password(self):
-        """Remove just the password salt"""
-        settings = self.load_settings()
-        settings["salt"] = None
-        self.save_settings(settings) 
\ No newline at end of file
+        """Remove just the password salt, verifier and parameters"""
+        self._change([(SET, ["salt"], None), (SET, ["password_verifier"], None), (SET, ["kdf"], None)])
@@ -0,0 +1,260 @@
+import bisect
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping
+from itertools import accumulate, chain
+from typing import Dict, Iterator, Optional
+
+# Layout (little endian):
+#
+#   header   MAGIC, version u16, flags u16, crc32 u32, body length u64
+#            (flag ASCII: every string is ASCII, so byte offsets are
+#            character offsets and the blob can be decoded in one go)
+#   body     string table: count u32, (count + 1) u32 offsets, utf-8 blob
+#            string maps:  count u32, then per map: key string id u32,
+#                          entry count u32, (name id u32, value id u32)
+#                          pairs sorted by name bytes
+#            rest:         length u32, JSON of every other top-level key
+#
+# Top-level values that map strings to strings (like blocked_apps) become
+# string maps, readable in place by binary search; everything else is small
+# and stays JSON. The checksum covers the body.
+MAGIC = b"BBSNAP"
+VERSION = 1
+ASCII = 0x1
+
+_HEADER = struct.Struct("<6sHHIQ")
+_U32 = struct.Struct("<I")
+_PAIR = struct.Struct("<II")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _u32_array(values) -> bytes:
+    packed = array("I", values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _u32_list(data) -> list:
+    unpacked = array("I")
+    unpacked.frombytes(data)
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked.tolist()
+
+
+def _is_string_map(value) -> bool:
+    return isinstance(value, Mapping) and all(
+        isinstance(k, str) and isinstance(v, str) for k, v in value.items())
+
+
+def encode_snapshot(document: Mapping) -> bytes:
+    """Serialize a settings document into the binary snapshot format"""
+    maps = []
+    rest = {}
+    for key, value in document.items():
+        if value and _is_string_map(value):
+            # UTF-8 preserves code point order, so this is byte order too
+            items = sorted(value.items())
+            maps.append((key, [name for name, _ in items], [path for _, path in items]))
+        else:
+            rest[key] = value
+
+    # Intern every string once, in first-seen order
+    strings = list(dict.fromkeys(chain.from_iterable(
+        chain((key,), names, values) for key, names, values in maps)))
+    ids = {string: i for i, string in enumerate(strings)}
+    text = "".join(strings)
+    if text.isascii():
+        blob = text.encode("ascii")
+        lengths = map(len, strings)
+    else:
+        encoded = [string.encode() for string in strings]
+        blob = b"".join(encoded)
+        lengths = map(len, encoded)
+    offsets = [0]
+    offsets.extend(accumulate(lengths))
+
+    body = bytearray()
+    body += _U32.pack(len(strings))
+    body += _u32_array(offsets)
+    body += blob
+
+    body += _U32.pack(len(maps))
+    for key, names, values in maps:
+        pairs = [0] * (2 * len(names))
+        pairs[0::2] = [ids[name] for name in names]
+        pairs[1::2] = [ids[value] for value in values]
+        body += _PAIR.pack(ids[key], len(names))
+        body += _u32_array(pairs)
+
+    rest_json = json.dumps(rest, separators=(",", ":"), default=dict).encode()
+    body += _U32.pack(len(rest_json))
+    body += rest_json
+    flags = ASCII if blob.isascii() else 0
+    return _HEADER.pack(MAGIC, VERSION, flags, zlib.crc32(body), len(body)) + bytes(body)
+
+
+class Snapshot:
+    """A memory-mapped snapshot; strings are decoded only when asked for"""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if len(view) < _HEADER.size:
+            raise SnapshotError("Snapshot too short")
+        magic, version, self.flags, crc, length = _HEADER.unpack_from(view)
+        self.checksum = crc
+        if magic != MAGIC:
+            raise SnapshotError("Not a settings snapshot")
+        if version != VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version}")
+        body = view[_HEADER.size:_HEADER.size + length]
+        if len(body) != length or zlib.crc32(body) != crc:
+            raise SnapshotError("Snapshot checksum mismatch")
+        self._view = body
+        # Whole-table caches, built on the first bulk decode
+        self._offset_table = None
+        self._text = None
+
+        (count,) = _U32.unpack_from(body, 0)
+        self._offsets = 4
+        self._blob = 4 + 4 * (count + 1)
+        (blob_size,) = _U32.unpack_from(body, self._offsets + 4 * count)
+        position = self._blob + blob_size
+
+        self.maps: Dict[str, StringMap] = {}
+        (map_count,) = _U32.unpack_from(body, position)
+        position += 4
+        for _ in range(map_count):
+            key_id, entries = _PAIR.unpack_from(body, position)
+            position += _PAIR.size
+            self.maps[self.string(key_id)] = StringMap(self, position, entries)
+            position += entries * _PAIR.size
+
+        (rest_size,) = _U32.unpack_from(body, position)
+        position += 4
+        self.rest = json.loads(bytes(body[position:position + rest_size]))
+
+    def raw(self, string_id: int) -> bytes:
+        start, end = struct.unpack_from("<II", self._view, self._offsets + 4 * string_id)
+        return bytes(self._view[self._blob + start:self._blob + end])
+
+    def string(self, string_id: int) -> str:
+        return self.raw(string_id).decode()
+
+    def pair(self, position: int):
+        return _PAIR.unpack_from(self._view, position)
+
+    def ids(self, position: int, count: int) -> list:
+        return _u32_list(self._view[position:position + 4 * count])
+
+    def strings(self, ids) -> list:
+        """Decode many strings at once"""
+        if self._offset_table is None:
+            count = (self._blob - self._offsets) // 4
+            self._offset_table = _u32_list(self._view[self._offsets:self._blob])
+            if self.flags & ASCII:
+                self._text = bytes(self._view[self._blob:self._blob + self._offset_table[count - 1]]).decode()
+        offsets = self._offset_table
+        text = self._text
+        if text is not None:
+            return [text[offsets[i]:offsets[i + 1]] for i in ids]
+        blob = self._view[self._blob:]
+        return [bytes(blob[offsets[i]:offsets[i + 1]]).decode() for i in ids]
+
+    def document(self) -> Dict:
+        """Top-level document with string maps left as lazy StringMaps"""
+        document = dict(self.rest)
+        document.update(self.maps)
+        return document
+
+
+class StringMap(Mapping):
+    """Read-only str -> str mapping decoded lazily from a Snapshot
+
+    Lookups binary-search the sorted entries, decoding O(log n) strings.
+    dict(string_map.items()) gives a mutable copy in one bulk decode.
+    """
+
+    def __init__(self, snapshot: Snapshot, position: int, count: int):
+        self._snapshot = snapshot
+        self._position = position
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def _entry(self, index: int):
+        return self._snapshot.pair(self._position + index * _PAIR.size)
+
+    def _find(self, key: str) -> Optional[int]:
+        target = key.encode()
+        names = _NameView(self)
+        index = bisect.bisect_left(names, target)
+        if index < self._count and names[index] == target:
+            return index
+        return None
+
+    def __getitem__(self, key):
+        index = self._find(key) if isinstance(key, str) else None
+        if index is None:
+            raise KeyError(key)
+        return self._snapshot.string(self._entry(index)[1])
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self._find(key) is not None
+
+    def _ids(self) -> list:
+        return self._snapshot.ids(self._position, 2 * self._count)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._snapshot.strings(self._ids()[0::2]))
+
+    def values(self):
+        return self._snapshot.strings(self._ids()[1::2])
+
+    def items(self):
+        ids = self._ids()
+        strings = self._snapshot.strings
+        return list(zip(strings(ids[0::2]), strings(ids[1::2])))
+
+    def __repr__(self):
+        return f"StringMap({len(self)} entries)"
+
+
+class _NameView:
+    """Sequence of a StringMap's raw names, for bisect"""
+
+    def __init__(self, string_map: StringMap):
+        self._map = string_map
+
+    def __len__(self):
+        return self._map._count
+
+    def __getitem__(self, index: int) -> bytes:
+        return self._map._snapshot.raw(self._map._entry(index)[0])
+
+
+def snapshot_checksum(data: bytes) -> int:
+    """The body checksum recorded in an encoded snapshot's header"""
+    return _HEADER.unpack_from(data)[3]
+
+
+def load_snapshot(path: str) -> Snapshot:
+    """Memory-map a snapshot file"""
+    with open(path, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            raise SnapshotError("Snapshot too short")
+    return Snapshot(buffer)
@@ -0,0 +1,254 @@
+import json
+import os
+import time
+import zlib
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from logs import get_logger
+from settings_snapshot import SnapshotError, encode_snapshot, load_snapshot, snapshot_checksum
+from watcher import file_signature
+
+log = get_logger(__name__)
+
+# Journal size that triggers folding it into a fresh checkpoint
+CHECKPOINT_BYTES = 256 * 1024
+
+# Journal operations: (SET, path, value) and (DELETE, path, None), where path
+# is a list of keys from the document root
+SET = "set"
+DELETE = "delete"
+
+Op = Tuple[str, List[str], Any]
+
+# First journal line: checksum of the checkpoint its entries apply to
+_JOURNAL_HEADER = b"#checkpoint %08x\n"
+
+
+def atomic_write(path: str, data: bytes):
+    """Replace path with data so readers see either the old or the new file"""
+    directory = os.path.dirname(path) or "."
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(directory)
+
+
+def _fsync_dir(directory: str):
+    # Makes the rename itself durable; not supported everywhere
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def apply_op(document: Dict, op: Op):
+    """Apply one journal operation to document in place"""
+    kind, path, value = op
+    *parents, key = path
+    node = document
+    for part in parents:
+        child = node.get(part)
+        if isinstance(child, Mapping) and not isinstance(child, dict):
+            # A lazily decoded snapshot map; copy it before the first change
+            child = node[part] = dict(child.items())
+        if not isinstance(child, dict):
+            if kind == DELETE:
+                return
+            child = node[part] = {}
+        node = child
+    if kind == SET:
+        node[key] = value
+    elif kind == DELETE:
+        node.pop(key, None)
+    else:
+        raise ValueError(f"Unknown journal operation: {kind}")
+
+
+def _encode(op: Op) -> bytes:
+    body = json.dumps(list(op), separators=(",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(body), body)
+
+
+def _decode(line: bytes) -> Optional[Op]:
+    """Parse one journal line, or None if it is torn or corrupt"""
+    if len(line) < 10 or not line.endswith(b"\n") or line[8:9] != b" ":
+        return None
+    body = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(body):
+            return None
+        kind, path, value = json.loads(body)
+    except ValueError:
+        return None
+    return kind, path, value
+
+
+class JournaledStore:
+    """A JSON document kept as a checkpoint file plus a write-ahead journal
+
+    Small changes are appended (and fsynced) to the journal; once it grows
+    past CHECKPOINT_BYTES the whole document is rewritten atomically and the
+    journal truncated. The journal starts with the checksum of the checkpoint
+    it extends. A crash between writing a checkpoint and truncating the
+    journal leaves entries for the previous checkpoint, which load() skips:
+    they are already in the new one, and replaying them could undo later
+    changes.
+
+    A path ending in .snapshot stores checkpoints in the binary
+    settings_snapshot format instead of JSON.
+    """
+
+    def __init__(self, path: str, checkpoint_bytes: int = CHECKPOINT_BYTES):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.binary = path.endswith(".snapshot")
+        self.checkpoint_bytes = checkpoint_bytes
+        self.journal_size = 0
+        # file_signature() of the checkpoint as we last read or wrote it
+        self.signature = None
+        # Checksum of that checkpoint, 0 while there is none
+        self.checkpoint_id = 0
+
+    def load(self, defaults: Callable[[], Dict]) -> Dict:
+        """Recover the document: last checkpoint plus every intact journal entry"""
+        document = self._load_checkpoint(defaults)
+        ops, intact, base = self._read_journal()
+        stale = base is not None and base != self.checkpoint_id
+        if stale:
+            log.warning("Ignoring a settings journal older than the settings checkpoint")
+            ops, intact = [], True
+        for op in ops:
+            try:
+                apply_op(document, op)
+            except (ValueError, TypeError) as e:
+                log.warning("Skipping bad settings journal entry: %s", e)
+        if ops or not intact:
+            # Fold the journal in so new entries never follow a torn tail
+            self.checkpoint(self.encode(document))
+            if not intact:
+                log.warning("Recovered settings from a partially written journal")
+        elif stale:
+            self._reset_journal()
+        elif os.path.exists(self.journal_path):
+            self.journal_size = os.path.getsize(self.journal_path)
+        return document
+
+    def _load_checkpoint(self, defaults: Callable[[], Dict]) -> Dict:
+        if not os.path.exists(self.path):
+            return defaults()
+        try:
+            signature = file_signature(self.path)
+            if self.binary:
+                snapshot = load_snapshot(self.path)
+                document = snapshot.document()
+                checksum = snapshot.checksum
+            else:
+                with open(self.path, "rb") as f:
+                    data = f.read()
+                document = json.loads(data)
+                checksum = zlib.crc32(data)
+            if isinstance(document, dict):
+                self.signature = signature
+                self.checkpoint_id = checksum
+                return document
+        except (OSError, ValueError, SnapshotError):
+            pass
+        # Keep the damaged file for inspection rather than overwriting it
+        damaged = f"{self.path}.corrupt-{int(time.time())}"
+        try:
+            os.replace(self.path, damaged)
+            log.error("Settings file was unreadable; moved it to %s", damaged)
+        except OSError:
+            pass
+        return defaults()
+
+    def _read_journal(self) -> Tuple[List[Op], bool, Optional[int]]:
+        """Intact operations, False if a damaged entry cut the replay short,
+        and the checksum of the checkpoint the journal extends (None if the
+        journal has no header)
+        """
+        try:
+            with open(self.journal_path, "rb") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return [], True, None
+        base = None
+        if lines and lines[0].startswith(b"#"):
+            header = lines.pop(0)
+            try:
+                base = int(header[len(b"#checkpoint "):], 16)
+            except ValueError:
+                # Matches no checkpoint, so the entries are skipped
+                base = -1
+        ops = []
+        for line in lines:
+            op = _decode(line)
+            if op is None:
+                return ops, False, base
+            ops.append(op)
+        return ops, True, base
+
+    def append(self, ops: List[Op]) -> bool:
+        """Durably journal ops; True if a checkpoint is now due"""
+        data = b"".join(_encode(op) for op in ops)
+        if self.journal_size == 0:
+            data = _JOURNAL_HEADER % self.checkpoint_id + data
+        with open(self.journal_path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal_size += len(data)
+        return self.journal_size >= self.checkpoint_bytes
+
+    def encode(self, document: Dict) -> bytes:
+        """Checkpoint bytes for document"""
+        if self.binary:
+            return encode_snapshot(document)
+        return json.dumps(document, default=dict).encode()
+
+    def checksum(self, data: bytes) -> int:
+        """Checksum identifying checkpoint bytes in the journal header"""
+        return snapshot_checksum(data) if self.binary else zlib.crc32(data)
+
+    def checkpoint(self, data: bytes):
+        """Atomically write the full document and start an empty journal"""
+        atomic_write(self.path, data)
+        self.signature = file_signature(self.path)
+        self.checkpoint_id = self.checksum(data)
+        self._reset_journal()
+
+    def adopt(self, signature, data: bytes):
+        """Accept checkpoint bytes written from outside, e.g. pushed by an admin
+
+        The journal described changes to the old file, so it is dropped.
+        """
+        self.signature = signature
+        self.checkpoint_id = self.checksum(data)
+        self._reset_journal()
+
+    def _reset_journal(self):
+        if os.path.exists(self.journal_path):
+            # The checkpoint already holds everything journaled so far
+            header = _JOURNAL_HEADER % self.checkpoint_id
+            atomic_write(self.journal_path, header)
+            self.journal_size = len(header)
+        else:
+            self.journal_size = 0
+
+    def remove(self):
+        for path in (self.path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.journal_size = 0
+        self.signature = None
+        self.checkpoint_id = 0
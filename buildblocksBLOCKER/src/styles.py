@@ -1,16 +1,105 @@
-GAME_STYLE = """
+"""Stylesheet for the whole app, written once against palette tokens
+
+STYLE_TEMPLATE names colors as ${token}; each entry of THEMES gives every
+token a value. themes.stylesheet() renders a theme once and caches it.
+"""
+from string import Template
+
+# Palette tokens per theme
+THEMES = {
+    "game": {
+        "background": "#0A1428",
+        "background_image": "none",
+        "surface": "#1E2328",
+        "surface_raised": "#2F3B46",
+        "surface_sunken": "#1A1F24",
+        "hover_top": "#3F4B56",
+        "hover_middle": "#2E3338",
+        "hover_bottom": "#2A2F34",
+        "border": "#463714",
+        "border_strong": "#785A28",
+        "gold": "#C8AA6E",
+        "text": "#A09B8C",
+        "text_bright": "#F0E6D2",
+        "accent": "#0AC8B9",
+        "accent_fill": "#005A82",
+        "accent_fill_top": "#006F92",
+        "accent_fill_bottom": "#004A72",
+        "accent_fill_hover": "#006B93",
+        "panel": "rgba(30, 35, 40, 0.95)",
+        "panel_hover": "rgba(30, 35, 40, 0.98)",
+        "item": "rgba(0, 0, 0, 0.2)",
+        "item_hover": "rgba(200, 170, 110, 0.1)",
+        "item_selected": "rgba(0, 90, 130, 0.5)",
+        "display": "rgba(30, 35, 40, 0.9)",
+    },
+    "light": {
+        "background": "#F4F1EA",
+        "background_image": "none",
+        "surface": "#FFFFFF",
+        "surface_raised": "#F7F4EE",
+        "surface_sunken": "#ECE7DD",
+        "hover_top": "#FFFFFF",
+        "hover_middle": "#F3EEE4",
+        "hover_bottom": "#EAE3D6",
+        "border": "#CBBE9F",
+        "border_strong": "#9C7A3C",
+        "gold": "#6B5120",
+        "text": "#4A4A4A",
+        "text_bright": "#1F1F1F",
+        "accent": "#00747F",
+        "accent_fill": "#CFEFF2",
+        "accent_fill_top": "#E0F6F8",
+        "accent_fill_bottom": "#B8E6EA",
+        "accent_fill_hover": "#D8F3F5",
+        "panel": "rgba(255, 255, 255, 0.95)",
+        "panel_hover": "rgba(255, 255, 255, 0.98)",
+        "item": "rgba(0, 0, 0, 0.03)",
+        "item_hover": "rgba(156, 122, 60, 0.12)",
+        "item_selected": "rgba(0, 116, 127, 0.18)",
+        "display": "rgba(255, 255, 255, 0.9)",
+    },
+    "high-contrast": {
+        "background": "#000000",
+        "background_image": "none",
+        "surface": "#000000",
+        "surface_raised": "#1A1A1A",
+        "surface_sunken": "#000000",
+        "hover_top": "#333333",
+        "hover_middle": "#262626",
+        "hover_bottom": "#1A1A1A",
+        "border": "#FFFFFF",
+        "border_strong": "#FFFF00",
+        "gold": "#FFFFFF",
+        "text": "#FFFFFF",
+        "text_bright": "#FFFF00",
+        "accent": "#00FFFF",
+        "accent_fill": "#000080",
+        "accent_fill_top": "#0000A0",
+        "accent_fill_bottom": "#000060",
+        "accent_fill_hover": "#0000C0",
+        "panel": "#000000",
+        "panel_hover": "#000000",
+        "item": "transparent",
+        "item_hover": "rgba(255, 255, 0, 0.25)",
+        "item_selected": "#000080",
+        "display": "#000000",
+    },
+}
+
+STYLE_TEMPLATE = Template("""
 /* Main Window */
 QMainWindow {
-    background-color: #0A1428;
-    background-image: url('assets/background.png');
-    color: #C8AA6E;
+    background-color: ${background};
+    background-image: ${background_image};
+    color: ${gold};
 }
 
 /* Buttons */
 QPushButton {
-    background-color: #1E2328;
-    color: #C8AA6E;
-    border: 2px solid #463714;
+    background-color: ${surface};
+    color: ${gold};
+    border: 2px solid ${border};
     border-radius: 3px;
     padding: 8px 20px;
     font-size: 14px;
@@ -18,62 +107,62 @@ QPushButton {
     min-width: 120px;
     text-transform: uppercase;
     background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                              stop:0 #2F3B46, stop:0.5 #1E2328, stop:1 #1A1F24);
+                              stop:0 ${surface_raised}, stop:0.5 ${surface}, stop:1 ${surface_sunken});
 }
 
 QPushButton:hover {
     background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                              stop:0 #3F4B56, stop:0.5 #2E3338, stop:1 #2A2F34);
-    border: 2px solid #C8AA6E;
-    color: #F0E6D2;
+                              stop:0 ${hover_top}, stop:0.5 ${hover_middle}, stop:1 ${hover_bottom});
+    border: 2px solid ${gold};
+    color: ${text_bright};
 }
 
 QPushButton:checked {
     background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                              stop:0 #006F92, stop:0.5 #005A82, stop:1 #004A72);
-    border: 2px solid #0AC8B9;
-    color: #0AC8B9;
+                              stop:0 ${accent_fill_top}, stop:0.5 ${accent_fill}, stop:1 ${accent_fill_bottom});
+    border: 2px solid ${accent};
+    color: ${accent};
 }
 
-/* List Widget */
-QListWidget {
-    background-color: rgba(30, 35, 40, 0.95);
-    border: 2px solid #463714;
+/* Lists */
+QListView {
+    background-color: ${panel};
+    border: 2px solid ${border};
     border-radius: 5px;
-    color: #A09B8C;
+    color: ${text};
     padding: 5px;
     font-size: 13px;
 }
 
-QListWidget::item {
+QListView::item {
     padding: 8px;
     margin: 2px;
-    border: 1px solid #463714;
+    border: 1px solid ${border};
     border-radius: 3px;
-    background: rgba(0, 0, 0, 0.2);
+    background: ${item};
 }
 
-QListWidget::item:hover {
-    background: rgba(200, 170, 110, 0.1);
-    border: 1px solid #C8AA6E;
+QListView::item:hover {
+    background: ${item_hover};
+    border: 1px solid ${gold};
 }
 
-QListWidget::item:selected {
-    background: rgba(0, 90, 130, 0.5);
-    border: 1px solid #0AC8B9;
-    color: #0AC8B9;
+QListView::item:selected {
+    background: ${item_selected};
+    border: 1px solid ${accent};
+    color: ${accent};
 }
 
 /* Labels */
 QLabel {
-    color: #A09B8C;
+    color: ${text};
     font-size: 14px;
     font-weight: bold;
 }
 
 /* Checkboxes */
 QCheckBox {
-    color: #C8AA6E;
+    color: ${gold};
     spacing: 8px;
     font-size: 13px;
     font-weight: bold;
@@ -82,86 +171,112 @@ QCheckBox {
 QCheckBox::indicator {
     width: 20px;
     height: 20px;
-    border: 2px solid #463714;
+    border: 2px solid ${border};
     border-radius: 3px;
     background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                              stop:0 #2F3B46, stop:0.5 #1E2328, stop:1 #1A1F24);
+                              stop:0 ${surface_raised}, stop:0.5 ${surface}, stop:1 ${surface_sunken});
 }
 
 QCheckBox::indicator:hover {
-    border: 2px solid #C8AA6E;
-    background: rgba(200, 170, 110, 0.1);
+    border: 2px solid ${gold};
+    background: ${item_hover};
 }
 
 QCheckBox::indicator:checked {
     background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                              stop:0 #006F92, stop:0.5 #005A82, stop:1 #004A72);
-    border: 2px solid #0AC8B9;
+                              stop:0 ${accent_fill_top}, stop:0.5 ${accent_fill}, stop:1 ${accent_fill_bottom});
+    border: 2px solid ${accent};
 }
 
 /* Header Sections */
-.HeaderSection {
-    background-color: rgba(30, 35, 40, 0.95);
-    border: 2px solid #463714;
+#HeaderSection {
+    background-color: ${panel};
+    border: 2px solid ${border};
     border-radius: 8px;
     margin: 8px;
     padding: 15px;
 }
 
-.HeaderSection:hover {
-    border: 2px solid #785A28;
-    background-color: rgba(30, 35, 40, 0.98);
+#HeaderSection:hover {
+    border: 2px solid ${border_strong};
+    background-color: ${panel_hover};
 }
 
 /* Group Headers */
-.GroupHeader {
-    color: #F0E6D2;
+#GroupHeader {
+    color: ${text_bright};
     font-size: 18px;
     font-weight: bold;
-    border-bottom: 2px solid #785A28;
+    border-bottom: 2px solid ${border_strong};
     padding: 5px 0 10px 0;
     margin-bottom: 15px;
     text-transform: uppercase;
     letter-spacing: 1px;
 }
 
+/* Development Notice */
+#DevNotice {
+    color: ${gold};
+    background: ${surface};
+    border: 1px solid ${border_strong};
+    border-radius: 4px;
+    padding: 8px;
+    font-style: italic;
+    font-size: 13px;
+    font-weight: normal;
+}
+
+/* Text Inputs */
+QLineEdit {
+    background-color: ${surface};
+    border: 2px solid ${border};
+    border-radius: 3px;
+    color: ${gold};
+    padding: 5px;
+    font-size: 13px;
+}
+
+QLineEdit:focus {
+    border: 2px solid ${border_strong};
+}
+
 /* Time Edit Controls */
 QTimeEdit {
-    background-color: #1E2328;
-    border: 2px solid #463714;
+    background-color: ${surface};
+    border: 2px solid ${border};
     border-radius: 3px;
-    color: #C8AA6E;
+    color: ${gold};
     padding: 5px;
     min-width: 100px;
 }
 
 QTimeEdit::up-button, QTimeEdit::down-button {
-    background-color: #2F3B46;
-    border: 1px solid #463714;
+    background-color: ${surface_raised};
+    border: 1px solid ${border};
     border-radius: 2px;
 }
 
 QTimeEdit::up-button:hover, QTimeEdit::down-button:hover {
-    background-color: #3F4B56;
-    border: 1px solid #C8AA6E;
+    background-color: ${hover_top};
+    border: 1px solid ${gold};
 }
 
 /* Scrollbars */
 QScrollBar:vertical {
     border: none;
-    background: #1E2328;
+    background: ${surface};
     width: 12px;
     margin: 0;
 }
 
 QScrollBar::handle:vertical {
-    background: #463714;
+    background: ${border};
     border-radius: 6px;
     min-height: 20px;
 }
 
 QScrollBar::handle:vertical:hover {
-    background: #785A28;
+    background: ${border_strong};
 }
 
 QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
@@ -170,50 +285,106 @@ QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
 
 /* Dialog Windows */
 QDialog {
-    background-color: #0A1428;
-    border: 2px solid #463714;
+    background-color: ${background};
+    border: 2px solid ${border};
+    border-radius: 8px;
+}
+
+/* Tutorial Popups */
+#TutorialContainer {
+    background: ${surface};
+    border: 2px solid ${border_strong};
     border-radius: 8px;
 }
 
+#TutorialScroll, #TutorialScroll QWidget {
+    background: transparent;
+}
+
+#TutorialScroll QScrollBar:vertical {
+    background: ${surface};
+}
+
+#TutorialScroll QScrollBar::handle:vertical {
+    background: ${border_strong};
+}
+
+#TutorialMessage {
+    color: ${gold};
+    font-size: 14px;
+    font-weight: normal;
+    padding: 20px;
+    background: transparent;
+}
+
+#TutorialNext {
+    background: ${accent_fill};
+    color: ${accent};
+    border: 1px solid ${accent};
+    padding: 8px 20px;
+    border-radius: 4px;
+    font-weight: bold;
+    min-width: 0;
+    text-transform: none;
+}
+
+#TutorialNext:hover {
+    background: ${accent_fill_hover};
+}
+
+#TutorialSkip {
+    background: transparent;
+    color: ${border_strong};
+    border: none;
+    padding: 8px 20px;
+    font-weight: normal;
+    min-width: 0;
+    text-transform: none;
+}
+
+#TutorialSkip:hover {
+    color: ${gold};
+}
+
 /* Menu */
 QMenu {
-    background-color: #1E2328;
-    border: 2px solid #463714;
+    background-color: ${surface};
+    border: 2px solid ${border};
     border-radius: 5px;
     padding: 5px;
 }
 
 QMenu::item {
     padding: 8px 25px;
-    color: #C8AA6E;
+    color: ${gold};
     border-radius: 3px;
 }
 
 QMenu::item:selected {
-    background-color: rgba(200, 170, 110, 0.1);
-    border: 1px solid #C8AA6E;
+    background-color: ${item_hover};
+    border: 1px solid ${gold};
 }
 
 QMenu::separator {
     height: 1px;
-    background-color: #463714;
+    background-color: ${border};
     margin: 5px 0;
 }
 
 /* Tooltips */
 QToolTip {
-    background-color: #1E2328;
-    color: #C8AA6E;
-    border: 1px solid #463714;
+    background-color: ${surface};
+    color: ${gold};
+    border: 1px solid ${border};
     border-radius: 3px;
     padding: 5px;
 }
 
 /* Game Button */
 #GameButton {
-    color: #C8AA6E;
-    background-color: #1E2328;
-    border: 2px solid #463714;
+    color: ${gold};
+    background-color: ${surface};
+    border: 2px solid ${border};
     border-radius: 3px;
     padding: 8px 20px 8px 40px;  /* Extra left padding for icon */
     font-size: 14px;
@@ -223,25 +394,27 @@ QToolTip {
 }
 
 #GameButton:hover {
-    background-color: #2F3B46;
-    border-color: #785A28;
-    color: #F0E6D2;
+    background-color: ${surface_raised};
+    border-color: ${border_strong};
+    color: ${text_bright};
 }
 
 #GameButton:checked {
-    background-color: #005A82;
-    border-color: #0AC8B9;
-    color: #0AC8B9;
+    background-color: ${accent_fill};
+    border-color: ${accent};
+    color: ${accent};
 }
 
 /* Time Display */
 #TimeDisplay {
-    color: #C8AA6E;
+    color: ${gold};
     font-size: 18px;
     font-weight: bold;
     padding: 5px;
-    background-color: rgba(30, 35, 40, 0.9);
-    border: 1px solid #463714;
+    background-color: ${display};
+    border: 1px solid ${border};
     border-radius: 3px;
 }
-""" 
\ No newline at end of file
+""")
+
+GAME_STYLE = STYLE_TEMPLATE.substitute(THEMES["game"])
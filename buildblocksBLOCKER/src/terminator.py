@@ -0,0 +1,171 @@
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from events import ProcessInfo
+from logs import get_logger
+from rules import Rule
+
+log = get_logger(__name__)
+
+# Seconds a process gets to quit gracefully before it is force-terminated
+GRACE_PERIOD = 3.0
+# Seconds to wait after a forced termination before giving up on the attempt
+FORCE_TIMEOUT = 2.0
+# How often in-flight kills are checked for exit
+CHECK_INTERVAL = 0.1
+
+_STOP = object()
+
+
+class KillAttempt:
+    """One enforcement against one process, from detection to exit
+
+    requested is when the block decision was made; detected is when the
+    launch was first seen (the same as requested when unknown).
+    """
+    __slots__ = ("process", "rule", "detected", "requested", "signaled", "forced_at",
+                 "finished", "success")
+
+    def __init__(self, process: ProcessInfo, requested: float,
+                 detected: Optional[float] = None, rule: Optional[Rule] = None):
+        self.process = process
+        self.rule = rule
+        self.detected = requested if detected is None else detected
+        self.requested = requested
+        self.signaled: Optional[float] = None
+        self.forced_at: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.success: Optional[bool] = None
+
+    @property
+    def forced(self) -> bool:
+        return self.forced_at is not None
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Seconds from request to confirmed exit (or giving up)"""
+        if self.finished is None:
+            return None
+        return self.finished - self.requested
+
+
+class Terminator:
+    """Terminates blocked processes on its own thread
+
+    Each pid has at most one attempt in flight, so repeated detections of the
+    same process do not pile up signals. A graceful quit is escalated to a
+    forced termination once the grace period runs out.
+    """
+
+    def __init__(self, backend, grace_period: float = GRACE_PERIOD,
+                 force_timeout: float = FORCE_TIMEOUT,
+                 check_interval: float = CHECK_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic,
+                 on_finished: Optional[Callable[[KillAttempt], None]] = None):
+        self.backend = backend
+        self.grace_period = grace_period
+        self.force_timeout = force_timeout
+        self.check_interval = check_interval
+        self.clock = clock
+        # Called on the terminator thread with every finished attempt
+        self.on_finished = on_finished
+        # Finished attempts, oldest first
+        self.attempts = deque(maxlen=1000)
+        self._in_flight: Dict[int, KillAttempt] = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def submit(self, process: ProcessInfo, detected: Optional[float] = None,
+               rule: Optional[Rule] = None) -> bool:
+        """Queue a process for termination; False if one is already in flight"""
+        with self._lock:
+            if process.pid in self._in_flight:
+                return False
+            attempt = KillAttempt(process, self.clock(), detected, rule)
+            self._in_flight[process.pid] = attempt
+        self._queue.put(attempt)
+        return True
+
+    def exited(self, pid: int):
+        """Tell the terminator a process is gone (e.g. from an exit event)"""
+        if pid in self._in_flight:
+            self._queue.put(pid)
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def _finish(self, attempt: KillAttempt, success: bool):
+        attempt.finished = self.clock()
+        attempt.success = success
+        with self._lock:
+            self._in_flight.pop(attempt.process.pid, None)
+        self.attempts.append(attempt)
+        if self.on_finished:
+            try:
+                self.on_finished(attempt)
+            except Exception as e:
+                log.exception("Kill attempt listener error: %s", e)
+
+    def _signal(self, attempt: KillAttempt, force: bool) -> bool:
+        try:
+            return self.backend.terminate(attempt.process, force=force)
+        except Exception as e:
+            log.error("Failed to terminate %s: %s", attempt.process, e)
+            return False
+
+    def _run(self):
+        # (deadline, attempt) for every attempt awaiting exit
+        pending = []
+
+        while True:
+            timeout = self.check_interval if pending else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                break
+            if isinstance(item, KillAttempt):
+                if self._signal(item, force=False):
+                    item.signaled = self.clock()
+                    pending.append((item.signaled + self.grace_period, item))
+                else:
+                    self._finish(item, not self.backend.is_running(item.process))
+
+            # Walk pending attempts: finish the exited, escalate the overdue
+            now = self.clock()
+            still_pending = []
+            for deadline, attempt in pending:
+                if attempt.finished is not None:
+                    continue
+                if not self.backend.is_running(attempt.process):
+                    self._finish(attempt, True)
+                elif now < deadline:
+                    still_pending.append((deadline, attempt))
+                elif not attempt.forced:
+                    attempt.forced_at = now
+                    self._signal(attempt, force=True)
+                    still_pending.append((now + self.force_timeout, attempt))
+                else:
+                    self._finish(attempt, False)
+            pending = still_pending
+
+        # Attempts abandoned by stop() may be resubmitted after a restart
+        with self._lock:
+            self._in_flight.clear()
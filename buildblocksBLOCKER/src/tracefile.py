@@ -0,0 +1,149 @@
+from typing import Dict, Iterator, List, Optional
+
+from events import ACTIVATED, LAUNCHED, TERMINATED, ProcessEvent, ProcessInfo
+
+# File layout: MAGIC, a version byte, then records until EOF. Every record
+# starts with a tag byte; all integers are unsigned LEB128 varints.
+#
+#   _STRING  length, utf-8 bytes      defines the next string id (from 1)
+#   event    dt, pid, start, path, bundle_id, name, executable, team_id
+#
+# dt is microseconds since the previous event, start is the process start
+# time in microseconds plus one, and strings are ids; 0 means None for both.
+MAGIC = b"BBTRACE"
+VERSION = 1
+
+_STRING = 0
+_KIND_TAGS = {LAUNCHED: 1, ACTIVATED: 2, TERMINATED: 3}
+_TAG_KINDS = {tag: kind for kind, tag in _KIND_TAGS.items()}
+
+
+class TraceError(Exception):
+    pass
+
+
+def _varint(value: int, out: bytearray):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class TraceWriter:
+    """Appends process events to a compact binary trace
+
+    Strings are interned, so a trace costs roughly a dozen bytes per event.
+    Not thread-safe; the engine writes from its dispatcher thread only.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "wb")
+        self._file.write(MAGIC + bytes([VERSION]))
+        self._strings: Dict[str, int] = {}
+        self._last: Optional[float] = None
+        self.events = 0
+
+    def _string(self, value: Optional[str], out: bytearray) -> int:
+        if value is None:
+            return 0
+        string_id = self._strings.get(value)
+        if string_id is None:
+            encoded = value.encode()
+            out.append(_STRING)
+            _varint(len(encoded), out)
+            out += encoded
+            string_id = self._strings[value] = len(self._strings) + 1
+        return string_id
+
+    def write(self, event: ProcessEvent):
+        process = event.process
+        out = bytearray()
+        ids = [self._string(value, out) for value in (
+            process.path, process.bundle_id, process.name, process.executable, process.team_id)]
+
+        if self._last is None:
+            self._last = event.timestamp
+        # Events from different sources may be slightly out of order
+        delta = max(0, round((event.timestamp - self._last) * 1e6))
+        self._last += delta / 1e6
+
+        out.append(_KIND_TAGS[event.kind])
+        _varint(delta, out)
+        _varint(process.pid, out)
+        start = process.start_time
+        _varint(0 if start is None else round(start * 1e6) + 1, out)
+        for string_id in ids:
+            _varint(string_id, out)
+        self._file.write(out)
+        self.events += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_trace(path: str, start: float = 0.0) -> Iterator[ProcessEvent]:
+    """Yield the events of a trace, with the first one at time start"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC) or len(data) <= len(MAGIC):
+        raise TraceError(f"{path} is not a process trace")
+    if data[len(MAGIC)] != VERSION:
+        raise TraceError(f"Unsupported trace version {data[len(MAGIC)]}")
+
+    strings: List[Optional[str]] = [None]
+    pos = len(MAGIC) + 1
+    end = len(data)
+    micros = 0
+
+    def varint():
+        nonlocal pos
+        value = shift = 0
+        while True:
+            if pos >= end:
+                raise TraceError("Truncated trace")
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def string():
+        index = varint()
+        if index >= len(strings):
+            raise TraceError(f"Undefined string {index} at offset {pos}")
+        return strings[index]
+
+    while pos < end:
+        tag = data[pos]
+        pos += 1
+        if tag == _STRING:
+            length = varint()
+            if pos + length > end:
+                raise TraceError("Truncated trace")
+            try:
+                strings.append(data[pos:pos + length].decode())
+            except UnicodeDecodeError as e:
+                raise TraceError(f"Bad string at offset {pos}: {e}") from None
+            pos += length
+            continue
+        kind = _TAG_KINDS.get(tag)
+        if kind is None:
+            raise TraceError(f"Unknown record tag {tag} at offset {pos - 1}")
+        micros += varint()
+        pid = varint()
+        start_time = varint()
+        path, bundle_id, name, executable, team_id = (string() for _ in range(5))
+        process = ProcessInfo(pid, path, bundle_id, name,
+                              None if start_time == 0 else (start_time - 1) / 1e6,
+                              executable, team_id)
+        yield ProcessEvent(kind, process, start + micros / 1e6)
+
@@ -19,13 +19,8 @@ class TutorialPopup(QDialog):
         
         # Main container with background
         container = QWidget()
-        container.setStyleSheet("""
-            QWidget {
-                background: #1E2328;
-                border: 2px solid #785A28;
-                border-radius: 8px;
-            }
-        """)
+        container.setObjectName("TutorialContainer")
+        container.setAttribute(Qt.WidgetAttribute.WA_StyledBackground)
         container_layout = QVBoxLayout(container)
         
         # Scroll area for message
@@ -33,24 +28,7 @@ class TutorialPopup(QDialog):
         scroll_area.setWidgetResizable(True)
         scroll_area.setFrameShape(QFrame.Shape.NoFrame)
         scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        scroll_area.setStyleSheet("""
-            QScrollArea {
-                background: transparent;
-            }
-            QScrollBar:vertical {
-                background: #1E2328;
-                width: 12px;
-                margin: 0px;
-            }
-            QScrollBar::handle:vertical {
-                background: #785A28;
-                border-radius: 6px;
-                min-height: 20px;
-            }
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
-                height: 0px;
-            }
-        """)
+        scroll_area.setObjectName("TutorialScroll")
         
         # Message container
         message_container = QWidget()
@@ -58,14 +36,7 @@ class TutorialPopup(QDialog):
         
         # Message
         message = QLabel(text)
-        message.setStyleSheet("""
-            QLabel {
-                color: #C8AA6E;
-                font-size: 14px;
-                padding: 20px;
-                background: transparent;
-            }
-        """)
+        message.setObjectName("TutorialMessage")
         message.setWordWrap(True)
         message_layout.addWidget(message)
         
@@ -78,7 +49,7 @@ class TutorialPopup(QDialog):
         # Skip button (left-aligned)
         self.skip_button = QPushButton("Skip Tutorial")
         self.skip_button.clicked.connect(self.reject)
-        self.skip_button.setStyleSheet(self._get_button_style("skip"))
+        self.skip_button.setObjectName("TutorialSkip")
         buttons_layout.addWidget(self.skip_button)
         
         buttons_layout.addStretch()
@@ -86,7 +57,7 @@ class TutorialPopup(QDialog):
         # Next button (right-aligned)
         self.next_button = QPushButton("Next")
         self.next_button.clicked.connect(self.accept)
-        self.next_button.setStyleSheet(self._get_button_style("next"))
+        self.next_button.setObjectName("TutorialNext")
         buttons_layout.addWidget(self.next_button)
         
         container_layout.addLayout(buttons_layout)
@@ -101,35 +72,6 @@ class TutorialPopup(QDialog):
         if is_final:
             self.next_button.setText("Get Started!")
             self.skip_button.hide()
-    
-    def _get_button_style(self, button_type: str) -> str:
-        """Get button style based on type"""
-        if button_type == "next":
-            return """
-                QPushButton {
-                    background: #005A82;
-                    color: #0AC8B9;
-                    border: 1px solid #0AC8B9;
-                    padding: 8px 20px;
-                    border-radius: 4px;
-                    font-weight: bold;
-                }
-                QPushButton:hover {
-                    background: #006B93;
-                }
-            """
-        else:  # skip button
-            return """
-                QPushButton {
-                    background: transparent;
-                    color: #785A28;
-                    border: none;
-                    padding: 8px 20px;
-                }
-                QPushButton:hover {
-                    color: #C8AA6E;
-                }
-            """
 
 class Tutorial:
     def __init__(self, parent: QWidget):
@@ -0,0 +1,335 @@
+import copy
+import hashlib
+import hmac
+import json
+import mmap
+import os
+import zlib
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from logs import get_logger
+from settings_snapshot import Snapshot, SnapshotError, encode_snapshot
+from store import atomic_write
+
+log = get_logger(__name__)
+
+# Top-level settings that make up the blocking policy. With a vault they are
+# kept out of settings.json: encrypted in the vault, plus a policy cache the
+# engine can enforce from before the user unlocks.
+VAULT_SECTIONS = ("blocked_apps", "downtime_enabled", "last_state")
+
+VAULT_VERSION = 1
+# Target entries per encrypted chunk of a dict section
+CHUNK_ENTRIES = 256
+
+_MAC_SIZE = hashlib.sha256().digest_size
+
+
+class VaultError(Exception):
+    pass
+
+
+def _chunk_count(entries: int) -> int:
+    """Power of two giving about CHUNK_ENTRIES entries per chunk"""
+    count = 1
+    while count * CHUNK_ENTRIES < entries:
+        count *= 2
+    return count
+
+
+def _chunk_of(key: str, count: int) -> int:
+    return zlib.crc32(key.encode()) & (count - 1)
+
+
+class Vault:
+    """Policy sections encrypted with a data key, chunk by chunk
+
+    The data key is random and stored wrapped (encrypted) by the caller,
+    e.g. with the password session's Fernet, so changing the password only
+    re-wraps it. Dict sections are split into hash buckets of about
+    CHUNK_ENTRIES entries, each its own Fernet token, and write() only
+    re-encrypts the buckets marked dirty; other sections are one token.
+
+    settings.vault is JSON: version, generation and, per section, the list
+    of chunk tokens. Fernet tokens are authenticated, so a modified vault
+    fails to unlock rather than decrypting to something else.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.generation = 0
+        self.data_key: Optional[bytes] = None
+        self._fernet: Optional[Fernet] = None
+        # Encrypted chunks as last read or written, per section
+        self._tokens: Dict[str, List[str]] = {}
+        # Keys in each chunk of a dict section (may include deleted ones)
+        self._members: Dict[str, List[Set[str]]] = {}
+        # Sections to re-encrypt completely, and single dirty buckets
+        self._dirty_sections: Set[str] = set()
+        self._dirty_chunks: Set[Tuple[str, int]] = set()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def stored_generation(self) -> Optional[int]:
+        """Generation recorded in the vault file (readable while locked), or None"""
+        try:
+            with open(self.path, "rb") as f:
+                generation = json.loads(f.read()).get("generation", 0)
+        except (OSError, ValueError, AttributeError):
+            return None
+        return generation if isinstance(generation, int) else None
+
+    @property
+    def unlocked(self) -> bool:
+        return self._fernet is not None
+
+    @staticmethod
+    def new_key() -> bytes:
+        return Fernet.generate_key()
+
+    def create(self, data_key: bytes):
+        """Start an empty vault with data_key; every section is dirty"""
+        self.data_key = data_key
+        self._fernet = Fernet(data_key)
+        self.generation = 0
+        self._tokens = {}
+        self._members = {}
+        self._dirty_sections = set(VAULT_SECTIONS)
+        self._dirty_chunks.clear()
+
+    def unlock(self, data_key: bytes) -> Dict[str, Any]:
+        """Decrypt the whole vault into memory; returns its sections"""
+        try:
+            with open(self.path, "rb") as f:
+                document = json.loads(f.read())
+            if document.get("version") != VAULT_VERSION:
+                raise VaultError(f"Unsupported vault version {document.get('version')}")
+            fernet = Fernet(data_key)
+            sections = {}
+            members = {}
+            for name, tokens in document["sections"].items():
+                chunks = [json.loads(fernet.decrypt(token.encode())) for token in tokens]
+                if len(chunks) == 1 and "value" in chunks[0]:
+                    sections[name] = chunks[0]["value"]
+                else:
+                    merged = {}
+                    for chunk in chunks:
+                        merged.update(chunk["entries"])
+                    sections[name] = merged
+                    members[name] = [set(chunk["entries"]) for chunk in chunks]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            raise VaultError(f"Vault is unreadable: {e}")
+        except InvalidToken:
+            raise VaultError("Vault key does not match or the vault was modified")
+        self.data_key = data_key
+        self._fernet = fernet
+        self.generation = document.get("generation", 0)
+        self._tokens = document["sections"]
+        self._members = members
+        self._dirty_sections.clear()
+        self._dirty_chunks.clear()
+        return sections
+
+    def lock(self):
+        """Forget the data key; write() is refused until the next unlock"""
+        self.data_key = None
+        self._fernet = None
+
+    def mark_dirty(self, path: List[str], section_value: Any = None):
+        """Note that the setting at path changed (path[0] is the section)"""
+        name = path[0]
+        members = self._members.get(name)
+        if (len(path) > 1 and isinstance(section_value, Mapping) and members
+                and len(members) == _chunk_count(len(section_value))):
+            index = _chunk_of(path[1], len(members))
+            members[index].add(path[1])
+            self._dirty_chunks.add((name, index))
+        else:
+            self._dirty_sections.add(name)
+
+    def mark_all_dirty(self):
+        self._dirty_sections = set(VAULT_SECTIONS)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty_sections or self._dirty_chunks)
+
+    def take_dirty(self, sections: Dict[str, Any]) -> Dict[str, Dict[int, bytes]]:
+        """Plaintext of every dirty chunk, as {section: {index: json}}
+
+        Call with the settings lock held; the slow encryption happens later
+        in write(), outside it. Clears the dirty marks.
+        """
+        plain: Dict[str, Dict[int, bytes]] = {}
+        whole = self._dirty_sections
+        by_section: Dict[str, Set[int]] = {}
+        for name, index in self._dirty_chunks:
+            if name not in whole:
+                by_section.setdefault(name, set()).add(index)
+        for name in VAULT_SECTIONS:
+            if name not in whole and name not in by_section:
+                continue
+            value = sections.get(name)
+            if not isinstance(value, Mapping):
+                plain[name] = {0: json.dumps({"value": value}).encode()}
+                self._tokens[name] = [""]
+                self._members.pop(name, None)
+                continue
+            if name in whole:
+                # Bucket count may have changed; re-split everything
+                count = _chunk_count(len(value))
+                chunks: Dict[int, Dict] = {i: {} for i in range(count)}
+                for key, item in value.items():
+                    chunks[_chunk_of(key, count)][key] = item
+                self._tokens[name] = [""] * count
+                self._members[name] = [set(chunk) for chunk in chunks.values()]
+            else:
+                members = self._members[name]
+                chunks = {}
+                for index in by_section[name]:
+                    members[index] = {key for key in members[index] if key in value}
+                    chunks[index] = {key: value[key] for key in members[index]}
+            plain[name] = {i: json.dumps({"entries": chunk}).encode()
+                           for i, chunk in chunks.items()}
+        self._dirty_sections = set()
+        self._dirty_chunks = set()
+        return plain
+
+    def write(self, plain: Dict[str, Dict[int, bytes]], generation: int):
+        """Encrypt the chunks from take_dirty() and atomically rewrite the vault"""
+        if self._fernet is None:
+            raise VaultError("Vault is locked")
+        for name, chunks in plain.items():
+            tokens = self._tokens.setdefault(name, [""] * len(chunks))
+            for index, data in chunks.items():
+                tokens[index] = self._fernet.encrypt(data).decode()
+        self.generation = generation
+        document = {"version": VAULT_VERSION, "generation": generation, "sections": self._tokens}
+        atomic_write(self.path, json.dumps(document, separators=(",", ":")).encode())
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.lock()
+        self._tokens = {}
+        self._members = {}
+        self.generation = 0
+
+
+class PolicyCache:
+    """Plaintext copy of the vault sections the engine can use before unlock
+
+    Stored in the settings_snapshot format (so large blocklists load lazily)
+    followed by an HMAC-SHA256 under a per-install key in policy.key. The
+    key must be a regular file only its owner can access; any other key is
+    not trusted and a new one is made for the next write.
+
+    The check catches corruption and edits by anything without the key.
+    It cannot stop a process running as the same user, which can read the
+    key: a cache forged that way is enforced only until the next unlock,
+    when the vault's policy is restored and cached again.
+    """
+
+    def __init__(self, path: str, key_path: str):
+        self.path = path
+        self.key_path = key_path
+        self._mac_key: Optional[bytes] = None
+
+    def _key(self) -> bytes:
+        if self._mac_key is None:
+            self._mac_key = self._read_key() or self._create_key()
+        return self._mac_key
+
+    def _read_key(self) -> Optional[bytes]:
+        """The MAC key, or None if it is missing, malformed or not private"""
+        try:
+            fd = os.open(self.key_path, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            log.warning("Policy key %s is unusable: %s", self.key_path, e)
+            return None
+        with os.fdopen(fd, "rb") as f:
+            info = os.fstat(f.fileno())
+            if info.st_uid != os.getuid() or info.st_mode & 0o077:
+                log.warning("Policy key %s is accessible to other users; not trusting it", self.key_path)
+                return None
+            key = f.read()
+        return key if len(key) == 32 else None
+
+    def _create_key(self) -> bytes:
+        key = os.urandom(32)
+        fd = os.open(f"{self.key_path}.tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        # A leftover temporary file keeps its old mode otherwise
+        os.fchmod(fd, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(key)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{self.key_path}.tmp", self.key_path)
+        return key
+
+    def load(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """(generation, sections), or None if missing or failing the check"""
+        if not os.path.exists(self.path):
+            return None
+        key = self._mac_key or self._read_key()
+        if key is None:
+            return None
+        self._mac_key = key
+        try:
+            with open(self.path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(buffer)
+            body, mac = view[:-_MAC_SIZE], view[-_MAC_SIZE:]
+            expected = hmac.new(key, body, hashlib.sha256).digest()
+            if not body or not hmac.compare_digest(expected, bytes(mac)):
+                log.warning("Policy cache failed its integrity check; ignoring it")
+                return None
+            document = Snapshot(body).document()
+        except (OSError, ValueError, SnapshotError) as e:
+            log.warning("Policy cache is unreadable: %s", e)
+            return None
+        generation = document.pop("generation", 0)
+        return generation, document
+
+    @staticmethod
+    def capture(sections: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of the policy for encode(); cheap enough to take under a lock"""
+        policy = {}
+        for name in VAULT_SECTIONS:
+            if name in sections:
+                value = sections[name]
+                if isinstance(value, dict):
+                    value = dict(value)
+                elif not isinstance(value, Mapping):
+                    # Snapshot maps are read-only already
+                    value = copy.deepcopy(value)
+                policy[name] = value
+        return policy
+
+    def encode(self, generation: int, policy: Dict[str, Any]) -> bytes:
+        """Cache file contents for a policy from capture()"""
+        return encode_snapshot(dict(policy, generation=generation))
+
+    def write(self, data: bytes):
+        mac = hmac.new(self._key(), data, hashlib.sha256).digest()
+        atomic_write(self.path, data + mac)
+
+    def remove(self):
+        for path in (self.path, self.key_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._mac_key = None
+
+
+def split_sections(document: Dict) -> Tuple[Dict, Dict]:
+    """(everything else, vault sections) of a settings document"""
+    plain = {key: value for key, value in document.items() if key not in VAULT_SECTIONS}
+    sections = {key: document[key] for key in VAULT_SECTIONS if key in document}
+    return plain, sections
+
@@ -0,0 +1,206 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+from typing import Callable, Optional
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+# Seconds of quiet after the last file-system event before the callback runs
+SETTLE_DELAY = 0.2
+# Seconds between stat() calls for the polling fallback
+POLL_INTERVAL = 2.0
+
+# inotify(7)
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def file_signature(path: str):
+    """(inode, size, mtime) of path, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class FileWatcher:
+    """Calls callback on a background thread after a file changes
+
+    Watches the file's directory, so replacing the file by rename (as
+    editors, installers and our own atomic writes do) is seen as well as
+    in-place writes. Uses inotify on Linux and kqueue on macOS, falling back
+    to polling stat(). Bursts of events are collapsed into one callback.
+    """
+
+    def __init__(self, path: str, callback: Callable[[], None]):
+        self.path = path
+        self.directory = os.path.dirname(path) or "."
+        self.name = os.path.basename(path)
+        self.callback = callback
+        self.mode = None
+        self._stop_r = self._stop_w = None
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_r, self._stop_w = os.pipe()
+        watch = self._inotify_fd() if sys.platform.startswith("linux") else None
+        if watch is not None:
+            self.mode, target = "inotify", lambda: self._run_inotify(watch)
+        elif hasattr(select, "kqueue"):
+            self.mode, target = "kqueue", self._run_kqueue
+        else:
+            self.mode, target = "poll", self._run_poll
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread and self._thread.is_alive():
+            os.write(self._stop_w, b"x")
+            self._thread.join()
+        for fd in (self._stop_r, self._stop_w):
+            if fd is not None:
+                os.close(fd)
+        self._stop_r = self._stop_w = None
+
+    def _fire(self):
+        try:
+            self.callback()
+        except Exception as e:
+            log.exception("File watch callback error: %s", e)
+
+    def _settle(self, wait_for_event: Callable[[float], bool]):
+        """Wait until no event has arrived for SETTLE_DELAY; False on stop"""
+        while wait_for_event(SETTLE_DELAY):
+            pass
+        return not self._stopping()
+
+    def _stopping(self) -> bool:
+        readable, _, _ = select.select([self._stop_r], [], [], 0)
+        return bool(readable)
+
+    # inotify
+
+    def _inotify_fd(self) -> Optional[int]:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                return None
+            mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            if libc.inotify_add_watch(fd, os.fsencode(self.directory), mask) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except (OSError, AttributeError):
+            return None
+
+    def _inotify_matches(self, fd: int) -> bool:
+        """Drain pending events; True if any concerned our file"""
+        matched = False
+        while True:
+            try:
+                data = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                return matched
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+                offset += _INOTIFY_EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                matched = matched or os.fsdecode(name) == self.name
+
+    def _run_inotify(self, fd: int):
+        def wait_for_event(timeout):
+            readable, _, _ = select.select([fd, self._stop_r], [], [], timeout)
+            if self._stop_r in readable:
+                return False
+            return bool(readable) and self._inotify_matches(fd)
+
+        try:
+            while True:
+                readable, _, _ = select.select([fd, self._stop_r], [], [])
+                if self._stop_r in readable:
+                    return
+                if self._inotify_matches(fd) and self._settle(wait_for_event):
+                    self._fire()
+        finally:
+            os.close(fd)
+
+    # kqueue
+
+    def _run_kqueue(self):
+        kq = select.kqueue()
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        file_fd = None
+        vnode = (select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND | select.KQ_NOTE_DELETE
+                 | select.KQ_NOTE_RENAME | select.KQ_NOTE_ATTRIB)
+
+        def watch(fd):
+            return select.kevent(fd, select.KQ_FILTER_VNODE, select.KQ_EV_ADD | select.KQ_EV_CLEAR, vnode)
+
+        def reopen_file():
+            # The file may have been replaced; watch whatever is there now
+            nonlocal file_fd
+            if file_fd is not None:
+                os.close(file_fd)
+                file_fd = None
+            try:
+                file_fd = os.open(self.path, os.O_RDONLY)
+            except OSError:
+                return []
+            return [watch(file_fd)]
+
+        stop = select.kevent(self._stop_r, select.KQ_FILTER_READ, select.KQ_EV_ADD)
+        kq.control([stop, watch(dir_fd)] + reopen_file(), 0)
+
+        def wait_for_event(timeout):
+            events = kq.control(None, 8, timeout)
+            if any(event.ident == self._stop_r for event in events):
+                return False
+            if events:
+                kq.control(reopen_file(), 0)
+            return bool(events)
+
+        try:
+            while True:
+                events = kq.control(None, 8, None)
+                if any(event.ident == self._stop_r for event in events):
+                    return
+                kq.control(reopen_file(), 0)
+                if self._settle(wait_for_event):
+                    self._fire()
+        finally:
+            if file_fd is not None:
+                os.close(file_fd)
+            os.close(dir_fd)
+            kq.close()
+
+    # polling
+
+    def _run_poll(self):
+        last = file_signature(self.path)
+        while True:
+            readable, _, _ = select.select([self._stop_r], [], [], POLL_INTERVAL)
+            if readable:
+                return
+            current = file_signature(self.path)
+            if current != last:
+                last = current
+                self._fire()
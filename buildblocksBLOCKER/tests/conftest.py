@@ -0,0 +1,20 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+def _wait_for(predicate, timeout=5.0):
+    """Poll predicate until it is true or timeout seconds pass; returns its last value"""
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return predicate()
+
+
+@pytest.fixture
+def wait_for():
+    return _wait_for
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from audit import (ANCHOR_NAME, APP_ADDED, AUDIT_STARTED, BATCH_SIZE, AuditLog, list_segments, read_anchor,
+                   read_audit, verify)
+
+MAX_SEGMENTS = 3
+
+
+@pytest.fixture
+def audit_dir(tmp_path):
+    """An audit log rotated past MAX_SEGMENTS, so old segments were deleted"""
+    directory = str(tmp_path / "audit")
+    audit = AuditLog(directory, segment_bytes=1, max_segments=MAX_SEGMENTS)
+    audit.start()
+    # Full batches are written at once, and each one starts a new segment
+    for i in range(BATCH_SIZE * 6):
+        audit.record(APP_ADDED, name=f"App{i}", path=f"/opt/app{i}")
+    audit.close()
+    return directory
+
+
+def flip_byte(path, offset):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        value = f.read(1)[0]
+        f.seek(offset)
+        f.write(bytes([value ^ 0xFF]))
+
+
+def test_rotated_log_verifies(audit_dir):
+    segments = list_segments(audit_dir)
+    assert len(segments) == MAX_SEGMENTS
+    anchor = read_anchor(audit_dir)
+    assert anchor is not None and anchor[0] == segments[0][0] - 1
+
+    report = verify(audit_dir)
+    assert report.ok, str(report)
+    assert report.unsealed_bytes == 0
+    events = list(read_audit(audit_dir))
+    assert len(events) == report.events
+    assert all(event.sealed for event in events)
+    # The newest events survive rotation, in order
+    last = BATCH_SIZE * 6 - 1
+    assert [event.fields["name"] for event in events[-2:]] == [f"App{last - 1}", f"App{last}"]
+
+
+def test_new_run_continues_the_chain(audit_dir):
+    audit = AuditLog(audit_dir, segment_bytes=1, max_segments=MAX_SEGMENTS)
+    audit.start()
+    audit.close()
+    assert verify(audit_dir).ok
+    assert list(read_audit(audit_dir))[-1].kind == AUDIT_STARTED
+
+
+def test_changed_byte_is_detected(audit_dir):
+    _, path = list_segments(audit_dir)[1]
+    flip_byte(path, os.path.getsize(path) // 2)
+    report = verify(audit_dir)
+    assert not report.ok
+    assert os.path.basename(path) in str(report)
+
+
+def test_deleted_oldest_segment_is_detected(audit_dir):
+    os.remove(list_segments(audit_dir)[0][1])
+    report = verify(audit_dir)
+    assert not report.ok
+    assert "missing from the start" in str(report)
+
+
+def test_deleted_anchor_is_detected(audit_dir):
+    os.remove(os.path.join(audit_dir, ANCHOR_NAME))
+    assert not verify(audit_dir).ok
+
+
+def test_replaced_segment_is_detected(audit_dir):
+    # A segment taken from another log does not continue this chain
+    other = AuditLog(os.path.join(audit_dir, "other"), segment_bytes=1, max_segments=MAX_SEGMENTS)
+    other.start()
+    other.close()
+    (_, first), (_, middle) = list_segments(audit_dir)[:2]
+    os.replace(list_segments(other.directory)[0][1], first)
+    report = verify(audit_dir)
+    assert not report.ok
+    assert os.path.basename(first) in str(report) and os.path.basename(middle) in str(report)
+
+
+def test_unsealed_tail_is_not_an_error(audit_dir):
+    _, path = list_segments(audit_dir)[-1]
+    with open(path, "ab") as f:
+        f.write(b"\1\2\3")
+    report = verify(audit_dir)
+    assert report.ok
+    assert report.unsealed_bytes == 3
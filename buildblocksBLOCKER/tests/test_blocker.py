@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from backends import FakeBackend
+from blocker import BlockingManager
+
+BENCHMARKS = os.path.join(os.path.dirname(__file__), "..", "benchmarks")
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+@pytest.fixture
+def manager(backend):
+    manager = BlockingManager(backend)
+    yield manager
+    manager.toggle_blocking(False)
+
+
+def test_blocked_launches_are_terminated(backend, manager, wait_for):
+    manager.add_apps(f"/opt/blocked/app{i}" for i in range(10))
+    manager.toggle_blocking(True)
+    for pid in range(1, 201):
+        path = f"/opt/blocked/app{pid % 10}" if pid % 2 else f"/usr/bin/tool{pid}"
+        backend.spawn(pid, path)
+    assert wait_for(lambda: not any(p.path.startswith("/opt/blocked/") for p in backend.processes.values()))
+    terminated = {pid for pid, _ in backend.terminated}
+    assert terminated == set(range(1, 201, 2))
+    assert len(backend.processes) == 100
+
+
+def test_sweep_catches_processes_running_before_start(backend, manager, wait_for):
+    # Announced before blocking starts, so only the sweep can find it
+    backend.spawn(7, "/opt/blocked/app")
+    manager.add_app("/opt/blocked/app")
+    manager.toggle_blocking(True)
+    assert wait_for(lambda: 7 not in backend.processes)
+
+
+def test_removed_app_is_no_longer_blocked(backend, manager, wait_for):
+    manager.add_app("/opt/blocked/app")
+    manager.toggle_blocking(True)
+    backend.spawn(1, "/opt/blocked/app")
+    assert wait_for(lambda: 1 not in backend.processes)
+    manager.remove_app("/opt/blocked/app")
+    backend.spawn(2, "/opt/blocked/app")
+    # A later launch being handled means the one before it was too
+    manager.add_app("/opt/other/app")
+    backend.spawn(3, "/opt/other/app")
+    assert wait_for(lambda: 3 not in backend.processes)
+    assert 2 in backend.processes
+
+
+def test_rule_churn_never_lets_a_blocked_app_survive():
+    result = subprocess.run([sys.executable, os.path.join(BENCHMARKS, "stress_rules.py"), "1"],
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+
+from events import LAUNCHED, TERMINATED, EventDispatcher, FakeEventSource, ProcessEvent, ProcessInfo
+
+# Generous enough for a loaded CI machine; the dispatcher itself takes microseconds
+MAX_P99_LATENCY = 0.05
+
+
+@pytest.fixture
+def source():
+    return FakeEventSource()
+
+
+def start(dispatcher):
+    dispatcher.start()
+    return dispatcher
+
+
+def test_events_are_handled_in_order_on_one_thread(source, wait_for):
+    seen = []
+    threads = set()
+
+    def handler(event):
+        seen.append((event.kind, event.process.pid))
+        threads.add(threading.get_ident())
+
+    dispatcher = start(EventDispatcher(source, handler, reconcile_interval=3600))
+    try:
+        for pid in range(1, 101):
+            source.launch(pid, f"/Applications/App{pid}.app")
+            source.exit(pid)
+        assert wait_for(lambda: len(seen) == 200)
+    finally:
+        dispatcher.stop()
+    assert seen == [(kind, pid) for pid in range(1, 101) for kind in (LAUNCHED, TERMINATED)]
+    assert threads == {dispatcher._thread.ident}
+
+
+def test_launch_to_decision_latency(source, wait_for):
+    launches = 2000
+    blocked = {f"/Applications/Blocked{i}.app" for i in range(500)}
+    decisions = []
+    dispatcher = start(EventDispatcher(
+        source, lambda event: decisions.append(event.process.path in blocked), reconcile_interval=3600))
+    try:
+        for pid in range(launches):
+            source.launch(pid, f"/Applications/Blocked{pid % 1000}.app")
+        assert wait_for(lambda: len(dispatcher.latencies) == launches)
+    finally:
+        dispatcher.stop()
+    assert sum(decisions) == launches // 2
+    latencies = sorted(dispatcher.latencies)
+    assert latencies[int(len(latencies) * 0.99)] < MAX_P99_LATENCY
+
+
+def test_latency_is_measured_on_the_dispatcher_clock(source, wait_for):
+    # A virtual clock far from time.monotonic(), moved only by the handler
+    now = [1e9]
+
+    def handler(event):
+        now[0] += 0.25
+
+    dispatcher = start(EventDispatcher(source, handler, reconcile_interval=3600, clock=lambda: now[0]))
+    try:
+        launched = source.launch(1, "/bin/a")
+        source.emit(ProcessEvent(LAUNCHED, ProcessInfo(2, "/bin/b"), 1e9 - 1.0))
+        assert wait_for(lambda: len(dispatcher.latencies) == 2)
+    finally:
+        dispatcher.stop()
+    assert launched.timestamp == 1e9
+    # Stamped on receipt, unless the source knew better
+    assert list(dispatcher.latencies) == [0.25, 1.5]
+
+
+def test_reconcile_runs_at_start_and_on_request(source, wait_for):
+    sweeps = []
+    dispatcher = start(EventDispatcher(source, lambda event: None,
+                                       reconcile=lambda: sweeps.append(1), reconcile_interval=3600))
+    try:
+        assert wait_for(lambda: len(sweeps) == 1)
+        dispatcher.request_sweep()
+        assert wait_for(lambda: len(sweeps) == 2)
+    finally:
+        dispatcher.stop()
+
+
+def test_errors_do_not_stop_the_dispatcher(source, wait_for):
+    handled = []
+
+    def handler(event):
+        if event.process.pid == 1:
+            raise RuntimeError("handler failed")
+        handled.append(event.process.pid)
+
+    def fail():
+        raise RuntimeError("call failed")
+
+    def reconcile():
+        raise RuntimeError("sweep failed")
+
+    dispatcher = start(EventDispatcher(source, handler, reconcile=reconcile, reconcile_interval=3600))
+    try:
+        source.launch(1, "/bin/a")
+        dispatcher.call(fail)
+        dispatcher.request_sweep()
+        source.launch(2, "/bin/b")
+        assert wait_for(lambda: handled == [2])
+        assert dispatcher.is_alive()
+    finally:
+        dispatcher.stop()
+
+
+def test_stop_unsubscribes_from_the_source(source, wait_for):
+    seen = []
+    dispatcher = start(EventDispatcher(source, seen.append, reconcile_interval=3600))
+    dispatcher.stop()
+    assert wait_for(lambda: not dispatcher.is_alive())
+    source.launch(1, "/bin/a")
+    assert seen == []
@@ -0,0 +1,117 @@
+import pytest
+
+from backends import FakeBackend
+from events import ProcessInfo
+from process_table import ProcessTable
+from rules import PATH_PREFIX, Rule, RuleSet
+
+BLOCKED = Rule(PATH_PREFIX, "/opt/blocked")
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+@pytest.fixture
+def identified(backend):
+    """pids passed to identify(), in order"""
+    return []
+
+
+@pytest.fixture
+def table(backend, identified):
+    def identify(pid):
+        identified.append(pid)
+        return backend.identify(pid)
+    return ProcessTable(identify, backend.start_time)
+
+
+class Decider:
+    """Counts decisions actually computed rather than served from the cache"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, process, rules):
+        self.calls += 1
+        return rules.match(process)
+
+
+def test_sync_identifies_only_new_pids(backend, table, identified):
+    for pid in range(1, 6):
+        backend.spawn(pid, f"/usr/bin/tool{pid}", start_time=100.0 + pid)
+    assert sorted(p.pid for p in table.sync(backend.list_pids())) == [1, 2, 3, 4, 5]
+
+    del backend.processes[2]
+    backend.spawn(6, "/usr/bin/tool6", start_time=106.0)
+    assert [p.pid for p in table.sync(backend.list_pids())] == [6]
+    assert sorted(identified) == [1, 2, 3, 4, 5, 6]
+    assert sorted(table.processes) == [1, 3, 4, 5, 6]
+
+
+def test_decisions_are_cached_until_the_rules_change(backend, table):
+    decide = Decider()
+    backend.spawn(1, "/opt/blocked/game", start_time=10.0)
+    backend.spawn(2, "/usr/bin/tool", start_time=11.0)
+    processes = table.sync(backend.list_pids())
+    rules = RuleSet([BLOCKED], version=1)
+    for _ in range(3):
+        assert {p.pid: table.decide(p, rules, decide) for p in processes} == {1: BLOCKED, 2: None}
+    assert decide.calls == 2
+    assert table.blocked == {1}
+
+    unblocked = RuleSet([], version=2)
+    assert table.stale(unblocked)
+    assert all(table.decide(p, unblocked, decide) is None for p in processes)
+    assert decide.calls == 4
+    assert table.blocked == set()
+
+
+def test_reused_pid_is_decided_again(backend, table):
+    decide = Decider()
+    rules = RuleSet([BLOCKED], version=1)
+    backend.spawn(1, "/usr/bin/tool", start_time=10.0)
+    (tool,) = table.sync(backend.list_pids())
+    assert table.decide(tool, rules, decide) is None
+
+    # The pid comes back as another process, announced by an event
+    game = ProcessInfo(1, "/opt/blocked/game", start_time=20.0)
+    table.add(game)
+    assert table.decide(game, rules, decide) == BLOCKED
+    assert table.blocked == {1}
+    # Re-announcing the same process keeps its decision
+    table.add(ProcessInfo(1, "/opt/blocked/game", start_time=20.0))
+    assert table.decide(game, rules, decide) == BLOCKED
+    assert decide.calls == 2
+
+    table.forget(1)
+    assert table.blocked == set() and len(table) == 0
+
+
+def test_unidentified_pids_are_retried_only_when_reused(backend, identified):
+    hidden = {7}
+
+    def identify(pid):
+        identified.append(pid)
+        return None if pid in hidden else backend.identify(pid)
+
+    table = ProcessTable(identify, backend.start_time)
+    backend.spawn(7, "/usr/libexec/private", start_time=10.0)
+    for _ in range(3):
+        assert table.sync(backend.list_pids()) == []
+    assert len(table) == 0
+    assert identified == [7]
+
+    # Same pid, new process: identify() gets another chance
+    hidden.clear()
+    backend.spawn(7, "/opt/blocked/game", start_time=30.0)
+    assert [p.path for p in table.sync(backend.list_pids())] == ["/opt/blocked/game"]
+
+    # A pid that went away is forgotten entirely
+    del backend.processes[7]
+    table.sync(backend.list_pids())
+    hidden.add(7)
+    backend.spawn(7, "/usr/libexec/private", start_time=40.0)
+    assert table.sync(backend.list_pids()) == []
+    assert identified == [7, 7, 7]
@@ -0,0 +1,182 @@
+import random
+
+import pytest
+
+from events import ProcessInfo
+from rules import BUNDLE_ID, EXECUTABLE, GLOB, PATH, PATH_PREFIX, REGEX, TEAM_ID, Rule, RuleSet, RuleSnapshot
+
+
+def process(path, bundle_id=None, executable=None, team_id=None):
+    return ProcessInfo(1, path, bundle_id, executable=executable, team_id=team_id)
+
+
+def test_exact_kinds_take_precedence_over_paths():
+    path = "/Applications/Games/Steam.app"
+    rules = {
+        BUNDLE_ID: Rule(BUNDLE_ID, "com.valvesoftware.steam"),
+        TEAM_ID: Rule(TEAM_ID, "MXGJJ98X76"),
+        EXECUTABLE: Rule(EXECUTABLE, "steam_osx"),
+        PATH: Rule(PATH, path),
+        PATH_PREFIX: Rule(PATH_PREFIX, "/Applications/Games"),
+        GLOB: Rule(GLOB, "/Applications/*/Steam.app"),
+        REGEX: Rule(REGEX, r"/Applications/.*\.app"),
+    }
+    steam = process(path, "com.valvesoftware.steam", "steam_osx", "MXGJJ98X76")
+    # Drop the winning rule each time; the next kind in line takes over
+    order = [BUNDLE_ID, TEAM_ID, EXECUTABLE, PATH, PATH_PREFIX]
+    for i, kind in enumerate(order):
+        remaining = [rule for other, rule in rules.items() if other not in order[:i]]
+        assert RuleSet(remaining).match(steam) == rules[kind]
+    # Among patterns, one indexed by a literal path component is tried first
+    assert RuleSet([rules[GLOB], rules[REGEX]]).match(steam) == rules[GLOB]
+    assert RuleSet([rules[REGEX]]).match(steam) == rules[REGEX]
+    assert RuleSet(rules.values()).match(process("/usr/bin/true")) is None
+
+
+def test_path_rules_match_whole_paths_and_directories():
+    prefix = Rule(PATH_PREFIX, "/opt/games/")
+    outer = Rule(PATH_PREFIX, "/opt")
+    rules = RuleSet([prefix, Rule(PATH, "/usr/bin/chess"), Rule(EXECUTABLE, "minecraft")])
+    assert rules.match(process("/opt/games/doom")) == prefix
+    assert rules.match(process("/opt/games")) == prefix
+    assert rules.match(process("/opt/gamesx/doom")) is None
+    assert rules.match(process("/usr/bin/chess2")) is None
+    # Without an executable name the basename of the path counts
+    assert rules.match(process("/home/me/bin/minecraft")) == Rule(EXECUTABLE, "minecraft")
+    assert rules.match(process("/home/me/bin/minecraft", executable="java")) is None
+    # The outermost blocked directory wins
+    assert RuleSet([prefix, outer]).match(process("/opt/games/doom")) == outer
+
+
+def test_patterns_are_anchored_at_both_ends():
+    glob = Rule(GLOB, "/Applications/*.app")
+    regex = Rule(REGEX, r"/usr/(local/)?bin/[a-z]+craft")
+    either = Rule(REGEX, r"/srv/a|/srv/b")
+    rules = RuleSet([glob, regex, either])
+    assert rules.match(process("/Applications/Steam.app")) == glob
+    # fnmatch semantics: * also matches slashes
+    assert rules.match(process("/Applications/Games/Steam.app")) == glob
+    assert rules.match(process("/Applications/Steam.app/Contents")) is None
+    assert rules.match(process("/Users/me/Applications/Steam.app")) is None
+    assert rules.match(process("/usr/local/bin/minecraft")) == regex
+    assert rules.match(process("/usr/bin/minecraft2")) is None
+    assert rules.match(process("/srv/b")) == either
+    assert rules.match(process("/srv/bb")) is None
+
+
+def test_regexes_that_cannot_be_combined_still_match():
+    combinable = [Rule(REGEX, rf"/opt/app{i}/bin/.*") for i in range(20)]
+    special = {
+        "flags": Rule(REGEX, r"(?i)/opt/app/Loud"),
+        "named": Rule(REGEX, r"/opt/app/(?P<name>\w+)/(?P=name)"),
+        "backreference": Rule(REGEX, r"/opt/app/(\w+)-\1"),
+    }
+    rules = RuleSet(combinable + list(special.values()))
+    assert not any(rule.combinable for rule in special.values())
+    assert all(rule.combinable for rule in combinable)
+
+    assert rules.match(process("/opt/app/LOUD")) == special["flags"]
+    assert rules.match(process("/opt/app/doom/doom")) == special["named"]
+    assert rules.match(process("/opt/app/doom/quake")) is None
+    assert rules.match(process("/opt/app/doom-doom")) == special["backreference"]
+    assert rules.match(process("/opt/app/doom-quake")) is None
+    # The combined alternation is unaffected by its neighbours' groups
+    assert rules.match(process("/opt/app7/bin/tool")) == combinable[7]
+    assert rules.match(process("/opt/app7/lib/tool")) is None
+
+
+def test_invalid_rules_fail_on_their_own():
+    with pytest.raises(ValueError):
+        Rule(REGEX, "/opt/(unclosed")
+    with pytest.raises(ValueError):
+        Rule("wildcard", "*")
+
+
+def random_rule(rng):
+    n = rng.randrange(30)
+    return rng.choice([
+        Rule(PATH, f"/opt/app{n}/bin/app"),
+        Rule(PATH_PREFIX, f"/opt/app{n}"),
+        Rule(PATH_PREFIX, f"/opt/app{n}/"),
+        Rule(EXECUTABLE, f"app{n}"),
+        Rule(GLOB, f"/opt/app{n}/*/tool"),
+        Rule(GLOB, f"/opt/*/lib{n}"),
+        Rule(REGEX, rf"/opt/app{n}/bin/.*\.sh"),
+        Rule(REGEX, rf"(?i)/OPT/APP{n}/share/.*"),
+        Rule(REGEX, rf"/srv/{n}|/srv/x{n}"),
+    ])
+
+
+def sample_paths(rng):
+    paths = []
+    for n in range(30):
+        paths += [f"/opt/app{n}/bin/app", f"/opt/app{n}/other", f"/opt/app{n}/x/tool", f"/opt/other/lib{n}",
+                  f"/opt/app{n}/bin/run.sh", f"/opt/app{n}/share/doc", f"/srv/{n}", f"/srv/x{n}", f"/usr/bin/app{n}"]
+    return rng.sample(paths, 100)
+
+
+def test_incremental_rule_sets_match_like_fresh_ones():
+    rng = random.Random(7)
+    rules = set()
+    current = RuleSet()
+    for version in range(1, 200):
+        for _ in range(rng.randrange(1, 4)):
+            rule = random_rule(rng)
+            if rule in rules and rng.random() < 0.5:
+                rules.discard(rule)
+            else:
+                rules.add(rule)
+        previous, current = current, RuleSet(rules, version, base=current)
+        fresh = RuleSet(rules, version)
+        for path in sample_paths(rng):
+            matched = current.match(process(path))
+            assert (matched is None) == (fresh.match(process(path)) is None), path
+            assert matched is None or matched in rules
+        # Deriving never changes the base
+        assert all(previous.match(process(rule.value)) is not None
+                   for rule in previous.rules if rule.kind == PATH)
+
+
+def test_untouched_pattern_groups_are_shared():
+    games = Rule(GLOB, "/opt/games/*")
+    tools = Rule(GLOB, "/usr/local/*")
+    base = RuleSet([games, tools])
+    derived = RuleSet([games, tools, Rule(GLOB, "/usr/local/bin/*")], base=base)
+    assert derived.patterns.groups["/opt/games/"][""] is base.patterns.groups["/opt/games/"][""]
+    assert "/usr/local/bin/" not in base.patterns.groups
+
+    removed = RuleSet([tools], base=derived)
+    assert removed.match(process("/opt/games/doom")) is None
+    assert derived.match(process("/opt/games/doom")) == games
+
+
+def test_prefix_named_twice_survives_removing_one_spelling():
+    plain, slashed = Rule(PATH_PREFIX, "/opt/games"), Rule(PATH_PREFIX, "/opt/games/")
+    both = RuleSet([plain, slashed])
+    assert RuleSet([slashed], base=both).match(process("/opt/games/doom")) == slashed
+    assert RuleSet([plain], base=both).match(process("/opt/games/doom")) == plain
+    assert RuleSet([], base=both).match(process("/opt/games/doom")) is None
+
+
+def test_snapshots_are_versioned_and_immutable():
+    steam = (Rule(BUNDLE_ID, "com.valvesoftware.steam"), Rule(PATH_PREFIX, "/Applications/Steam.app"))
+    extra = Rule(TEAM_ID, "MXGJJ98X76")
+    empty = RuleSnapshot()
+    blocked = empty.with_app("/Applications/Steam.app", steam)
+    both = blocked.with_rule(extra)
+    assert [empty.version, blocked.version, both.version] == [0, 1, 2]
+    assert both.rules.version == both.version
+    assert empty.apps == {} and empty.rules.match(process("/Applications/Steam.app")) is None
+    assert blocked.paths == {"/Applications/Steam.app"}
+    assert both.rules.rules == {*steam, extra}
+    with pytest.raises(TypeError):
+        both.apps["/Applications/Chess.app"] = ()
+
+    # An app's rules go with it, unless also added directly
+    again = both.with_rule(steam[0]).without_app("/Applications/Steam.app")
+    assert again.version == 4
+    assert again.rules.rules == {steam[0], extra}
+    cleared = both.cleared()
+    assert cleared.apps == {} and cleared.extra == {extra}
+    assert cleared.without_rule(extra).rules.rules == frozenset()
+    assert both.rules.match(process("/Applications/Steam.app/Contents/MacOS/steam")) == steam[1]
@@ -0,0 +1,111 @@
+import pytest
+
+from scheduler import BATTERY_FACTOR, MonitorScheduler
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def power():
+    """Set power["battery"] to switch the machine to battery"""
+    return {"battery": False}
+
+
+@pytest.fixture
+def scheduler(clock, power):
+    return MonitorScheduler(30.0, clock, coalesce_window=5.0, power_probe=lambda: power["battery"])
+
+
+def test_sweeps_are_coalesced_onto_the_grid(scheduler, clock):
+    clock.now = 1001.0
+    scheduler.sweep_done()
+    assert scheduler.next_sweep == 1035.0
+    assert scheduler.timeout() == 34.0
+    clock.now = 1034.9
+    assert not scheduler.sweep_due()
+    clock.now = 1035.0
+    assert scheduler.sweep_due()
+
+
+def test_battery_slows_sweeps_down(scheduler, clock, power):
+    power["battery"] = True
+    scheduler.sweep_done()
+    assert scheduler.current_sweep_interval() == 30.0 * BATTERY_FACTOR
+    assert scheduler.next_sweep == clock.now + 30.0 * BATTERY_FACTOR
+
+    # Checked again after every sweep
+    power["battery"] = False
+    clock.now = scheduler.next_sweep
+    scheduler.sweep_done()
+    assert scheduler.next_sweep == clock.now + 30.0
+
+
+def test_sweeps_stop_while_idle_or_locked(scheduler, clock):
+    scheduler.sweep_done()
+    scheduler.set_enforcing(False)
+    assert scheduler.next_sweep is None
+    scheduler.sweep_done()
+    assert scheduler.next_sweep is None and scheduler.timeout() is None
+
+    scheduler.set_enforcing(True)
+    assert scheduler.next_sweep == clock.now + 30.0
+
+    scheduler.set_screen_locked(True)
+    assert scheduler.next_deadline() is None
+    scheduler.sweep_done()
+    assert scheduler.next_sweep is None
+    # Unlocking sweeps right away for whatever started meanwhile
+    scheduler.set_screen_locked(False)
+    assert scheduler.sweep_due()
+
+
+def test_unlocking_does_not_sweep_while_idle(scheduler):
+    scheduler.set_enforcing(False)
+    scheduler.set_screen_locked(True)
+    scheduler.set_screen_locked(False)
+    assert scheduler.next_sweep is None and not scheduler.sweep_due()
+
+
+def test_timers_run_in_deadline_order(scheduler, clock):
+    scheduler.set_enforcing(False)
+    ran = []
+    scheduler.call_later(12.0, lambda: ran.append("late"))
+    scheduler.call_later(1.0, lambda: ran.append("early"))
+    scheduler.call_later(3.0, lambda: ran.append("same window"))
+    cancelled = scheduler.call_later(0.5, lambda: ran.append("cancelled"))
+    cancelled.cancel()
+    scheduler.call_later(2.0, lambda: 1 / 0)
+
+    # Coalesced: the three timers in the first window share one wakeup
+    assert scheduler.next_deadline() == 1005.0
+    clock.now = 1004.9
+    scheduler.run_due_timers()
+    assert ran == []
+    clock.now = 1005.0
+    scheduler.run_due_timers()
+    assert ran == ["early", "same window"]
+    assert scheduler.next_deadline() == 1015.0
+    clock.now = 1020.0
+    scheduler.run_due_timers()
+    assert ran == ["early", "same window", "late"]
+    assert scheduler.next_deadline() is None
+
+
+def test_wakeups_per_minute(scheduler, clock):
+    for _ in range(10):
+        scheduler.record_wakeup()
+        clock.now += 10.0
+    assert scheduler.wakeups_per_minute() == 6
+    clock.now += 60.0
+    assert scheduler.wakeups_per_minute() == 0
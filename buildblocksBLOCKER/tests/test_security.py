@@ -0,0 +1,151 @@
+import pytest
+
+from security import (KDF_ITERATIONS, PBKDF2, SCRYPT, SESSION_IDLE_TIMEOUT, SESSION_MAX_AGE, KdfParams, Security,
+                      derive_key)
+
+FAST_KDF = KdfParams(cost=1000)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def security(clock):
+    # A tiny target calibrates to the PBKDF2 floor without timing anything long
+    security = Security(clock, target=1e-6)
+    yield security
+    security.shutdown()
+
+
+def test_verifier_accepts_only_the_password(security, clock):
+    salt, verifier, kdf = security.set_password("secret", FAST_KDF)
+    assert kdf == FAST_KDF.to_dict()
+    # The verifier does not give the key away
+    assert verifier != derive_key("secret", salt, FAST_KDF)
+
+    other = Security(clock, target=1e-6)
+    try:
+        assert not other.verify_password("wrong", salt, verifier, kdf)
+        assert not other.is_unlocked()
+        assert not other.verify_password("", salt, verifier, kdf)
+        assert not other.verify_password("secret", None, verifier, kdf)
+        assert not other.verify_password("secret", salt, verifier, {"algorithm": "md5"})
+        assert other.verify_password("secret", salt, verifier, kdf)
+        assert other.is_unlocked()
+    finally:
+        other.shutdown()
+
+
+def test_sessions_share_a_key_per_password(security, clock):
+    salt, verifier, kdf = security.set_password("secret", FAST_KDF)
+    token = security.encrypt(b"blocked apps")
+    security.lock()
+    with pytest.raises(PermissionError):
+        security.decrypt(token)
+
+    assert security.load_key("secret", salt, kdf)
+    assert security.decrypt(token) == b"blocked apps"
+    assert security.load_key("wrong", salt, kdf)
+    with pytest.raises(ValueError):
+        security.decrypt(token)
+
+
+def test_session_ends_when_idle(security, clock):
+    security.set_password("secret", FAST_KDF)
+    clock.now += SESSION_IDLE_TIMEOUT - 1
+    assert security.remaining() == 1
+    security.touch()
+    clock.now += SESSION_IDLE_TIMEOUT - 1
+    assert security.is_unlocked()
+    clock.now += 1
+    assert not security.is_unlocked()
+    assert security.remaining() == 0
+    with pytest.raises(PermissionError):
+        security.encrypt(b"data")
+
+
+def test_session_ends_at_its_maximum_age(security, clock):
+    security.set_password("secret", FAST_KDF)
+    elapsed = 0
+    while elapsed + SESSION_IDLE_TIMEOUT / 2 < SESSION_MAX_AGE:
+        clock.now += SESSION_IDLE_TIMEOUT / 2
+        elapsed += SESSION_IDLE_TIMEOUT / 2
+        security.touch()
+        assert security.is_unlocked()
+    assert security.remaining() == SESSION_MAX_AGE - elapsed
+    clock.now += security.remaining()
+    assert not security.is_unlocked()
+
+
+def test_lock_overwrites_the_key(security):
+    security.set_password("secret", FAST_KDF)
+    key = security._key
+    assert any(key)
+    security.lock()
+    assert key == bytes(len(key))
+    assert not security.is_unlocked()
+
+    # Timing out wipes it too
+    security.set_password("secret", FAST_KDF)
+    key = security._key
+    security.clock.now += SESSION_MAX_AGE
+    assert not security.is_unlocked()
+    assert key == bytes(len(key))
+
+
+def test_weak_password_hash_is_upgraded_once(security, clock):
+    salt, verifier, kdf = security.set_password("secret", FAST_KDF)
+    token = security.encrypt(b"vault key")
+    security.lock()
+
+    assert security.verify_password("secret", salt, verifier, kdf)
+    # Still the old key until the upgrade is taken, so old tokens open
+    assert security.decrypt(token) == b"vault key"
+    new_salt, new_verifier, new_kdf = security.take_upgrade()
+    assert security.take_upgrade() is None
+    assert new_kdf == {"algorithm": PBKDF2, "cost": KDF_ITERATIONS}
+    assert new_salt != salt
+    with pytest.raises(ValueError):
+        security.decrypt(token)
+    upgraded = security.encrypt(b"vault key")
+
+    other = Security(clock, target=1e-6)
+    try:
+        assert not other.verify_password("secret", salt, verifier, new_kdf)
+        assert other.verify_password("secret", new_salt, new_verifier, new_kdf)
+        assert other.take_upgrade() is None
+        assert other.decrypt(upgraded) == b"vault key"
+    finally:
+        other.shutdown()
+
+
+def test_no_upgrade_for_wrong_passwords_or_locked_sessions(security):
+    salt, verifier, kdf = security.set_password("secret", FAST_KDF)
+    assert security.take_upgrade() is None
+    assert not security.verify_password("wrong", salt, verifier, kdf)
+    assert security.take_upgrade() is None
+
+    assert security.verify_password("secret", salt, verifier, kdf)
+    security.lock()
+    assert security.take_upgrade() is None
+
+
+def test_only_clearly_weaker_parameters_are_upgraded():
+    target = KdfParams(PBKDF2, 400000)
+    assert KdfParams(PBKDF2, 100000).weaker_than(target)
+    # Within the margin, so timing noise does not rewrite the password
+    assert not KdfParams(PBKDF2, 350000).weaker_than(target)
+    assert KdfParams(SCRYPT, 14).weaker_than(KdfParams(SCRYPT, 15))
+    assert not KdfParams(SCRYPT, 15).weaker_than(KdfParams(SCRYPT, 15))
+    # Never across algorithms
+    assert not KdfParams(PBKDF2, 1000).weaker_than(KdfParams(SCRYPT, 18))
@@ -0,0 +1,124 @@
+import json
+import os
+
+import pytest
+
+from settings import MISSING, Settings, diff_settings
+from settings_snapshot import Snapshot, encode_snapshot
+
+
+@pytest.fixture(params=[False, True], ids=["json", "binary"])
+def binary(request):
+    return request.param
+
+
+@pytest.fixture
+def settings_dir(tmp_path):
+    return str(tmp_path / "settings")
+
+
+def push(settings, document):
+    """Replace settings.json the way a deployment tool would"""
+    tmp_path = settings.settings_file + ".push"
+    with open(tmp_path, "w") as f:
+        json.dump(document, f)
+    os.replace(tmp_path, settings.settings_file)
+
+
+def summary(changes):
+    return {change.path: (change.old, change.new) for change in changes}
+
+
+def test_diff_settings_reports_leaf_changes():
+    old = {"theme": "dark", "blocked_apps": {"A": "/a", "B": "/b"}, "last_state": {"blocking_enabled": True},
+           "kdf": {"cost": 1}}
+    new = {"theme": "light", "blocked_apps": {"A": "/a2", "C": "/c"}, "last_state": {"blocking_enabled": True},
+           "kdf": None, "salt": "00"}
+    changes = diff_settings(old, new)
+    assert summary(changes) == {
+        ("theme",): ("dark", "light"),
+        ("blocked_apps", "A"): ("/a", "/a2"),
+        ("blocked_apps", "B"): ("/b", MISSING),
+        ("blocked_apps", "C"): (MISSING, "/c"),
+        ("kdf",): ({"cost": 1}, None),
+        ("salt",): (MISSING, "00"),
+    }
+    added = {change.path for change in changes if change.added}
+    removed = {change.path for change in changes if change.removed}
+    assert added == {("blocked_apps", "C"), ("salt",)}
+    assert removed == {("blocked_apps", "B")}
+    assert diff_settings(new, new) == []
+
+
+def test_diff_settings_reads_snapshot_maps():
+    apps = {f"App{i}": f"/opt/app{i}" for i in range(100)}
+    snapshot = Snapshot(encode_snapshot({"theme": "dark", "blocked_apps": apps}))
+    changed = dict(apps, App50="/elsewhere")
+    del changed["App7"]
+    changes = diff_settings(snapshot.document(), {"theme": "dark", "blocked_apps": changed})
+    assert summary(changes) == {
+        ("blocked_apps", "App7"): ("/opt/app7", MISSING),
+        ("blocked_apps", "App50"): ("/opt/app50", "/elsewhere"),
+    }
+
+
+def test_reload_adopts_a_pushed_file(settings_dir, binary):
+    settings = Settings(settings_dir, flush_delay=0.01, binary=binary)
+    heard = []
+    settings.add_listener(heard.append)
+    settings.set_theme("dark")
+    settings.add_blocked_app("Game", "/opt/game")
+    settings.flush()
+
+    document = settings.load_settings()
+    document["theme"] = "light"
+    document["blocked_apps"]["Chat"] = "/opt/chat"
+    push(settings, document)
+    changes = settings.reload()
+    assert summary(changes) == {("theme",): ("dark", "light"), ("blocked_apps", "Chat"): (MISSING, "/opt/chat")}
+    assert heard == [changes]
+    # Nothing new to adopt
+    assert settings.reload() == []
+    settings.close()
+
+    reopened = Settings(settings_dir, flush_delay=0.01, binary=binary)
+    try:
+        assert reopened.get_theme() == "light"
+        assert dict(reopened.load_blocked_apps()) == {"Game": "/opt/game", "Chat": "/opt/chat"}
+    finally:
+        reopened.close()
+
+
+def test_pushed_file_wins_over_unflushed_changes(settings_dir, binary):
+    settings = Settings(settings_dir, flush_delay=0.01, binary=binary)
+    settings.set_theme("dark")
+    settings.flush()
+    settings.flush_delay = 60
+    settings.add_blocked_app("Game", "/opt/game")
+
+    document = settings.load_settings()
+    document.update(theme="light", blocked_apps={})
+    push(settings, document)
+    assert summary(settings.reload()) == {("theme",): ("dark", "light"),
+                                          ("blocked_apps", "Game"): ("/opt/game", MISSING)}
+    settings.close()
+
+    reopened = Settings(settings_dir, flush_delay=0.01, binary=binary)
+    try:
+        assert reopened.get_theme() == "light"
+        assert dict(reopened.load_blocked_apps()) == {}
+    finally:
+        reopened.close()
+
+
+def test_half_written_push_is_ignored(settings_dir):
+    settings = Settings(settings_dir, flush_delay=0.01)
+    try:
+        settings.set_theme("dark")
+        settings.flush()
+        with open(settings.settings_file, "w") as f:
+            f.write('{"theme": "li')
+        assert settings.reload() == []
+        assert settings.get_theme() == "dark"
+    finally:
+        settings.close()
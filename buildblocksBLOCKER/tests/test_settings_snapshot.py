@@ -0,0 +1,65 @@
+import pytest
+
+from settings_snapshot import ASCII, Snapshot, SnapshotError, encode_snapshot, load_snapshot
+
+
+def round_trip(document):
+    snapshot = Snapshot(encode_snapshot(document))
+    return snapshot, {key: dict(value.items()) if key in snapshot.maps else value
+                      for key, value in snapshot.document().items()}
+
+
+def test_round_trip_keeps_maps_and_other_values():
+    apps = {f"App{i}": f"/Applications/App{i}.app" for i in range(500)}
+    document = {"blocked_apps": apps, "theme": "dark", "kdf": {"algorithm": "scrypt", "cost": 15},
+                "last_state": {"blocking_enabled": True}, "salt": None}
+    snapshot, decoded = round_trip(document)
+    assert decoded == document
+    assert set(snapshot.maps) == {"blocked_apps"}
+    assert snapshot.flags & ASCII
+
+    blocked = snapshot.maps["blocked_apps"]
+    assert len(blocked) == 500
+    assert blocked["App321"] == "/Applications/App321.app"
+    assert "App500" not in blocked and 3 not in blocked
+    with pytest.raises(KeyError):
+        blocked["App5000"]
+
+
+def test_round_trip_of_non_ascii_strings():
+    apps = {"Café": "/Applications/Café.app", "日本語": "/opt/日本語", "Zebra": "/opt/zebra", "émoji 🎮": "/opt/🎮"}
+    snapshot, decoded = round_trip({"blocked_apps": apps, "theme": "Ünïcode"})
+    assert decoded == {"blocked_apps": apps, "theme": "Ünïcode"}
+    assert not snapshot.flags & ASCII
+    blocked = snapshot.maps["blocked_apps"]
+    for name, path in apps.items():
+        assert blocked[name] == path
+    # Stored in UTF-8 byte order, which is code point order
+    assert list(blocked) == sorted(apps)
+    assert blocked.values() == [apps[name] for name in sorted(apps)]
+
+
+def test_empty_maps_and_documents():
+    snapshot, decoded = round_trip({"blocked_apps": {}, "last_state": {}})
+    assert decoded == {"blocked_apps": {}, "last_state": {}}
+    # Empty maps stay JSON rather than becoming empty string maps
+    assert snapshot.maps == {}
+    assert round_trip({})[1] == {}
+
+
+def test_damaged_snapshots_are_rejected(tmp_path):
+    data = bytearray(encode_snapshot({"blocked_apps": {"Game": "/opt/game"}}))
+    data[-3] ^= 0xFF
+    with pytest.raises(SnapshotError):
+        Snapshot(bytes(data))
+    with pytest.raises(SnapshotError):
+        Snapshot(b"BBSNAP")
+    with pytest.raises(SnapshotError):
+        Snapshot(b"NOTSNAP" + bytes(32))
+
+    path = tmp_path / "settings.snapshot"
+    path.write_bytes(b"")
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path))
+    path.write_bytes(encode_snapshot({"theme": "dark"}))
+    assert load_snapshot(str(path)).document() == {"theme": "dark"}
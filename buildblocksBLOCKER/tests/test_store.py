@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from store import DELETE, SET, JournaledStore
+
+
+@pytest.fixture(params=["settings.json", "settings.snapshot"])
+def path(request, tmp_path):
+    return str(tmp_path / request.param)
+
+
+def fresh(path):
+    """A store on path with a checkpoint and a journal of three changes"""
+    store = JournaledStore(path)
+    store.checkpoint(store.encode({"theme": "dark", "blocked_apps": {"Game": "/opt/game"}}))
+    store.append([(SET, ["blocked_apps", "Chat"], "/opt/chat")])
+    store.append([(DELETE, ["blocked_apps", "Game"], None)])
+    store.append([(SET, ["theme"], "light")])
+    return store
+
+
+def reopen(path):
+    store = JournaledStore(path)
+    document = store.load(dict)
+    return store, document
+
+
+def plain(document):
+    return {key: dict(value.items()) if hasattr(value, "items") else value for key, value in document.items()}
+
+
+def test_journal_is_replayed_and_folded_in(path):
+    fresh(path)
+    store, document = reopen(path)
+    assert plain(document) == {"theme": "light", "blocked_apps": {"Chat": "/opt/chat"}}
+    # Folded into a new checkpoint, so the next start replays nothing
+    assert os.path.getsize(store.journal_path) == store.journal_size
+    assert plain(reopen(path)[1]) == plain(document)
+
+
+def test_torn_journal_tail_is_dropped(path):
+    store = fresh(path)
+    with open(store.journal_path, "rb+") as f:
+        f.truncate(os.path.getsize(store.journal_path) - 5)
+    store, document = reopen(path)
+    assert plain(document) == {"theme": "dark", "blocked_apps": {"Chat": "/opt/chat"}}
+
+    # New entries never follow the torn line
+    store.append([(SET, ["theme"], "blue")])
+    assert reopen(path)[1]["theme"] == "blue"
+
+
+def test_corrupt_entry_stops_the_replay(path):
+    store = fresh(path)
+    with open(store.journal_path, "rb") as f:
+        lines = f.readlines()
+    # Header, then one line per change; damage the second change
+    lines[2] = lines[2].replace(b"Game", b"Game!")
+    with open(store.journal_path, "wb") as f:
+        f.writelines(lines)
+    _, document = reopen(path)
+    assert plain(document) == {"theme": "dark", "blocked_apps": {"Game": "/opt/game", "Chat": "/opt/chat"}}
+
+
+def test_journal_of_an_older_checkpoint_is_skipped(path):
+    store = fresh(path)
+    with open(store.journal_path, "rb") as f:
+        journal = f.read()
+    # A checkpoint with a later change lands, then the crash keeps the old journal
+    store.checkpoint(store.encode({"theme": "blue", "blocked_apps": {}}))
+    with open(store.journal_path, "wb") as f:
+        f.write(journal)
+
+    store, document = reopen(path)
+    assert plain(document) == {"theme": "blue", "blocked_apps": {}}
+    assert os.path.getsize(store.journal_path) == store.journal_size
+    store.append([(SET, ["theme"], "green")])
+    assert plain(reopen(path)[1]) == {"theme": "green", "blocked_apps": {}}
+
+
+def test_unreadable_checkpoint_is_kept_aside(path):
+    store = fresh(path)
+    os.remove(store.journal_path)
+    with open(path, "wb") as f:
+        f.write(b"\0garbage")
+    _, document = reopen(path)
+    assert document == {}
+    assert any(".corrupt-" in name for name in os.listdir(os.path.dirname(path)))
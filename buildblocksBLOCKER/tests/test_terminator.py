@@ -0,0 +1,133 @@
+import time
+
+import pytest
+
+from backends import FakeBackend
+from terminator import Terminator
+
+GRACE_PERIOD = 3.0
+FORCE_TIMEOUT = 2.0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubbornBackend(FakeBackend):
+    """FakeBackend whose processes can ignore graceful or any termination"""
+
+    def __init__(self):
+        super().__init__()
+        self.ignore_quit = set()
+        self.unkillable = set()
+
+    def terminate(self, process, force=False):
+        if process.pid in self.unkillable or (not force and process.pid in self.ignore_quit):
+            self.terminated.append((process.pid, force))
+            return process.pid in self.processes
+        return super().terminate(process, force)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def backend():
+    return StubbornBackend()
+
+
+@pytest.fixture
+def terminator(backend, clock):
+    terminator = Terminator(backend, GRACE_PERIOD, FORCE_TIMEOUT, check_interval=0.001, clock=clock)
+    terminator.start()
+    yield terminator
+    terminator.stop()
+
+
+def settle():
+    """Give the terminator thread time for a few check intervals"""
+    time.sleep(0.05)
+
+
+def test_graceful_quit(backend, terminator, clock, wait_for):
+    backend.spawn(1, "/opt/blocked/game")
+    clock.now = 5.0
+    assert terminator.submit(backend.processes[1], detected=4.0)
+    assert wait_for(lambda: terminator.attempts)
+    (attempt,) = terminator.attempts
+    assert attempt.success and not attempt.forced
+    assert (attempt.detected, attempt.requested, attempt.signaled, attempt.latency) == (4.0, 5.0, 5.0, 0.0)
+    assert backend.terminated == [(1, False)]
+    assert terminator.in_flight() == 0
+
+
+def test_escalates_after_the_grace_period(backend, terminator, clock, wait_for):
+    backend.spawn(1, "/opt/blocked/game")
+    backend.ignore_quit.add(1)
+    terminator.submit(backend.processes[1])
+    assert wait_for(lambda: backend.terminated == [(1, False)])
+
+    clock.now = GRACE_PERIOD - 0.1
+    settle()
+    assert backend.terminated == [(1, False)]
+    clock.now = GRACE_PERIOD
+    assert wait_for(lambda: terminator.attempts)
+    (attempt,) = terminator.attempts
+    assert backend.terminated == [(1, False), (1, True)]
+    assert attempt.success and attempt.forced_at == GRACE_PERIOD
+    assert attempt.latency == GRACE_PERIOD
+
+
+def test_gives_up_on_an_unkillable_process(backend, terminator, clock, wait_for):
+    backend.spawn(1, "/opt/blocked/game")
+    backend.unkillable.add(1)
+    terminator.submit(backend.processes[1])
+    assert wait_for(lambda: backend.terminated == [(1, False)])
+    clock.now = GRACE_PERIOD
+    assert wait_for(lambda: len(backend.terminated) == 2)
+
+    clock.now = GRACE_PERIOD + FORCE_TIMEOUT - 0.1
+    settle()
+    assert not terminator.attempts
+    clock.now = GRACE_PERIOD + FORCE_TIMEOUT
+    assert wait_for(lambda: terminator.attempts)
+    (attempt,) = terminator.attempts
+    assert attempt.success is False and attempt.forced
+    assert backend.terminated == [(1, False), (1, True)]
+
+
+def test_one_attempt_in_flight_per_pid(backend, terminator, clock, wait_for):
+    backend.spawn(1, "/opt/blocked/game")
+    backend.ignore_quit.add(1)
+    process = backend.processes[1]
+    assert terminator.submit(process)
+    for _ in range(10):
+        assert not terminator.submit(process)
+    assert terminator.in_flight() == 1
+
+    # Exits on its own before the grace period runs out
+    del backend.processes[1]
+    terminator.exited(1)
+    assert wait_for(lambda: terminator.attempts)
+    assert terminator.attempts[0].success and not terminator.attempts[0].forced
+    assert backend.terminated == [(1, False)]
+    # A later launch under the same pid is a new attempt
+    backend.ignore_quit.clear()
+    backend.spawn(1, "/opt/blocked/game")
+    assert terminator.submit(backend.processes[1])
+    assert wait_for(lambda: len(terminator.attempts) == 2)
+
+
+def test_process_gone_before_the_signal(backend, terminator, wait_for):
+    backend.spawn(1, "/opt/blocked/game")
+    process = backend.processes.pop(1)
+    terminator.submit(process)
+    assert wait_for(lambda: terminator.attempts)
+    # Nothing left to kill counts as success
+    assert terminator.attempts[0].success and terminator.attempts[0].signaled is None
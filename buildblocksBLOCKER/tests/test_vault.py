@@ -0,0 +1,184 @@
+import json
+import os
+
+import pytest
+
+from security import KdfParams, Security
+from settings import Settings
+from vault import CHUNK_ENTRIES, PolicyCache, Vault, VaultError
+
+FAST_KDF = KdfParams(cost=1000)
+
+
+@pytest.fixture
+def security():
+    security = Security()
+    yield security
+    security.shutdown()
+
+
+@pytest.fixture
+def settings_dir(tmp_path):
+    return str(tmp_path / "settings")
+
+
+def open_settings(settings_dir):
+    return Settings(settings_dir, flush_delay=0.01)
+
+
+@pytest.fixture
+def vaulted(settings_dir, security):
+    """Settings whose policy (one blocked app, downtime on) is in the vault"""
+    settings = open_settings(settings_dir)
+    settings.save_password(*security.set_password("secret", FAST_KDF))
+    settings.add_blocked_app("Game", "/opt/game")
+    settings.set_downtime_enabled(True)
+    assert settings.unlock_vault(security)
+    settings.flush()
+    yield settings
+    settings.close()
+
+
+def push(settings, document):
+    """Replace settings.json from outside and let settings reload it"""
+    with open(settings.settings_file, "w") as f:
+        json.dump(document, f)
+    return settings.reload()
+
+
+def test_vault_round_trip(tmp_path):
+    path = str(tmp_path / "settings.vault")
+    key = Vault.new_key()
+    apps = {f"App{i}": f"/opt/app{i}" for i in range(CHUNK_ENTRIES * 3)}
+    sections = {"blocked_apps": apps, "downtime_enabled": True, "last_state": {"blocking_enabled": True}}
+    vault = Vault(path)
+    vault.create(key)
+    vault.write(vault.take_dirty(sections), 1)
+
+    # Change one entry; only its chunk is re-encrypted
+    apps["App7"] = "/opt/elsewhere"
+    vault.mark_dirty(["blocked_apps", "App7"], apps)
+    vault.write(vault.take_dirty(sections), 2)
+
+    reopened = Vault(path)
+    assert reopened.stored_generation() == 2
+    assert reopened.unlock(key) == sections
+    with pytest.raises(VaultError):
+        Vault(path).unlock(Vault.new_key())
+
+
+def test_tampered_vault_fails_to_unlock(tmp_path):
+    path = str(tmp_path / "settings.vault")
+    key = Vault.new_key()
+    vault = Vault(path)
+    vault.create(key)
+    vault.write(vault.take_dirty({"blocked_apps": {"Game": "/opt/game"}}), 1)
+    with open(path) as f:
+        document = json.load(f)
+    token = document["sections"]["blocked_apps"][0]
+    document["sections"]["blocked_apps"][0] = token[:-4] + ("AAAA" if token[-4:] != "AAAA" else "BBBB")
+    with open(path, "w") as f:
+        json.dump(document, f)
+    with pytest.raises(VaultError):
+        Vault(path).unlock(key)
+
+
+def test_policy_cache_round_trip_and_mac(tmp_path):
+    cache = PolicyCache(str(tmp_path / "policy.cache"), str(tmp_path / "policy.key"))
+    policy = {"blocked_apps": {"Game": "/opt/game"}, "downtime_enabled": True}
+    cache.write(cache.encode(3, PolicyCache.capture(policy)))
+    assert PolicyCache(cache.path, cache.key_path).load() == (3, policy)
+
+    with open(cache.path, "r+b") as f:
+        data = bytearray(f.read())
+        data[len(data) // 2] ^= 0xFF
+        f.seek(0)
+        f.write(data)
+    assert PolicyCache(cache.path, cache.key_path).load() is None
+
+
+def test_policy_cache_needs_a_private_key(tmp_path):
+    cache = PolicyCache(str(tmp_path / "policy.cache"), str(tmp_path / "policy.key"))
+    cache.write(cache.encode(1, {"downtime_enabled": True}))
+    os.chmod(cache.key_path, 0o644)
+    assert PolicyCache(cache.path, cache.key_path).load() is None
+
+
+def test_pushed_document_cannot_change_the_vaulted_policy(vaulted, settings_dir):
+    document = vaulted.load_settings()
+    document.update(blocked_apps={}, downtime_enabled=False, theme="light")
+    for name in ("vault_key", "vault_key_kdf"):
+        document.pop(name)
+    changes = push(vaulted, document)
+
+    # Everything else in the push is taken
+    assert [change.path for change in changes] == [("theme",)]
+    assert vaulted.get_theme() == "light"
+    assert dict(vaulted.load_blocked_apps()) == {"Game": "/opt/game"}
+    assert vaulted.get_downtime_enabled() is True
+    vaulted.close()
+
+    with open(vaulted.settings_file) as f:
+        stored = json.load(f)
+    assert "blocked_apps" not in stored and "downtime_enabled" not in stored
+    assert "vault_key" in stored
+
+    restarted = open_settings(settings_dir)
+    try:
+        assert restarted.policy_verified
+        assert dict(restarted.load_blocked_apps()) == {"Game": "/opt/game"}
+        assert restarted.get_downtime_enabled() is True
+    finally:
+        restarted.close()
+
+
+def test_import_changes_the_policy_only_while_unlocked(vaulted, settings_dir, tmp_path):
+    path = str(tmp_path / "import.json")
+    document = vaulted.load_settings()
+    document.update(blocked_apps={"Other": "/opt/other"}, downtime_enabled=False)
+    with open(path, "w") as f:
+        json.dump(document, f)
+
+    vaulted.lock_vault()
+    vaulted.import_json(path)
+    assert dict(vaulted.load_blocked_apps()) == {"Game": "/opt/game"}
+
+    vaulted.close()
+    reopened = open_settings(settings_dir)
+    security = Security()
+    try:
+        assert security.load_key("secret", reopened.get_password_salt(), reopened.get_kdf_params())
+        assert reopened.unlock_vault(security)
+        reopened.import_json(path)
+        assert dict(reopened.load_blocked_apps()) == {"Other": "/opt/other"}
+        assert reopened.get_downtime_enabled() is False
+    finally:
+        reopened.close()
+        security.shutdown()
+
+
+def test_unlock_restores_the_vault_over_a_forged_cache(vaulted, settings_dir, security):
+    vaulted.close()
+    # Someone who can read policy.key writes a newer cache without the password
+    cache = PolicyCache(os.path.join(settings_dir, "policy.cache"), os.path.join(settings_dir, "policy.key"))
+    cache.write(cache.encode(99, {"blocked_apps": {}, "downtime_enabled": False}))
+
+    reopened = open_settings(settings_dir)
+    try:
+        assert dict(reopened.load_blocked_apps()) == {}
+        assert reopened.unlock_vault(security)
+        assert dict(reopened.load_blocked_apps()) == {"Game": "/opt/game"}
+        assert reopened.get_downtime_enabled() is True
+    finally:
+        reopened.close()
+
+
+def test_missing_cache_means_lockdown(vaulted, settings_dir):
+    vaulted.close()
+    os.remove(os.path.join(settings_dir, "policy.cache"))
+    reopened = open_settings(settings_dir)
+    try:
+        assert not reopened.policy_verified
+        assert reopened.get_downtime_enabled() is True
+    finally:
+        reopened.close()